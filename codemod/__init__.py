@@ -0,0 +1,4 @@
+"""
+Shared helpers for the fix_*.py codemod scripts
+Run the scripts from the repository root, e.g. `python3 fix_all_prisma.py`
+"""
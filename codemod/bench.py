@@ -0,0 +1,298 @@
+"""
+Benchmark harness for the codemod scripts
+Builds synthetic corpora from apps/api/src at 1x/10x/100x, runs every fix_*.py
+script over them (dry run, nothing is written) and records throughput, peak
+RSS and per-rule time as JSON so runs can be compared across versions.
+
+    python3 -m codemod.bench --scales 1,10 --compare old.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from codemod import runner, spans
+from codemod.cache import CACHE_DIR, digest
+from codemod.engine import RuleSet
+from codemod.lexer import TokenRuleSet, code_tokens
+
+BENCH_DIR = CACHE_DIR / 'bench'
+SOURCE = 'apps/api/src'
+SCALES = (1, 10, 100)
+
+# Bump when corpus generation or the result format changes
+VERSION = 1
+
+# A change bigger than this between two result files is flagged
+THRESHOLD = 0.10
+
+
+def build_corpus(scale, source=SOURCE, root=BENCH_DIR):
+    """
+    `scale` copies of the source tree under root/<scale>x/copy-NNN/, each
+    file tagged with a copy comment so no two copies are byte-identical.
+    Reused as long as the source files haven't changed.
+    """
+    files = list(runner.iter_files([source], ('.ts',)))
+    stamp = digest(repr((VERSION, [(str(p), p.stat().st_mtime_ns, p.stat().st_size) for p in files])).encode())
+    corpus = root / f'{scale}x'
+    stamp_path = corpus / 'SOURCE'
+    if stamp_path.exists() and stamp_path.read_text() == stamp:
+        return corpus
+
+    if corpus.exists():
+        shutil.rmtree(corpus)
+    for copy in range(scale):
+        base = corpus / f'copy-{copy:03d}'
+        header = f'// bench copy {copy}\n'.encode()
+        for path in files:
+            target = base / path
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(header + path.read_bytes())
+    stamp_path.write_text(stamp)
+    return corpus
+
+
+def copies(corpus):
+    return sorted(p for p in corpus.iterdir() if p.is_dir())
+
+
+def targets(module, corpus):
+    """[(file, transform)] a script would rewrite in the corpus"""
+    if hasattr(module, 'transforms'):
+        return [(base / path, transform)
+                for base in copies(corpus)
+                for path, transform in module.transforms().items()
+                if (base / path).exists()]
+    skip = getattr(module, 'SKIP', ())
+    paths = [base / SOURCE for base in copies(corpus)]
+    return [(path, module.RULES) for path in runner.iter_files(paths, ('.ts',), skip)]
+
+
+def rule_timers(module):
+    """
+    (label, rules) for every rule list in a script that can be timed one by
+    one: a TokenRuleSet or a list of (pattern, replacement) pairs
+    """
+    found = []
+    rules = getattr(module, 'RULES', None)
+    if isinstance(rules, TokenRuleSet):
+        found.append(('RULES', rules))
+    elif isinstance(rules, RuleSet):
+        found.append(('RULES', [(r.pattern, r.replacement) for r in rules.rules]))
+    for path, pairs in getattr(module, 'files_map', {}).items():
+        found.append((path, pairs))
+    for path, token_rules in getattr(module, 'token_rules', {}).items():
+        found.append((path, token_rules))
+    return found
+
+
+def time_rules(module, paths):
+    """Per-rule seconds and hits, reading one file at a time"""
+    timers = rule_timers(module)
+    totals = {}
+
+    def add(label, rule, seconds, hits):
+        entry = totals.setdefault((label, rule), {'rules': label, 'rule': rule, 'seconds': 0.0, 'hits': 0})
+        entry['seconds'] += seconds
+        entry['hits'] += hits
+
+    compiled = [(label, rules if isinstance(rules, TokenRuleSet) else [(re.compile(p), p, r) for p, r in rules])
+                for label, rules in timers]
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+        for label, rules in compiled:
+            if not isinstance(rules, TokenRuleSet):
+                for regex, pattern, replacement in rules:
+                    start = time.perf_counter()
+                    hits = regex.subn(replacement, text)[1]
+                    add(label, pattern, time.perf_counter() - start, hits)
+                continue
+            # One lexer pass shared by all rules, then each rule's matching on its own
+            start = time.perf_counter()
+            tokens = code_tokens(text) if any(n in text for n in rules.by_name) else []
+            add(label, '(tokenize)', time.perf_counter() - start, 1 if tokens else 0)
+            for rule in rules.rules:
+                hits = 0
+                start = time.perf_counter()
+                for i, token in enumerate(tokens):
+                    if token.text == rule.old and token.kind == 'ident' and rule.matches(tokens, i):
+                        hits += 1
+                add(label, rule.pattern, time.perf_counter() - start, hits)
+    return list(totals.values())
+
+
+def rewrite_in_memory(path, transform):
+    """Same read/transform path as a real run, without writing or diffing; True if changed"""
+    if hasattr(transform, 'edits'):
+        with spans.mapped(path) as buffer:
+            if buffer.find(b'\r') == -1:
+                edits = transform.edits(buffer, ascii_input=lambda: spans.is_ascii(buffer))
+                if edits is not None:
+                    return bool(edits)
+    with open(path, encoding='utf-8') as f:
+        content = f.read()
+    return transform(content) != content
+
+
+def measure(script, corpus, per_rule=True):
+    """Run one script over a corpus in this process; returns a result dict"""
+    module = runner.load_script(script)
+    work = targets(module, corpus)
+    size = sum(os.path.getsize(path) for path, _ in work)
+
+    changed = 0
+    start = time.perf_counter()
+    for path, transform in work:
+        changed += rewrite_in_memory(path, transform)
+    seconds = time.perf_counter() - start
+
+    # Peak RSS of the rewrite itself (KiB on Linux), before per-rule timing
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    result = {
+        'script': Path(script).name,
+        'files': len(work),
+        'bytes': size,
+        'changed': changed,
+        'seconds': seconds,
+        'mb_per_s': size / 1e6 / seconds if seconds else None,
+        'files_per_s': len(work) / seconds if seconds else None,
+        'peak_rss_kb': peak_rss_kb,
+    }
+    if per_rule:
+        result['rules'] = time_rules(module, [path for path, _ in work])
+    return result
+
+
+def run_isolated(script, corpus, per_rule=True):
+    """measure() in a fresh interpreter, so peak RSS belongs to one script and scale"""
+    cmd = [sys.executable, '-m', 'codemod.bench', '--worker', str(script), str(corpus)]
+    if not per_rule:
+        cmd.append('--no-rules')
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {'script': Path(script).name, 'error': proc.stderr.strip().splitlines()[-1:]}
+    return json.loads(proc.stdout)
+
+
+def environment():
+    try:
+        rev = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                             capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        rev = None
+    return {
+        'version': VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git': rev,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def compare(base, current, threshold=THRESHOLD):
+    """Lines describing throughput/RSS changes beyond threshold between two result sets"""
+    old = {(r['script'], r['scale']): r for r in base['results'] if 'error' not in r}
+    lines = []
+    for r in current['results']:
+        before = old.get((r['script'], r['scale']))
+        if before is None or 'error' in r:
+            continue
+        for key, worse in (('mb_per_s', -1), ('peak_rss_kb', 1)):
+            a, b = before.get(key), r.get(key)
+            if not a or not b:
+                continue
+            change = (b - a) / a
+            if abs(change) >= threshold:
+                tag = '⚠ regression' if change * worse > 0 else '✓ improvement'
+                lines.append(f"{tag}: {r['script']} {r['scale']}x {key} {a:.1f} -> {b:.1f} ({change:+.0%})")
+    return lines
+
+
+def print_table(results, out=sys.stdout):
+    print(f"{'script':<26} {'scale':>5} {'files':>7} {'MB':>7} {'MB/s':>8} {'files/s':>9} {'RSS MB':>7}", file=out)
+    for r in results:
+        if 'error' in r:
+            print(f"{r['script']:<26} {r['scale']:>4}x  ERROR {' '.join(r['error'])}", file=out)
+            continue
+        print(f"{r['script']:<26} {r['scale']:>4}x {r['files']:>7} {r['bytes'] / 1e6:>7.2f} "
+              f"{r['mb_per_s'] or 0:>8.1f} {r['files_per_s'] or 0:>9.0f} {r['peak_rss_kb'] / 1024:>7.1f}", file=out)
+
+
+def slowest_rules(results, count=5, out=sys.stdout):
+    for r in results:
+        rules = sorted(r.get('rules', []), key=lambda x: -x['seconds'])[:count]
+        if not rules:
+            continue
+        print(f"\n{r['script']} {r['scale']}x, slowest rules:", file=out)
+        for rule in rules:
+            print(f"  {rule['seconds'] * 1000:9.1f} ms  {rule['hits']:>6} hits  {rule['rule']}", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python3 -m codemod.bench', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=lambda s: [int(x) for x in s.split(',')], default=list(SCALES),
+                        help="comma-separated corpus sizes (default: 1,10,100)")
+    parser.add_argument('--scripts', type=lambda s: s.split(','), default=None,
+                        help="comma-separated scripts (default: every fix_*.py)")
+    parser.add_argument('--no-rules', dest='per_rule', action='store_false',
+                        help="skip per-rule timing")
+    parser.add_argument('-o', '--output', type=Path, default=None,
+                        help="result file (default: .codemod-cache/bench/results/<time>.json)")
+    parser.add_argument('--compare', type=Path, default=None,
+                        help="earlier result file to compare against")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help=f"relative change reported by --compare (default: {THRESHOLD})")
+    parser.add_argument('--worker', nargs=2, metavar=('SCRIPT', 'CORPUS'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        script, corpus = args.worker
+        json.dump(measure(script, Path(corpus), per_rule=args.per_rule), sys.stdout)
+        return 0
+
+    scripts = args.scripts or sorted(str(p) for p in Path('.').glob('fix_*.py'))
+    results = []
+    for scale in args.scales:
+        print(f"Building {scale}x corpus...", file=sys.stderr)
+        corpus = build_corpus(scale)
+        for script in scripts:
+            print(f"  {script} @ {scale}x", file=sys.stderr)
+            result = run_isolated(script, corpus, args.per_rule)
+            result['scale'] = scale
+            results.append(result)
+
+    report = {**environment(), 'results': results}
+    output = args.output or BENCH_DIR / 'results' / f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=1), encoding='utf-8')
+
+    print_table(results)
+    if args.per_rule:
+        slowest_rules(results)
+    print(f"\n✅ Results saved to {output}")
+
+    if args.compare:
+        lines = compare(json.loads(args.compare.read_text(encoding='utf-8')), report, args.threshold)
+        print()
+        for line in lines or [f"No changes beyond ±{args.threshold:.0%}"]:
+            print(line)
+        if any(line.startswith('⚠') for line in lines):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
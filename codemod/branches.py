@@ -0,0 +1,357 @@
+"""
+Rewrite branches in the object database, without a checkout
+Applies a script's RULES (fix_all_prisma.py by default) to several branches
+straight from git objects: blobs are read through one persistent
+`git cat-file --batch` pipe and rewritten in memory. Each distinct blob is
+rewritten once, whichever branches share it. New blobs are written with
+one `git hash-object` call and trees with one `git mktree --batch`, and
+each branch gets a commit on top of its tip. The working tree and index
+are never touched:
+
+    python3 -m codemod.branches feature/booking feature/wallet
+    python3 -m codemod.branches feature/booking --dry-run --stat
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from collections import namedtuple
+from pathlib import Path
+
+from codemod import budget, cache, runner, validate
+
+SCRIPT = 'fix_all_prisma.py'
+PATHS = ['apps/api/src', 'apps/api/scripts']
+MESSAGE = "Apply {script} rewrite"
+
+# old/new: commit SHAs (new is None when nothing changed); files: {path: (old blob, new blob)}
+BranchResult = namedtuple('BranchResult', 'branch old new tree files')
+
+
+class GitError(Exception):
+    pass
+
+
+class BudgetError(Exception):
+    """Rules were skipped for running over the time budget, so the rewrite is incomplete"""
+
+
+def git(*args, input=None):
+    """Run a git command, returning stdout as bytes"""
+    result = subprocess.run(['git', *args], input=input, capture_output=True)
+    if result.returncode != 0:
+        raise GitError(f"git {' '.join(args)}: {result.stderr.decode(errors='replace').strip()}")
+    return result.stdout
+
+
+class CatFile:
+    """A persistent `git cat-file --batch` pipe"""
+
+    def __init__(self):
+        self.proc = subprocess.Popen(['git', 'cat-file', '--batch'], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def read(self, sha):
+        """(type, content) of an object"""
+        self.proc.stdin.write(sha.encode('ascii') + b'\n')
+        self.proc.stdin.flush()
+        header = self.proc.stdout.readline().split()
+        if len(header) != 3:
+            raise GitError(f"cat-file: {b' '.join(header).decode(errors='replace')}")
+        content = self.proc.stdout.read(int(header[2]))
+        self.proc.stdout.read(1)
+        return header[1].decode('ascii'), content
+
+    def tree(self, sha):
+        """[(mode, name, sha)] of a tree object"""
+        kind, data = self.read(sha)
+        if kind != 'tree':
+            raise GitError(f"{sha} is a {kind}, not a tree")
+        entries = []
+        pos = 0
+        while pos < len(data):
+            space = data.index(b' ', pos)
+            nul = data.index(b'\0', space)
+            entries.append((data[pos:space].decode('ascii'), data[space + 1:nul], data[nul + 1:nul + 21].hex()))
+            pos = nul + 21
+        return entries
+
+    def close(self):
+        self.proc.stdin.close()
+        self.proc.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MkTree:
+    """A persistent `git mktree --batch -z` pipe"""
+
+    def __init__(self):
+        self.proc = subprocess.Popen(['git', 'mktree', '--batch', '-z'], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def write(self, entries):
+        """SHA of a new tree from [(mode, name, sha)]"""
+        for mode, name, sha in entries:
+            kind = 'tree' if mode == '40000' else 'commit' if mode == '160000' else 'blob'
+            self.proc.stdin.write(f"{mode} {kind} {sha}\t".encode('ascii') + name + b'\0')
+        # An empty entry ends the tree
+        self.proc.stdin.write(b'\0')
+        self.proc.stdin.flush()
+        return self.proc.stdout.readline().strip().decode('ascii')
+
+    def close(self):
+        self.proc.stdin.close()
+        self.proc.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def candidates(commit, paths, suffixes, skip=()):
+    """{path: blob SHA} of the files under paths in commit that the rules apply to"""
+    out = git('ls-tree', '-r', '-z', '--full-tree', commit, '--', *paths)
+    found = {}
+    for entry in out.split(b'\0'):
+        if not entry:
+            continue
+        meta, path = entry.split(b'\t', 1)
+        mode, kind, sha = meta.decode('ascii').split()
+        path = path.decode('utf-8', 'surrogateescape')
+        name = path.rsplit('/', 1)[-1]
+        if (kind != 'blob' or mode == '120000' or not name.endswith(suffixes) or any(s in name for s in skip)
+                or runner.SKIP_DIRS.intersection(path.split('/')[:-1])):
+            continue
+        found[path] = sha
+    return found
+
+
+def rewrite_blob(data, transform, path, check=True):
+    """
+    (new content, problems) for a blob: new content is None when the rules
+    leave it alone, or when the rewrite is rejected, and then problems lists
+    what it would have broken (see codemod.validate)
+    """
+    try:
+        content = data.decode('utf-8')
+    except UnicodeDecodeError:
+        return None, None
+    new_content = transform(content)
+    if new_content == content:
+        return None, None
+    if check:
+        problems = validate.introduced(content, new_content, path)
+        if problems:
+            for p in problems:
+                print(f"REJECTED {path}:{p.line}:{p.col}: {p.kind}: {p.message}", file=sys.stderr)
+            return None, problems
+    return new_content.encode('utf-8'), None
+
+
+def hash_blobs(contents, write=True):
+    """{old SHA: new SHA} for {old SHA: new content}, with one `git hash-object` call"""
+    if not contents:
+        return {}
+    with tempfile.TemporaryDirectory(prefix='codemod-blobs-') as tmp:
+        names = []
+        for sha, data in contents.items():
+            name = os.path.join(tmp, sha)
+            with open(name, 'wb') as f:
+                f.write(data)
+            names.append(name)
+        args = ['hash-object', '--no-filters', '--stdin-paths'] + (['-w'] if write else [])
+        out = git(*args, input='\n'.join(names).encode() + b'\n').decode('ascii').split()
+    return dict(zip(contents, out))
+
+
+def rebuild(tree, changed, reader, writer, memo):
+    """
+    SHA of tree with the blobs in changed ({path relative to tree: new SHA})
+    swapped in. Only the directories on a changed path are read and written.
+    memo maps (old tree, changes) to the new tree, so subtrees a branch shares
+    with one already done are reused.
+    """
+    key = (tree, frozenset(changed.items()))
+    if key in memo:
+        return memo[key]
+    here = {}
+    below = {}
+    for path, sha in changed.items():
+        head, _, rest = path.partition('/')
+        if rest:
+            below.setdefault(head.encode('utf-8', 'surrogateescape'), {})[rest] = sha
+        else:
+            here[head.encode('utf-8', 'surrogateescape')] = sha
+    entries = []
+    for mode, name, sha in reader.tree(tree):
+        if name in here:
+            sha = here[name]
+        elif name in below:
+            sha = rebuild(sha, below[name], reader, writer, memo)
+        entries.append((mode, name, sha))
+    memo[key] = writer.write(entries) if writer is not None else None
+    return memo[key]
+
+
+def current_branch():
+    result = subprocess.run(['git', 'symbolic-ref', '-q', '--short', 'HEAD'], capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+
+def rewrite_branches(branches, transform, paths=PATHS, suffixes=('.ts',), skip=(), message=MESSAGE,
+                     dry_run=False, check=True, rules_key=None, out=sys.stdout):
+    """
+    Rewrite every branch, returning ([BranchResult], {old blob SHA: (old
+    content, new content)} for the blobs that changed, [paths with rules
+    skipped over the time budget], [paths whose rewrite was rejected]).
+    Rejected blobs are left as they are, and never cached as clean. Blobs are
+    read and rewritten once per SHA across all branches. Known-clean
+    contents are skipped through the result cache. Unless dry_run, each
+    changed branch gets a new commit and its ref is moved (compare-and-swap
+    on the old tip). A rule skipped over the time budget (codemod.budget)
+    raises BudgetError before anything is committed; in a dry run the
+    overruns are only reported.
+    """
+    tips = {branch: git('rev-parse', '--verify', f'{branch}^{{commit}}').decode().strip() for branch in branches}
+    files = {branch: candidates(tip, paths, suffixes, skip) for branch, tip in tips.items()}
+    blobs = {sha: path for branch in branches for path, sha in files[branch].items()}
+    print(f"{sum(len(f) for f in files.values())} files on {len(branches)} branches, "
+          f"{len(blobs)} distinct blobs", file=out)
+
+    new_contents = {}
+    clean = []
+    overrun = []
+    rejected = []
+    with CatFile() as reader:
+        for sha, path in blobs.items():
+            _, data = reader.read(sha)
+            content_digest = cache.digest(data)
+            if rules_key and cache.is_clean(rules_key, content_digest):
+                continue
+            budget.take()
+            new, problems = rewrite_blob(data, transform, path, check)
+            overruns = budget.take()
+            for label, seconds in overruns:
+                print(f"⚠ BUDGET {path}: {label!r} over {seconds:g}s, skipped", file=sys.stderr)
+            if overruns:
+                # A skipped rule never saw the blob, so it is neither clean nor fully rewritten
+                overrun.append(path)
+            elif problems:
+                rejected.append(path)
+            elif new is None:
+                clean.append(content_digest)
+            if new is not None:
+                new_contents[sha] = (data, new)
+        if rules_key and clean:
+            cache.mark_clean(rules_key, clean)
+        print(f"{len(new_contents)} blobs rewritten", file=out)
+        if overrun and not dry_run:
+            raise BudgetError(f"rules ran over the time budget in {len(overrun)} files; nothing committed "
+                              f"(raise --rule-budget or fix the rule)")
+
+        new_shas = hash_blobs({sha: new for sha, (_, new) in new_contents.items()}, write=not dry_run)
+        results = []
+        with (MkTree() if not dry_run else _NoTrees()) as writer:
+            memo = {}
+            for branch in branches:
+                changed = {path: new_shas[sha] for path, sha in files[branch].items() if sha in new_shas}
+                pairs = {path: (files[branch][path], sha) for path, sha in changed.items()}
+                if not changed or dry_run:
+                    results.append(BranchResult(branch, tips[branch], None, None, pairs))
+                    continue
+                root = git('rev-parse', f'{tips[branch]}^{{tree}}').decode().strip()
+                tree = rebuild(root, changed, reader, writer, memo)
+                commit = git('commit-tree', tree, '-p', tips[branch], '-m', message).decode().strip()
+                git('update-ref', '-m', 'codemod.branches', f'refs/heads/{branch}', commit, tips[branch])
+                results.append(BranchResult(branch, tips[branch], commit, tree, pairs))
+    return results, {sha: pair for sha, pair in new_contents.items()}, overrun, rejected
+
+
+class _NoTrees:
+    """Stands in for MkTree in a dry run"""
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python3 -m codemod.branches', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('branches', nargs='+', help="local branches to rewrite")
+    parser.add_argument('--script', default=SCRIPT, help=f"script with a module-level RULES (default: {SCRIPT})")
+    parser.add_argument('--path', dest='paths', action='append',
+                        help=f"tree path to rewrite, repeatable (default: {' '.join(PATHS)})")
+    parser.add_argument('--ext', type=lambda s: tuple(s.split(',')), default=('.ts',),
+                        help="comma-separated extensions (default: .ts)")
+    parser.add_argument('-m', '--message', help=f"commit message (default: {MESSAGE.format(script=SCRIPT)!r})")
+    parser.add_argument('--no-cache', dest='cache', action='store_false',
+                        help="re-process every blob instead of skipping known unchanged ones")
+    runner.add_output_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if not Path(args.script).exists():
+        print(f"ERROR: Script {args.script} not found", file=sys.stderr)
+        return 1
+    module = runner.load_script(args.script)
+    if not hasattr(module, 'RULES'):
+        print(f"ERROR: {args.script} has no module-level RULES", file=sys.stderr)
+        return 1
+    rules = module.RULES
+    transform = rules.sequential if rules.conflicts() else rules
+    budget.configure(args.rule_budget)
+    budget.warn_rules(rules)
+
+    head = current_branch()
+    if not args.dry_run and head in args.branches:
+        print(f"ERROR: {head} is checked out; run {args.script} in the working tree instead", file=sys.stderr)
+        return 1
+
+    out = runner.status(args)
+    try:
+        results, contents, overrun, rejected = rewrite_branches(
+            args.branches, transform, args.paths or PATHS, args.ext, tuple(getattr(module, 'SKIP', ())),
+            args.message or MESSAGE.format(script=Path(args.script).name), args.dry_run, args.validate,
+            rules.fingerprint if args.cache else None, out)
+    except (GitError, BudgetError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+
+    totals = [0, 0, 0]
+    for result in results:
+        if args.dry_run:
+            for path, (old, _) in sorted(result.files.items()):
+                before, after = (c.decode('utf-8') for c in contents[old])
+                if args.stat:
+                    added, removed = runner.diff_stat(before, after)
+                    print(f" {result.branch}:{path} | +{added} -{removed}")
+                    totals[0] += 1
+                    totals[1] += added
+                    totals[2] += removed
+                else:
+                    sys.stdout.write(runner.unified_diff(path, before, after))
+        print(f"{result.branch}: {len(result.files)} files changed", end='', file=out)
+        if result.new:
+            print(f", {result.old[:10]} -> {result.new[:10]} (undo with "
+                  f"`git update-ref refs/heads/{result.branch} {result.old}`)", end='', file=out)
+        print(file=out)
+    if args.dry_run and args.stat:
+        print(f" {totals[0]} files changed, {totals[1]} insertions(+), {totals[2]} deletions(-)")
+    if overrun:
+        print(f"⚠ Rules ran over the time budget in {len(overrun)} files; this rewrite would not be committed",
+              file=sys.stderr)
+        return 1
+    return runner.exit_status(len(rejected))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,300 @@
+"""
+Regex safety: static hazard check and per-rule, per-file time budgets
+hazards() flags patterns that can backtrack catastrophically: a quantifier
+nested inside another unbounded one (`(a+)+`, `(?:\\s*x)*`), or two
+unbounded quantifiers over overlapping characters with nothing to tell them
+apart (`\\s*\\n\\s*`). Rule sets report them when they're loaded.
+
+At run time every rule gets a time budget per file (default 1s, --rule-budget
+or CODEMOD_RULE_BUDGET). The regex engine checks for signals while
+matching, so an interval timer interrupts a runaway match. The rule is then
+skipped for that file and reported instead of hanging the run:
+
+    ⚠ BUDGET apps/web/src/generated/big.ts: '(a+)+$' over 1.0s, skipped
+"""
+
+import contextlib
+import functools
+import os
+import signal
+import sys
+import threading
+import time
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+_C = sre_constants
+ENV = 'CODEMOD_RULE_BUDGET'
+DEFAULT_SECONDS = 1.0
+
+_REPEATS = (_C.MAX_REPEAT, _C.MIN_REPEAT)
+# Backtracking never re-enters these, so nothing inside them can blow up
+_ATOMIC = tuple(op for op in (getattr(_C, 'POSSESSIVE_REPEAT', None), getattr(_C, 'ATOMIC_GROUP', None)) if op)
+# Characters sampled when comparing character classes
+_SAMPLE = [chr(c) for c in range(128)] + ['\u00a0', 'é', '\u3000', '一']
+
+
+class BudgetExceeded(Exception):
+    def __init__(self, label, seconds):
+        super().__init__(f"{label!r} over {seconds:g}s")
+        self.label = label
+        self.seconds = seconds
+
+
+def seconds():
+    """Per-rule, per-file budget in seconds (0 disables it)"""
+    try:
+        return float(os.environ.get(ENV, DEFAULT_SECONDS))
+    except ValueError:
+        return DEFAULT_SECONDS
+
+
+def configure(value):
+    """Set the budget for this process and the workers it starts"""
+    if value is not None:
+        os.environ[ENV] = str(value)
+
+
+# (deadline, token) of the active limits, innermost last
+_active = []
+
+
+class _Alarm(BaseException):
+    pass
+
+
+def _on_alarm(signum, frame):
+    token = _active[-1][1] if _active else None
+    # A limit's own alarm arriving while it is being left: the block already
+    # finished, so there's nothing to interrupt
+    if frame is not None and frame.f_code is _Limit.__exit__.__code__ and frame.f_locals['self'].token is token:
+        return
+    raise _Alarm(token)
+
+
+def _can_alarm():
+    return hasattr(signal, 'setitimer') and threading.current_thread() is threading.main_thread()
+
+
+def limit(label, budget=None):
+    """
+    Context manager raising BudgetExceeded(label) if the block runs longer
+    than budget seconds. Only the main thread can take signals; elsewhere
+    the block just runs. Nests: an inner limit never extends an outer one.
+    """
+    budget = seconds() if budget is None else budget
+    if not budget or not _can_alarm():
+        return contextlib.nullcontext()
+    deadline = time.monotonic() + budget
+    if _active and _active[-1][0] <= deadline:
+        # The enclosing limit fires first
+        return contextlib.nullcontext()
+    return _Limit(label, budget, deadline)
+
+
+class _Limit:
+    # A class rather than a generator, so leaving the block runs no frame
+    # but __exit__ where a late alarm could land
+
+    def __init__(self, label, budget, deadline):
+        self.label = label
+        self.budget = budget
+        self.deadline = deadline
+        self.token = object()
+        self.previous = None
+
+    def __enter__(self):
+        if not _active:
+            self.previous = signal.signal(signal.SIGALRM, _on_alarm)
+        _active.append((self.deadline, self.token))
+        signal.setitimer(signal.ITIMER_REAL, self.budget)
+
+    def __exit__(self, kind, error, tb):
+        # Disarm first; until the pop, _on_alarm drops this limit's alarm
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        _active.pop()
+        if _active:
+            signal.setitimer(signal.ITIMER_REAL, max(_active[-1][0] - time.monotonic(), 1e-6))
+        else:
+            signal.signal(signal.SIGALRM, self.previous)
+        if kind is _Alarm and error.args[0] is self.token:
+            raise BudgetExceeded(self.label, self.budget) from None
+        return False
+
+
+# Rules skipped in this process since the last take()
+_overruns = []
+
+
+def overrun(error):
+    _overruns.append((error.label, error.seconds))
+
+
+def take():
+    """Overruns recorded since the last call, as [(label, seconds)]"""
+    found = _overruns[:]
+    del _overruns[:]
+    return found
+
+
+def sub(pattern, replacement, content, count=0, flags=0):
+    """re.sub under the budget: content unchanged (and the overrun recorded) if it runs out"""
+    import re
+
+    warn(pattern)
+    try:
+        with limit(pattern):
+            return re.sub(pattern, replacement, content, count=count, flags=flags)
+    except BudgetExceeded as e:
+        overrun(e)
+        return content
+
+
+@functools.lru_cache(maxsize=None)
+def hazards(pattern):
+    """Reasons pattern may backtrack catastrophically (empty if none found)"""
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception:
+        return ()
+    found = []
+    _walk(parsed.data, None, found)
+    return tuple(dict.fromkeys(found))
+
+
+_warned = set()
+
+
+def warn(pattern, out=None):
+    """Print pattern's hazards once per process"""
+    if pattern in _warned:
+        return
+    _warned.add(pattern)
+    for reason in hazards(pattern):
+        print(f"⚠ Rule {pattern!r}: {reason}", file=out or sys.stderr)
+
+
+def warn_rules(transform, out=None):
+    """Print the hazards of a rule set (anything with hazards()) at load time"""
+    if not hasattr(transform, 'hazards'):
+        return
+    for pattern, _ in transform.hazards():
+        warn(pattern, out)
+
+
+def _unbounded(av):
+    return av[1] == _C.MAXREPEAT or av[1] > 64
+
+
+def _walk(items, outer, found):
+    """outer: the innermost enclosing unbounded repeat, or None"""
+    items = list(items)
+    for op, av in items:
+        if op in _ATOMIC:
+            continue
+        if op in _REPEATS:
+            if _unbounded(av):
+                if outer is not None:
+                    found.append("nested quantifier (a repeated group contains another unbounded repeat)")
+                _walk(av[2], av, found)
+            else:
+                _walk(av[2], outer, found)
+        elif op is _C.SUBPATTERN:
+            _walk(av[-1], outer, found)
+        elif op is _C.BRANCH:
+            for branch in av[1]:
+                _walk(branch, outer, found)
+            if outer is not None and _overlapping_branches(av[1]):
+                found.append("alternatives that can match the same text inside a repeat")
+        elif op in (_C.ASSERT, _C.ASSERT_NOT):
+            _walk(av[1], outer, found)
+    _adjacent(items, found)
+
+
+def _chars(op, av):
+    """Set of sample characters a single-character item matches, or None if it isn't one"""
+    if op is _C.LITERAL:
+        return frozenset(c for c in _SAMPLE if ord(c) == av)
+    if op is _C.NOT_LITERAL:
+        return frozenset(c for c in _SAMPLE if ord(c) != av)
+    if op is _C.ANY:
+        return frozenset(c for c in _SAMPLE if c != '\n')
+    if op is _C.IN:
+        return frozenset(c for c in _SAMPLE if _in(c, av))
+    return None
+
+
+def _word(c):
+    return c.isalnum() or c == '_'
+
+
+# category: (test, negated)
+_CATEGORIES = {
+    _C.CATEGORY_DIGIT: (str.isdigit, False),
+    _C.CATEGORY_NOT_DIGIT: (str.isdigit, True),
+    _C.CATEGORY_SPACE: (str.isspace, False),
+    _C.CATEGORY_NOT_SPACE: (str.isspace, True),
+    _C.CATEGORY_WORD: (_word, False),
+    _C.CATEGORY_NOT_WORD: (_word, True),
+}
+
+
+def _in(c, items):
+    negate = False
+    hit = False
+    for op, av in items:
+        if op is _C.NEGATE:
+            negate = True
+        elif op is _C.LITERAL:
+            hit = hit or ord(c) == av
+        elif op is _C.RANGE:
+            hit = hit or av[0] <= ord(c) <= av[1]
+        elif op is _C.CATEGORY:
+            if av not in _CATEGORIES:
+                return True  # line breaks and the like: assume it matches
+            test, negated = _CATEGORIES[av]
+            hit = hit or test(c) != negated
+    return hit != negate
+
+
+def _repeat_chars(op, av):
+    """Characters of an unbounded repeat of a single-character item, else None"""
+    if op not in _REPEATS or not _unbounded(av) or len(av[2]) != 1:
+        return None
+    return _chars(*av[2][0])
+
+
+def _adjacent(items, found):
+    """Two unbounded single-character repeats that can trade characters (`\\s*\\n\\s*`)"""
+    for i, (op, av) in enumerate(items):
+        first = _repeat_chars(op, av)
+        if not first:
+            continue
+        for op2, av2 in items[i + 1:]:
+            second = _repeat_chars(op2, av2)
+            if second is not None:
+                if first & second:
+                    found.append("adjacent quantifiers over overlapping characters (polynomial backtracking)")
+                break
+            # Only characters the first repeat could also take keep the ambiguity alive
+            between = _chars(op2, av2)
+            if between is None or not between <= first:
+                break
+
+
+def _overlapping_branches(branches):
+    firsts = []
+    for branch in branches:
+        if not branch:
+            return True
+        op, av = branch[0]
+        chars = _chars(op, av) if op not in _REPEATS else _repeat_chars(op, av)
+        if chars is None:
+            return False  # can't tell; stay quiet rather than guess
+        firsts.append(chars)
+    return any(a & b for i, a in enumerate(firsts) for b in firsts[i + 1:])
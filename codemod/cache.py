@@ -0,0 +1,86 @@
+"""
+Persistent result cache for the codemod scripts
+Remembers (rule-set hash, file content hash) pairs that produced no change,
+so repeated runs skip files neither side has touched since
+"""
+
+import hashlib
+import sqlite3
+import time
+from pathlib import Path
+
+CACHE_DIR = Path('.codemod-cache')
+CACHE_PATH = CACHE_DIR / 'results.sqlite3'
+MAX_ENTRIES = 100_000
+
+_reader = None
+
+
+def digest(data):
+    """Content hash used as the per-file cache key"""
+    return hashlib.sha1(data).hexdigest()
+
+
+def fingerprint(*parts):
+    """Stable hash of a rule set (patterns, replacements, options)"""
+    h = hashlib.sha1()
+    for part in parts:
+        h.update(repr(part).encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def source_key(*paths):
+    """fingerprint() of source files (a missing file counts as empty), for transforms that aren't rule sets"""
+    h = hashlib.sha1()
+    for path in paths:
+        try:
+            h.update(Path(path).read_bytes())
+        except OSError:
+            pass
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def is_clean(rules_key, content_digest, path=CACHE_PATH):
+    """True if this content is known to be left unchanged by this rule set"""
+    global _reader
+    if _reader is None:
+        if not path.exists():
+            return False
+        # Read-only so pool workers never contend with the writer
+        _reader = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        row = _reader.execute(
+            'SELECT 1 FROM clean WHERE rules = ? AND digest = ?',
+            (rules_key, content_digest),
+        ).fetchone()
+    except sqlite3.Error:
+        return False
+    return row is not None
+
+
+def mark_clean(rules_key, digests, max_entries=MAX_ENTRIES, path=CACHE_PATH):
+    """Record unchanged results and evict the least recently used entries over the cap"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    now = time.time()
+    with sqlite3.connect(path) as db:
+        db.execute(
+            'CREATE TABLE IF NOT EXISTS clean ('
+            'rules TEXT, digest TEXT, used REAL, PRIMARY KEY (rules, digest))'
+        )
+        db.executemany(
+            'INSERT OR REPLACE INTO clean (rules, digest, used) VALUES (?, ?, ?)',
+            ((rules_key, d, now) for d in digests),
+        )
+        db.execute(
+            'DELETE FROM clean WHERE rowid IN ('
+            'SELECT rowid FROM clean ORDER BY used DESC LIMIT -1 OFFSET ?)',
+            (max_entries,),
+        )
+    db.close()
+
+
+def clear(path=CACHE_PATH):
+    if path.exists():
+        path.unlink()
@@ -0,0 +1,357 @@
+"""
+Long-running watch daemon for the tree-walking codemods
+Loads the rule sets of fix_all_prisma.py / fix_req_user.py (or any script
+with a module-level RULES) once, watches the source trees with inotify and
+re-applies the rules to each file as soon as it is saved. A thin client
+triggers a full-tree run against the warm state (compiled rules, word index,
+result cache) over a Unix socket:
+
+    python3 -m codemod.daemon start &        # watch apps/api/src, apps/api/scripts and apps/web/src
+    python3 -m codemod.daemon run            # full-tree run, output streamed back line by line
+    python3 -m codemod.daemon status
+    python3 -m codemod.daemon stop
+
+Rewrites made on save go to one journal per daemon session, so the whole
+session can be undone with `python3 -m codemod.journal rollback`.
+"""
+
+import argparse
+import contextlib
+import ctypes
+import ctypes.util
+import json
+import os
+import selectors
+import socket
+import struct
+import sys
+import time
+from pathlib import Path
+
+from codemod import journal, runner
+from codemod.cache import CACHE_DIR
+
+SOCKET_PATH = CACHE_DIR / 'daemon.sock'
+WATCH = ['apps/api/src', 'apps/api/scripts', 'apps/web/src']
+SCRIPTS = ['fix_all_prisma.py', 'fix_req_user.py']
+
+# Saves often arrive as several events (truncate, write, rename); wait this long for the rest
+DEBOUNCE = 0.02
+POLL_INTERVAL = 0.5
+
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+_EVENT = struct.Struct('iIII')
+
+
+class Inotify:
+    """Recursive inotify watch over directory trees (Linux, via libc)"""
+
+    MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+    def __init__(self, roots):
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.dirs = {}
+        for root in roots:
+            self.add_tree(root)
+
+    def add_tree(self, root):
+        for dirpath, dirnames, _ in os.walk(root):
+            dirnames[:] = [d for d in dirnames if d not in runner.SKIP_DIRS]
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dirpath), self.MASK)
+            if wd >= 0:
+                self.dirs[wd] = dirpath
+
+    def fileno(self):
+        return self.fd
+
+    def read(self):
+        """Paths of files written or moved into place since the last read"""
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        paths = []
+        pos = 0
+        while pos < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, pos)
+            pos += _EVENT.size
+            name = os.fsdecode(data[pos:pos + length].rstrip(b'\0'))
+            pos += length
+            if mask & IN_IGNORED:
+                self.dirs.pop(wd, None)
+                continue
+            if wd not in self.dirs:
+                continue
+            path = os.path.join(self.dirs[wd], name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and name not in runner.SKIP_DIRS:
+                    self.add_tree(path)
+                continue
+            if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                paths.append(path)
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+class Poller:
+    """mtime polling fallback where inotify isn't available"""
+
+    def __init__(self, roots, suffixes):
+        self.roots = roots
+        self.suffixes = suffixes
+        self.seen = self._stat()
+
+    def _stat(self):
+        found = {}
+        for path in runner.iter_files(self.roots, self.suffixes):
+            with contextlib.suppress(FileNotFoundError):
+                st = path.stat()
+                found[str(path)] = (st.st_mtime_ns, st.st_size)
+        return found
+
+    def read(self):
+        now = self._stat()
+        changed = [path for path, st in now.items() if self.seen.get(path) != st]
+        self.seen = now
+        return changed
+
+    def close(self):
+        pass
+
+
+class Daemon:
+    """Warm rule sets plus a watcher; serves client commands on a Unix socket"""
+
+    def __init__(self, scripts, roots, suffixes, jobs):
+        self.rule_sets = []
+        for script in scripts:
+            module = runner.load_script(script)
+            if not hasattr(module, 'RULES'):
+                raise ValueError(f"{script} has no module-level RULES")
+            rules = module.RULES
+            # Same fallback as codemod.packs: keep one-rule-at-a-time semantics where order matters
+            transform = rules.sequential if rules.conflicts() else rules
+            self.rule_sets.append((Path(script).stem, transform, rules.fingerprint,
+                                   tuple(getattr(module, 'SKIP', ()))))
+        self.roots = [root for root in roots if os.path.isdir(root)]
+        self.suffixes = suffixes
+        self.jobs = jobs
+        self.written = {}
+        self.stats = {'started': time.time(), 'saves': 0, 'rewritten': 0, 'rejected': 0, 'runs': 0, 'last_ms': None}
+        try:
+            self.watcher = Inotify(self.roots)
+        except (OSError, AttributeError):
+            self.watcher = Poller(self.roots, suffixes)
+        self.journal = journal.Journal(batch_size=1)
+
+    def on_save(self, paths):
+        """Re-apply every rule set to saved files; returns the lines to log"""
+        out = []
+        for path in dict.fromkeys(paths):
+            if not path.endswith(self.suffixes) or not os.path.exists(path):
+                continue
+            start = time.perf_counter()
+            with open(path, 'rb') as f:
+                data = f.read()
+            # Our own rewrite coming back as an event
+            if self.written.pop(path, None) == data:
+                continue
+            self.stats['saves'] += 1
+            for name, rules, _, skip in self.rule_sets:
+                if any(s in os.path.basename(path) for s in skip):
+                    continue
+                result = runner.rewrite_file(path, rules, staged=True, check=True)
+                if result.problems:
+                    self.stats['rejected'] += 1
+                if result.pending is not None:
+                    tmp, after = result.pending
+                    self.journal.add(path, tmp, result.digest, after)
+                    with open(path, 'rb') as f:
+                        self.written[path] = f.read()
+                    self.stats['rewritten'] += 1
+                    out.append(f"✓ {name}: {path}")
+            self.stats['last_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        return out
+
+    def full_run(self, out, paths=None):
+        """Every rule set over the whole tree, with the warm index and cache, written to out as it goes"""
+        parser = argparse.ArgumentParser()
+        runner.add_arguments(parser, self.roots)
+        args = parser.parse_args([*(paths or self.roots), '--ext', ','.join(self.suffixes), '-j', str(self.jobs)])
+        # The runner's own lines (REJECTED, ERROR, journal) go to the client too
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(out):
+            for name, rules, rules_key, skip in self.rule_sets:
+                fixed = total = 0
+                for path, result in runner.rewrite_tree(args, rules, rules_key, skip=skip):
+                    total += 1
+                    if result.changed:
+                        fixed += 1
+                        print(f"✓ {name}: {path}", flush=True)
+                    elif runner.failed(result):
+                        self.stats['rejected'] += 1
+                        print(f"✗ {name}: {runner.outcome(result)} {path}", flush=True)
+                print(f"✅ {name}: fixed {fixed} of {total} files", flush=True)
+        self.stats['runs'] += 1
+
+    def handle(self, request, out):
+        """Answer one client request on out; returns whether to keep serving"""
+        command = request.get('command')
+        if command == 'run':
+            start = time.perf_counter()
+            self.full_run(out, request.get('paths'))
+            out.write(f"({time.perf_counter() - start:.2f}s warm)\n")
+            return True
+        if command == 'status':
+            watcher = type(self.watcher).__name__.lower()
+            out.write(json.dumps({**self.stats, 'watcher': watcher, 'roots': self.roots,
+                                  'rules': [name for name, *_ in self.rule_sets]}, indent=1) + '\n')
+            return True
+        if command == 'stop':
+            out.write("Stopping\n")
+            return False
+        out.write(f"Unknown command {command!r}\n")
+        return True
+
+    def serve(self, socket_path=SOCKET_PATH):
+        socket_path = Path(socket_path)
+        socket_path.parent.mkdir(parents=True, exist_ok=True)
+        with contextlib.suppress(FileNotFoundError):
+            socket_path.unlink()
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(os.fspath(socket_path))
+        server.listen()
+        selector = selectors.DefaultSelector()
+        selector.register(server, selectors.EVENT_READ, 'client')
+        polling = isinstance(self.watcher, Poller)
+        if not polling:
+            selector.register(self.watcher, selectors.EVENT_READ, 'watch')
+        print(f"Watching {', '.join(self.roots)} ({type(self.watcher).__name__}), "
+              f"{len(self.rule_sets)} rule sets warm, socket {socket_path}", flush=True)
+        running = True
+        try:
+            while running:
+                for key, _ in selector.select(POLL_INTERVAL if polling else None):
+                    if key.data == 'watch':
+                        paths = self.watcher.read()
+                        time.sleep(DEBOUNCE)
+                        paths += self.watcher.read()
+                        self._log(self.on_save(paths))
+                    else:
+                        running = self._client(server)
+                if polling:
+                    self._log(self.on_save(self.watcher.read()))
+        finally:
+            selector.close()
+            server.close()
+            with contextlib.suppress(FileNotFoundError):
+                socket_path.unlink()
+            self.watcher.close()
+            self.journal.close()
+
+    def _client(self, server):
+        conn, _ = server.accept()
+        running = True
+        # A client that hung up mid-reply leaves nothing to flush to
+        with conn, contextlib.suppress(OSError), conn.makefile('rw', encoding='utf-8') as stream:
+            try:
+                request = json.loads(stream.readline() or '{}')
+            except ValueError:
+                request = {}
+            out = _Reply(stream)
+            running = self.handle(request, out)
+            out.flush()
+        return running
+
+    def _log(self, lines):
+        for line in lines:
+            print(f"{line} ({self.stats['last_ms']} ms)", flush=True)
+
+
+class _Reply:
+    """A client's reply stream, flushed line by line; a client that hangs up doesn't stop the run"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.gone = False
+
+    def write(self, text):
+        if not self.gone:
+            try:
+                self.stream.write(text)
+                if '\n' in text:
+                    self.stream.flush()
+            except OSError:
+                self.gone = True
+        return len(text)
+
+    def flush(self):
+        if not self.gone:
+            try:
+                self.stream.flush()
+            except OSError:
+                self.gone = True
+
+
+def request(command, paths=None, socket_path=SOCKET_PATH, out=None):
+    """Send one command to a running daemon, copying its reply to out (default: stdout) as it arrives"""
+    out = out or sys.stdout
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(os.fspath(socket_path))
+    with client, client.makefile('rw', encoding='utf-8') as stream:
+        stream.write(json.dumps({'command': command, 'paths': paths}) + '\n')
+        stream.flush()
+        client.shutdown(socket.SHUT_WR)
+        for line in stream:
+            out.write(line)
+            out.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python3 -m codemod.daemon', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--socket', default=SOCKET_PATH, type=Path, help=f"control socket (default: {SOCKET_PATH})")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('start', help="load the rules and watch in the foreground")
+    p.add_argument('paths', nargs='*', default=WATCH, help=f"trees to watch (default: {' '.join(WATCH)})")
+    p.add_argument('--script', dest='scripts', action='append',
+                   help=f"script with a module-level RULES, repeatable (default: {', '.join(SCRIPTS)})")
+    p.add_argument('--ext', type=lambda s: tuple(s.split(',')), default=('.ts', '.tsx'),
+                   help="comma-separated extensions (default: .ts,.tsx, as apps/web/src is watched)")
+    p.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                   help="worker processes for full-tree runs (default: one per core)")
+    p = sub.add_parser('run', help="full-tree run in the daemon")
+    p.add_argument('paths', nargs='*', help="limit the run to these paths")
+    sub.add_parser('status', help="show counters and latency")
+    sub.add_parser('stop', help="stop the daemon")
+    args = parser.parse_args(argv)
+
+    if args.command == 'start':
+        try:
+            daemon = Daemon(args.scripts or SCRIPTS, args.paths, args.ext, args.jobs)
+        except (OSError, ValueError) as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            return 1
+        with contextlib.suppress(KeyboardInterrupt):
+            daemon.serve(args.socket)
+        return 0
+
+    try:
+        request(args.command, getattr(args, 'paths', None) or None, args.socket)
+    except (FileNotFoundError, ConnectionRefusedError):
+        print(f"ERROR: No daemon listening on {args.socket} (start one with "
+              f"`python3 -m codemod.daemon start`)", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""
+Apply the fixes tsc itself suggests
+Reads a saved `tsc --noEmit --pretty false` log, groups the diagnostics by
+file and offset in one pass, and applies every fix it can in one batch per
+file instead of one hand-written regex (and one tsc run) per error:
+
+    TS2551/TS2561  "Did you mean 'x'?"          rename to the suggestion
+    TS1117         duplicate property            drop the overridden copy
+    TS2741/TS2739  missing required property     add it with a known value
+
+    npx tsc --noEmit --pretty false > tsc.log
+    python3 -m codemod.diagnostics tsc.log --root apps/api
+"""
+
+import argparse
+import os
+import re
+import sys
+from collections import Counter, namedtuple
+from functools import partial
+
+from codemod import objects, runner
+
+Diagnostic = namedtuple('Diagnostic', 'path line col code message')
+
+# `path(line,col): error TSnnnn: message` (--pretty false) or `path:line:col - error TSnnnn: message`
+LINE_RE = re.compile(
+    r'^(?P<path>[^\s(][^(]*?)(?:\((?P<line>\d+),(?P<col>\d+)\)|:(?P<line2>\d+):(?P<col2>\d+)) ?[:-] '
+    r'error TS(?P<code>\d+): (?P<message>.*)$')
+ANSI_RE = re.compile(r'\x1b\[[0-9;]*m')
+
+SUGGESTION_RE = re.compile(r"'(?P<old>[^']+)' does not exist .*Did you mean(?: to write)? '(?P<new>[^']+)'\?$")
+MISSING_RE = re.compile(r"^Property '(?P<key>[^']+)' is missing in type")
+MISSING_LIST_RE = re.compile(r"is missing the following properties from type '.*': (?P<keys>[\w$, ]+?)\.?$")
+
+RENAME = {2551, 2561}
+DUPLICATE = {1117}
+MISSING = {2741, 2739}
+FIXABLE = RENAME | DUPLICATE | MISSING
+
+# Values for required fields tsc reports as missing (same as the fix scripts inject)
+MISSING_VALUES = {'id': 'crypto.randomUUID()', 'updatedAt': 'new Date()'}
+
+
+def parse(lines):
+    """Diagnostics from tsc output lines; related-information lines are ignored"""
+    found = []
+    for line in lines:
+        m = LINE_RE.match(ANSI_RE.sub('', line.rstrip('\n')))
+        if m is None:
+            continue
+        found.append(Diagnostic(
+            m['path'], int(m['line'] or m['line2']), int(m['col'] or m['col2']), int(m['code']), m['message']))
+    return found
+
+
+def by_file(diagnostics, root='.', codes=FIXABLE):
+    """{path: [Diagnostic]} for the diagnostics we know how to fix, paths joined to root"""
+    files = {}
+    for d in diagnostics:
+        if d.code in codes:
+            files.setdefault(os.path.normpath(os.path.join(root, d.path)), []).append(d)
+    return files
+
+
+def line_starts(content):
+    starts = [0]
+    for m in re.finditer('\n', content):
+        starts.append(m.end())
+    return starts
+
+
+def offset(content, starts, line, col):
+    """Offset of a 1-based tsc line/column (columns count UTF-16 code units)"""
+    if line > len(starts):
+        return None
+    pos = starts[line - 1]
+    units = col - 1
+    while units > 0 and pos < len(content) and content[pos] != '\n':
+        units -= 2 if ord(content[pos]) > 0xFFFF else 1
+        pos += 1
+    return pos
+
+
+class Report:
+    """Per-code counts of fixed, stale and unsupported diagnostics"""
+
+    def __init__(self):
+        self.fixed = Counter()
+        self.stale = Counter()
+        self.unsupported = Counter()
+
+    def total(self, counter):
+        return sum(counter.values())
+
+
+def fix_content(content, diagnostics, report=None, values=MISSING_VALUES):
+    """Apply the fixes for one file's diagnostics in a single batch"""
+    report = report or Report()
+    starts = line_starts(content)
+    literals = objects.scan(content)
+    by_start = {o.start: o for o in literals}
+    props = {p.start: (literal, p) for literal in literals for p in literal.props}
+    edits = set()
+    inserts = {}
+
+    for d in diagnostics:
+        at = offset(content, starts, d.line, d.col)
+        if d.code in RENAME:
+            edit = _rename(content, at, d.message)
+            if edit is None:
+                report.stale[d.code] += 1
+                continue
+            edits.add(edit)
+        elif d.code in DUPLICATE:
+            found = props.get(at)
+            if found is None:
+                report.stale[d.code] += 1
+                continue
+            literal, prop = found
+            for other in literal.props:
+                if other.key == prop.key and other.start < prop.start:
+                    edits.add(objects.removal(content, other))
+        else:
+            literal = by_start.get(at)
+            if literal is None and at in props and props[at][1].value_start in by_start:
+                literal = by_start[props[at][1].value_start]
+            if literal is None:
+                report.stale[d.code] += 1
+                continue
+            keys = _missing_keys(d.message)
+            if not keys or any(k not in values for k in keys):
+                report.unsupported[d.code] += 1
+                continue
+            keys = [k for k in keys if k not in objects.keys(literal)]
+            if not keys:
+                report.stale[d.code] += 1
+                continue
+            wanted = inserts.setdefault(literal.start, [])
+            wanted.extend(k for k in keys if k not in wanted)
+        report.fixed[d.code] += 1
+
+    for start, keys in inserts.items():
+        edits.add((start + 1, start + 1, ' ' + ' '.join(f'{k}: {values[k]},' for k in keys)))
+    return objects.apply_edits(content, edits)
+
+
+def _rename(content, at, message):
+    m = SUGGESTION_RE.search(message)
+    if m is None or at is None:
+        return None
+    old, new = m['old'], m['new']
+    # Quoted object keys are reported at the quote
+    if content[at:at + 1] in ('"', "'"):
+        at += 1
+    end = at + len(old)
+    if content[at:end] != old or (end < len(content) and (content[end].isalnum() or content[end] in '_$')):
+        return None
+    return (at, end, new)
+
+
+def _missing_keys(message):
+    m = MISSING_RE.match(message)
+    if m:
+        return [m['key']]
+    m = MISSING_LIST_RE.search(message)
+    if m and 'more' not in message:
+        return [k.strip() for k in m['keys'].split(',')]
+    return []
+
+
+def transforms(diagnostics, root='.', report=None, codes=FIXABLE):
+    """{path: transform} for every file with fixable diagnostics"""
+    return {path: partial(fix_content, diagnostics=found, report=report)
+            for path, found in by_file(diagnostics, root, codes).items()}
+
+
+def parse_codes(spec):
+    """Codes from 'TS2551,1117', for argparse; only codes this module can fix"""
+    try:
+        found = {int(c.strip().upper().removeprefix('TS')) for c in spec.split(',') if c.strip()}
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected codes like TS2551,TS1117, got {spec!r}") from None
+    if not found:
+        raise argparse.ArgumentTypeError("no codes given")
+    unknown = found - FIXABLE
+    if unknown:
+        raise argparse.ArgumentTypeError(f"can't fix {', '.join(f'TS{c}' for c in sorted(unknown))} "
+                                         f"(supported: {', '.join(f'TS{c}' for c in sorted(FIXABLE))})")
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python3 -m codemod.diagnostics', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('log', type=argparse.FileType('r', encoding='utf-8'),
+                        help="saved `tsc --noEmit --pretty false` output ('-' for stdin)")
+    parser.add_argument('--root', default='.',
+                        help="directory tsc ran in; its paths are relative to it (default: .)")
+    parser.add_argument('--only', type=parse_codes, default=FIXABLE,
+                        help=f"comma-separated codes to fix, from {', '.join(f'TS{c}' for c in sorted(FIXABLE))} "
+                             f"(default: all)")
+    runner.add_output_arguments(parser)
+    args = parser.parse_args(argv)
+
+    diagnostics = parse(args.log)
+    report = Report()
+    out = runner.status(args)
+    failures = 0
+    for path, result in runner.rewrite_paths(transforms(diagnostics, args.root, report, args.only), args):
+        print(f"{runner.outcome(result)} {path}", file=out)
+        failures += runner.failed(result)
+
+    fixed = report.total(report.fixed)
+    handled = fixed + report.total(report.stale) + report.total(report.unsupported)
+    print(f"\n✅ Applied {fixed} of {handled} fixable diagnostics "
+          f"({', '.join(f'TS{c}: {n}' for c, n in sorted(report.fixed.items())) or 'none'})", file=out)
+    if report.stale:
+        print(f"⚠ {report.total(report.stale)} no longer match the source (stale log?)", file=out)
+    if report.unsupported:
+        print(f"⚠ {report.total(report.unsupported)} missing properties have no known value", file=out)
+    rest = len(diagnostics) - handled
+    if rest:
+        print(f"{rest} other diagnostics left", file=out)
+    return runner.exit_status(failures)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
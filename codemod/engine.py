@@ -0,0 +1,434 @@
+"""
+Single-pass rewrite engine
+Compiles an ordered list of (pattern, replacement) rules into one alternation
+so a file is scanned once instead of once per rule
+"""
+
+import re
+import time
+
+from codemod import budget
+from codemod.cache import fingerprint
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+_C = sre_constants
+
+# Bump when rewrite semantics change so cached results are invalidated
+VERSION = 1
+
+
+class Rule:
+    """One (pattern, replacement) pair with its single-pass form"""
+
+    def __init__(self, index, pattern, replacement):
+        self.index = index
+        self.pattern = pattern
+        self.replacement = replacement
+        self.regex = re.compile(pattern)
+        self.is_template = '\\' in replacement
+        self.group = f'_r{index}'
+
+        parsed = sre_parse.parse(pattern)
+        if _has_groupref(parsed.data):
+            raise ValueError(f"Backreferences are not supported in rule patterns: {pattern}")
+        # Catastrophic-backtracking risks, reported when the rules are loaded (codemod.budget)
+        self.hazards = budget.hazards(pattern)
+
+        # A literal separator the replacement re-emits unchanged (e.g. the
+        # dots around `\.user\.` -> `.users.`) is matched as lookaround, so
+        # neighbouring rules can still see it in a single scan
+        self.core, self.core_replacement = pattern, replacement
+        self.lead = self.trail = 0
+        if not self.is_template:
+            self._split_context(parsed)
+        self.core_regex = re.compile(self.core)
+        self.anchor = _literal_prefix(parsed.data)
+        # Literal text every match contains, for planning with codemod.index
+        self.phrases = None
+        if not parsed.state.flags & re.IGNORECASE:
+            self.phrases = [run for run in _literal_runs(parsed.data) if re.search(r'\w', run)] or None
+
+        # Byte-level twin for memory-mapped input. Exact for any UTF-8 input
+        # when byte_exact, otherwise only for ASCII input
+        self.byte_exact = (pattern.isascii() and replacement.isascii()
+                           and not parsed.state.flags & re.IGNORECASE
+                           and not _unicode_sensitive(parsed.data))
+        if pattern.isascii() and replacement.isascii():
+            self.core_regex_b = re.compile(self.core.encode())
+            self.anchor_b = self.anchor.encode()
+            self.replacement_b = (replacement if self.is_template else self.core_replacement).encode()
+        else:
+            self.core_regex_b = None
+
+    def _split_context(self, parsed):
+        items = list(parsed.data)
+        if not items or any(op is _C.BRANCH for op, _ in items):
+            return
+        body, repl = self.pattern, self.replacement
+        lead = trail = ''
+        op, av = items[0]
+        if _is_separator(op, av) and len(items) > 1 and repl[:1] == chr(av):
+            stripped = _strip_prefix(body, items[1:])
+            if stripped is not None:
+                body, repl, lead = stripped, repl[1:], chr(av)
+                items = items[1:]
+        op, av = items[-1]
+        if _is_separator(op, av) and len(items) > 1 and repl[-1:] == chr(av):
+            stripped = _strip_suffix(body, items[:-1])
+            if stripped is not None:
+                body, repl, trail = stripped, repl[:-1], chr(av)
+        if lead:
+            body = f'(?<={re.escape(lead)})' + body
+        if trail:
+            body = body + f'(?={re.escape(trail)})'
+        self.core, self.core_replacement = body, repl
+        self.lead, self.trail = len(lead), len(trail)
+
+    def example(self):
+        """A short string this rule matches, or None when one can't be built"""
+        sample = _example(sre_parse.parse(self.pattern).data)
+        if sample is None or not self.regex.search(sample):
+            return None
+        return sample
+
+    def __repr__(self):
+        return f'Rule({self.pattern!r} -> {self.replacement!r})'
+
+
+class RuleSet:
+    """Ordered rules applied in one scan with a dispatch table per match"""
+
+    def __init__(self, rules):
+        self.rules = [Rule(i, p, r) for i, (p, r) in enumerate(rules)]
+        self.fingerprint = fingerprint(VERSION, [(r.pattern, r.replacement) for r in self.rules])
+        # Literal anchors go first so the scan skips straight to candidate
+        # positions; rules without one fall back to their own pattern
+        alternatives = []
+        for rule in sorted(self.rules, key=lambda r: -len(r.anchor)):
+            alternatives.append(re.escape(rule.anchor) if rule.anchor else f'(?:{rule.pattern})')
+        self.prefilter = re.compile('|'.join(alternatives)) if alternatives else None
+        self.prefilter_b = None
+        if alternatives and all(rule.core_regex_b is not None for rule in self.rules):
+            self.prefilter_b = re.compile('|'.join(alternatives).encode())
+
+    def __len__(self):
+        return len(self.rules)
+
+    def hazards(self):
+        """(pattern, reason) for each rule that may backtrack catastrophically"""
+        return [(rule.pattern, reason) for rule in self.rules for reason in rule.hazards]
+
+    def rewrite(self, content):
+        """
+        Apply every rule in a single scan, returns (content, per-rule match counts).
+        A scan over the time budget falls back to one guarded pass per rule,
+        skipping (and recording) the rules that run out.
+        """
+        try:
+            with budget.limit('(single pass)'):
+                return self._rewrite(content)
+        except budget.BudgetExceeded:
+            return self._guarded(content)
+
+    def _rewrite(self, content):
+        counts = [0] * len(self.rules)
+        out = []
+        emitted = 0
+        for rule, start, end, replacement in self._scan(content):
+            out.append(content[emitted:start])
+            out.append(replacement)
+            emitted = end
+            counts[rule.index] += 1
+        if not out:
+            return content, counts
+        out.append(content[emitted:])
+        return ''.join(out), counts
+
+    def __call__(self, content):
+        return self.rewrite(content)[0]
+
+    def _guarded(self, content):
+        # Same result as the single scan for rule sets without conflicts()
+        counts = [0] * len(self.rules)
+        for rule in self.rules:
+            try:
+                with budget.limit(rule.pattern):
+                    content, counts[rule.index] = rule.regex.subn(rule.replacement, content)
+            except budget.BudgetExceeded as e:
+                budget.overrun(e)
+        return content, counts
+
+    def profile(self, content):
+        """
+        rewrite() plus per-rule (label, hits, seconds, bytes scanned). Hits are
+        the rule's applied matches; the time is the rule scanning the file on
+        its own, since the single pass can't split its time between rules.
+        """
+        new_content, counts = self.rewrite(content)
+        size = len(content.encode('utf-8'))
+        stats = []
+        for rule in self.rules:
+            start = time.perf_counter()
+            try:
+                with budget.limit(rule.pattern):
+                    for _ in rule.regex.finditer(content):
+                        pass
+            except budget.BudgetExceeded:
+                pass  # rewrite() already recorded it
+            stats.append((rule.pattern, counts[rule.index], time.perf_counter() - start, size))
+        return new_content, stats
+
+    def requirements(self):
+        """Per rule, the literal phrases every match contains (None if unknown)"""
+        return [rule.phrases for rule in self.rules]
+
+    def edits(self, buffer, ascii_input=None, counts=None):
+        """
+        (start, end, replacement) byte edits for a bytes-like buffer (e.g. an
+        mmap), or None when byte matching could differ from str matching.
+        ascii_input is a callable telling whether the buffer is pure ASCII.
+        counts, if given, is a per-rule list the applied matches are added to.
+        """
+        if any(rule.core_regex_b is None for rule in self.rules):
+            return None
+        if not all(rule.byte_exact for rule in self.rules):
+            if ascii_input is None or not ascii_input():
+                return None
+        try:
+            with budget.limit('(single pass)'):
+                found = []
+                for rule, start, end, replacement in self._scan(buffer, binary=True):
+                    found.append((start, end, replacement))
+                    if counts is not None:
+                        counts[rule.index] += 1
+                return found
+        except budget.BudgetExceeded:
+            # The text path runs the rules one at a time under the budget
+            return None
+
+    def _scan(self, content, binary=False):
+        """Yield (rule, start, end, replacement) for each applied match, in order"""
+        # End of the last applied match per rule, context included, so a rule
+        # never reuses a separator it already consumed (same as re.sub would)
+        consumed = [0] * len(self.rules)
+        emitted = pos = 0
+        prefilter = self.prefilter_b if binary else self.prefilter
+        search = prefilter.search if prefilter else None
+        while search:
+            hit = search(content, pos)
+            if hit is None:
+                break
+            at = hit.start()
+            pos = at + 1
+            for rule in self.rules:
+                anchor = rule.anchor_b if binary else rule.anchor
+                if anchor and content[at:at + len(anchor)] != anchor:
+                    continue
+                regex = rule.core_regex_b if binary else rule.core_regex
+                m = regex.match(content, at + rule.lead)
+                if m is None or m.start() < emitted or m.start() - rule.lead < consumed[rule.index]:
+                    continue
+                start, end = m.span()
+                consumed[rule.index] = end + rule.trail
+                if binary:
+                    replacement = m.expand(rule.replacement_b) if rule.is_template else rule.replacement_b
+                elif rule.is_template:
+                    replacement = m.expand(rule.replacement)
+                else:
+                    replacement = rule.core_replacement
+                yield rule, start, end, replacement
+                emitted = end
+                pos = max(end, pos)
+                break
+
+    def sequential(self, content):
+        """Reference semantics: one re.sub per rule, in order (each under the time budget)"""
+        return self._guarded(content)[0]
+
+    def conflicts(self):
+        """
+        Probe rule pairs for inputs where a single scan and the sequential
+        re.sub loop disagree. Returns a list of (rule, other_rule, sample).
+        """
+        samples = []
+        for rule in self.rules:
+            sample = rule.example()
+            if sample is not None:
+                samples.append((rule, sample, rule.regex.sub(rule.replacement, sample)))
+
+        found = []
+        seen = set()
+        for rule, a, out in samples:
+            for other, b, _ in samples:
+                key = (min(rule.index, other.index), max(rule.index, other.index))
+                if key in seen:
+                    continue
+                for probe in probes(a, b, out):
+                    if self.rewrite(probe)[0] != self.sequential(probe):
+                        seen.add(key)
+                        found.append((rule, other, probe))
+                        break
+        return found
+
+
+def probes(a, b, out):
+    """Inputs where `a` (rewritten to `out`) sits next to or feeds `b`"""
+    yield a
+    yield a + b
+    yield a + ' ' + b
+    for text in (a, out):
+        for k in range(min(len(text), len(b)), 0, -1):
+            if text.endswith(b[:k]):
+                yield a + b[k:]
+                break
+
+
+def _literal_prefix(items):
+    prefix = []
+    for op, av in items:
+        if op is not _C.LITERAL:
+            break
+        prefix.append(chr(av))
+    return ''.join(prefix)
+
+
+def _literal_runs(items):
+    """Runs of consecutive top-level literals (each must appear in any match)"""
+    runs = ['']
+    for op, av in items:
+        if op is _C.LITERAL:
+            runs[-1] += chr(av)
+        elif runs[-1]:
+            runs.append('')
+    return [run for run in runs if run]
+
+
+def _is_separator(op, av):
+    return op is _C.LITERAL and not (chr(av).isalnum() or chr(av) == '_')
+
+
+def _has_groupref(items):
+    for op, av in items:
+        if op in (_C.GROUPREF, _C.GROUPREF_EXISTS):
+            return True
+        for sub in _subpatterns(op, av):
+            if _has_groupref(sub):
+                return True
+    return False
+
+
+def _subpatterns(op, av):
+    if op is _C.SUBPATTERN:
+        return [av[-1].data]
+    if op in (_C.MAX_REPEAT, _C.MIN_REPEAT, getattr(_C, 'POSSESSIVE_REPEAT', None)):
+        return [av[2].data]
+    if op is _C.BRANCH:
+        return [s.data for s in av[1]]
+    if op in (_C.ASSERT, _C.ASSERT_NOT):
+        return [av[1].data]
+    if op is getattr(_C, 'ATOMIC_GROUP', None):
+        return [av.data]
+    return []
+
+
+def _unicode_sensitive(items):
+    """
+    True if matching can differ between str and UTF-8 bytes on non-ASCII
+    input: \\w, \\b, \\s, \\d, `.` and negated sets
+    """
+    for op, av in items:
+        if op in (_C.CATEGORY, _C.ANY, _C.NOT_LITERAL):
+            return True
+        if op is _C.AT and av in (_C.AT_BOUNDARY, _C.AT_NON_BOUNDARY):
+            return True
+        if op is _C.IN and any(sub_op in (_C.CATEGORY, _C.NEGATE) for sub_op, _ in av):
+            return True
+        for sub in _subpatterns(op, av):
+            if _unicode_sensitive(sub):
+                return True
+    return False
+
+
+def _strip_prefix(pattern, rest):
+    """Drop the leading literal from a pattern string, verified by re-parsing"""
+    for cut in (2, 1):
+        candidate = pattern[cut:]
+        try:
+            if list(sre_parse.parse(candidate).data) == rest:
+                return candidate
+        except re.error:
+            continue
+    return None
+
+
+def _strip_suffix(pattern, rest):
+    for cut in (2, 1):
+        candidate = pattern[:-cut]
+        try:
+            if list(sre_parse.parse(candidate).data) == rest:
+                return candidate
+        except re.error:
+            continue
+    return None
+
+
+def _example(items):
+    """Build a short string the parsed pattern matches, or None"""
+    out = []
+    for op, av in items:
+        if op is _C.LITERAL:
+            out.append(chr(av))
+        elif op is _C.NOT_LITERAL:
+            out.append('y' if chr(av) == 'x' else 'x')
+        elif op is _C.ANY:
+            out.append('x')
+        elif op is _C.IN:
+            ch = _class_example(av)
+            if ch is None:
+                return None
+            out.append(ch)
+        elif op in (_C.MAX_REPEAT, _C.MIN_REPEAT):
+            lo, _, sub = av
+            part = _example(sub.data)
+            if part is None:
+                return None
+            out.append(part * lo)
+        elif op is _C.SUBPATTERN:
+            part = _example(av[-1].data)
+            if part is None:
+                return None
+            out.append(part)
+        elif op is _C.BRANCH:
+            part = _example(av[1][0].data)
+            if part is None:
+                return None
+            out.append(part)
+        elif op in (_C.AT, _C.ASSERT, _C.ASSERT_NOT):
+            continue
+        else:
+            return None
+    return ''.join(out)
+
+
+def _class_example(items):
+    if items and items[0][0] is _C.NEGATE:
+        return None
+    for op, av in items:
+        if op is _C.LITERAL:
+            return chr(av)
+        if op is _C.RANGE:
+            return chr(av[0])
+        if op is _C.CATEGORY:
+            if av is _C.CATEGORY_DIGIT:
+                return '0'
+            if av is _C.CATEGORY_SPACE:
+                return ' '
+            if av is _C.CATEGORY_WORD:
+                return 'a'
+    return None
@@ -0,0 +1,248 @@
+"""
+Persistent inverted index of words in the source tree
+Maps every word (`\\w+` run, in code, strings and comments alike) to the files
+and offsets where it occurs. It is kept up to date by mtime/size and content
+hash, and lets a rule set plan a run: only files that contain the literal
+text every match of some rule needs are opened at all.
+"""
+
+import os
+import re
+import sqlite3
+
+from codemod.cache import CACHE_DIR, digest
+
+INDEX_PATH = CACHE_DIR / 'index.sqlite3'
+
+# Bump when word extraction changes so the index is rebuilt
+VERSION = 1
+
+WORD_RE = re.compile(r'\w+')
+
+
+def words(text):
+    """{word: [offsets]} for one file's text"""
+    found = {}
+    for m in WORD_RE.finditer(text):
+        found.setdefault(m.group(), []).append(m.start())
+    return found
+
+
+def fragments(phrase):
+    """
+    Word fragments of a literal phrase with their position and how they may
+    sit in a word of the text: a fragment at the start of the phrase may be the
+    tail of a longer word, one at the end may be its head.
+    """
+    found = []
+    for m in WORD_RE.finditer(phrase):
+        found.append((m.group(), m.start(), m.start() > 0, m.end() < len(phrase)))
+    return found
+
+
+class Index:
+    """SQLite-backed word -> files/offsets index"""
+
+    def __init__(self, path=INDEX_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.executescript(
+            'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);'
+            'CREATE TABLE IF NOT EXISTS files ('
+            '  id INTEGER PRIMARY KEY, path TEXT UNIQUE, mtime_ns INTEGER, size INTEGER, digest TEXT);'
+            'CREATE TABLE IF NOT EXISTS words (id INTEGER PRIMARY KEY, word TEXT UNIQUE);'
+            'CREATE TABLE IF NOT EXISTS postings ('
+            '  word_id INTEGER, file_id INTEGER, offsets TEXT, PRIMARY KEY (word_id, file_id)) WITHOUT ROWID;'
+            'CREATE INDEX IF NOT EXISTS postings_file ON postings (file_id);'
+        )
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or row[0] != str(VERSION):
+            self.db.executescript('DELETE FROM postings; DELETE FROM words; DELETE FROM files;')
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(VERSION),))
+            self.db.commit()
+        self._word_ids = None
+
+    def close(self):
+        self.db.close()
+
+    def update(self, paths):
+        """
+        Bring the index up to date for these files: unchanged mtime/size is
+        trusted, otherwise the content hash decides. Files that no longer
+        exist are dropped. Returns the number of files (re)indexed.
+        """
+        known = {path: (file_id, mtime, size, content_digest)
+                 for file_id, path, mtime, size, content_digest
+                 in self.db.execute('SELECT id, path, mtime_ns, size, digest FROM files')}
+        indexed = 0
+        seen = set()
+        for path in paths:
+            path = str(path)
+            seen.add(path)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entry = known.get(path)
+            if entry and entry[1] == st.st_mtime_ns and entry[2] == st.st_size:
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            content_digest = digest(data)
+            if entry and entry[3] == content_digest:
+                self.db.execute('UPDATE files SET mtime_ns = ?, size = ? WHERE id = ?',
+                                (st.st_mtime_ns, st.st_size, entry[0]))
+                continue
+            self._index_file(path, entry and entry[0], st, content_digest,
+                             data.decode('utf-8', errors='replace'))
+            indexed += 1
+        for path, entry in known.items():
+            if path not in seen and not os.path.exists(path):
+                self._drop(entry[0])
+        self.db.commit()
+        return indexed
+
+    def _index_file(self, path, file_id, st, content_digest, text):
+        if file_id is None:
+            file_id = self.db.execute(
+                'INSERT INTO files (path, mtime_ns, size, digest) VALUES (?, ?, ?, ?)',
+                (path, st.st_mtime_ns, st.st_size, content_digest)).lastrowid
+        else:
+            self.db.execute('DELETE FROM postings WHERE file_id = ?', (file_id,))
+            self.db.execute('UPDATE files SET mtime_ns = ?, size = ?, digest = ? WHERE id = ?',
+                            (st.st_mtime_ns, st.st_size, content_digest, file_id))
+        found = words(text)
+        ids = self._ids(found)
+        self.db.executemany(
+            'INSERT INTO postings (word_id, file_id, offsets) VALUES (?, ?, ?)',
+            ((ids[word], file_id, ','.join(map(str, offsets))) for word, offsets in found.items()),
+        )
+
+    def _ids(self, found):
+        if self._word_ids is None:
+            self._word_ids = dict(self.db.execute('SELECT word, id FROM words'))
+        new = [w for w in found if w not in self._word_ids]
+        if new:
+            self.db.executemany('INSERT OR IGNORE INTO words (word) VALUES (?)', ((w,) for w in new))
+            for start in range(0, len(new), 500):
+                chunk = new[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                self._word_ids.update(self.db.execute(
+                    f'SELECT word, id FROM words WHERE word IN ({placeholders})', chunk))
+        return self._word_ids
+
+    def _drop(self, file_id):
+        self.db.execute('DELETE FROM postings WHERE file_id = ?', (file_id,))
+        self.db.execute('DELETE FROM files WHERE id = ?', (file_id,))
+
+    def phrase_files(self, phrase):
+        """
+        Files that may contain phrase literally (a superset: the non-word
+        characters between fragments are not checked), or None if the
+        phrase has no words to look up
+        """
+        parts = fragments(phrase)
+        if not parts:
+            return None
+        if len(parts) == 1:
+            # A lone word needs no offsets, just the files it occurs in
+            frag, _, left_bounded, right_bounded = parts[0]
+            return self._paths({file_id for word, file_id, _ in self._postings(frag, left_bounded, right_bounded)
+                                if _positions(word, frag, left_bounded, right_bounded)})
+        starts = None
+        for frag, pos, left_bounded, right_bounded in parts:
+            found = {}
+            for word, file_id, offsets in self._postings(frag, left_bounded, right_bounded):
+                inner = _positions(word, frag, left_bounded, right_bounded)
+                if not inner:
+                    continue
+                hits = found.setdefault(file_id, set())
+                for offset in map(int, offsets.split(',')):
+                    for i in inner:
+                        hits.add(offset + i - pos)
+            if starts is None:
+                starts = found
+            else:
+                starts = {f: s & found[f] for f, s in starts.items() if f in found}
+                starts = {f: s for f, s in starts.items() if s}
+            if not starts:
+                return set()
+        return self._paths(starts)
+
+    def _postings(self, frag, left_bounded, right_bounded):
+        """(word, file id, offsets) for every word frag may sit in"""
+        if left_bounded and right_bounded:
+            where = 'word = ?'
+        else:
+            # instr() is case-sensitive, unlike LIKE
+            where = 'instr(word, ?) > 0'
+        ids = list(self.db.execute(f'SELECT id, word FROM words WHERE {where}', (frag,)))
+        for start in range(0, len(ids), 500):
+            chunk = dict(ids[start:start + 500])
+            placeholders = ','.join('?' * len(chunk))
+            for word_id, file_id, offsets in self.db.execute(
+                    f'SELECT word_id, file_id, offsets FROM postings WHERE word_id IN ({placeholders})',
+                    list(chunk)):
+                yield chunk[word_id], file_id, offsets
+
+    def _paths(self, file_ids):
+        paths = set()
+        ids = list(file_ids)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            paths.update(p for (p,) in self.db.execute(
+                f'SELECT path FROM files WHERE id IN ({placeholders})', chunk))
+        return paths
+
+    def candidates(self, requirements):
+        """
+        Files that can match at least one rule. requirements holds, per rule,
+        the literal phrases every match of it contains (None when unknown).
+        Returns a set of paths, or None when every file must be read.
+        """
+        paths = set()
+        seen = {}
+        for phrases in requirements:
+            if phrases is None:
+                return None
+            rule_paths = None
+            for phrase in phrases:
+                if phrase not in seen:
+                    seen[phrase] = self.phrase_files(phrase)
+                files = seen[phrase]
+                if files is None:
+                    continue
+                rule_paths = files if rule_paths is None else rule_paths & files
+            if rule_paths is None:
+                return None
+            paths |= rule_paths
+        return paths
+
+
+def _positions(word, frag, left_bounded, right_bounded):
+    """Where frag may start inside word, given how it sits in the phrase"""
+    if left_bounded and right_bounded:
+        return [0] if word == frag else []
+    if left_bounded:
+        return [0] if word.startswith(frag) else []
+    if right_bounded:
+        return [len(word) - len(frag)] if word.endswith(frag) else []
+    return [m.start() for m in re.finditer(f'(?={re.escape(frag)})', word)]
+
+
+def plan(files, rules, path=INDEX_PATH):
+    """
+    Split files into (candidates, skipped) for a rule set with a
+    requirements() method, refreshing the index first
+    """
+    files = list(files)
+    index = Index(path)
+    try:
+        index.update(files)
+        wanted = index.candidates(rules.requirements())
+    finally:
+        index.close()
+    if wanted is None:
+        return files, []
+    return [f for f in files if str(f) in wanted], [f for f in files if str(f) not in wanted]
@@ -0,0 +1,232 @@
+"""
+Missing-index advisor
+Collects the columns each Prisma call filters (`where`), sorts (`orderBy`) or
+looks up by across apps/api/src, compares them with the @id / @@id /
+@@unique / @@index declarations in schema.prisma and ranks the uncovered
+ones by call-site count, with a schema patch adding them. No database needed:
+
+    python3 -m codemod.index_advisor --patch .codemod-cache/index-advice.patch
+    git apply .codemod-cache/index-advice.patch
+"""
+
+import argparse
+import sys
+from collections import namedtuple
+from functools import partial
+from pathlib import Path
+
+from codemod import objects, queries, runner, schema
+from codemod.lexer import code_tokens
+
+PATCH_PATH = schema.CACHE_DIR / 'index-advice.patch'
+
+# Filter operators a btree index serves as equality or as a range
+EQUALITY = {'equals', 'in'}
+RANGE = {'gt', 'gte', 'lt', 'lte', 'startsWith'}
+# Relation filters; the columns live on another model
+RELATION_FILTERS = {'some', 'every', 'none', 'is', 'isNot'}
+COMBINATORS = ('AND', 'OR', 'NOT')
+
+# columns: equality columns, then range, then orderBy, without repeats
+Access = namedtuple('Access', 'model columns equality path line op')
+
+
+def accesses(text, path=None, models=None):
+    """Access per Prisma call in text that filters or sorts on known columns"""
+    if models is None:
+        models = schema.load_schema()['schema']
+    tokens = code_tokens(text)
+    literals = objects.scan(text, tokens)
+    by_start = {o.start: o for o in literals}
+    found = []
+    for call in queries.scan(text, path, tokens, literals):
+        model = models.get(call.model)
+        if call.args is None or model is None:
+            continue
+        equality, ranged, order = [], [], []
+        for prop in call.args.props:
+            if prop.key == 'where':
+                _where(prop, model, by_start, literals, equality, ranged)
+            elif prop.key == 'orderBy':
+                for literal in _literals(prop, by_start, literals):
+                    order.extend(p.key for p in literal.props if _column(model, p.key))
+        columns = list(dict.fromkeys(equality + ranged + order))
+        if columns:
+            found.append(Access(call.model, tuple(columns), tuple(dict.fromkeys(equality)),
+                                call.path, call.line, call.op))
+    return found
+
+
+def _column(model, name):
+    field = model['fields'].get(name)
+    return field is not None and field['model'] is None and not field['list']
+
+
+def _literals(prop, by_start, literals):
+    """The object literal a property holds, or the top-level ones in its array value"""
+    if prop.value_start in by_start:
+        return [by_start[prop.value_start]]
+    found = []
+    end = -1
+    for literal in literals:
+        if literal.start < prop.value_start or literal.start >= prop.value_end:
+            continue
+        if literal.start >= end:
+            found.append(literal)
+            end = literal.end
+    return found
+
+
+def _where(prop, model, by_start, literals, equality, ranged):
+    for literal in _literals(prop, by_start, literals):
+        for field in literal.props:
+            if field.key in COMBINATORS:
+                # Only AND narrows the same rows; OR/NOT branches can't share one index
+                if field.key == 'AND':
+                    _where(field, model, by_start, literals, equality, ranged)
+                continue
+            if not _column(model, field.key):
+                continue
+            value = by_start.get(field.value_start)
+            if value is None:
+                equality.append(field.key)
+                continue
+            ops = {p.key for p in value.props}
+            if ops & RELATION_FILTERS:
+                continue
+            if ops & EQUALITY:
+                equality.append(field.key)
+            elif ops & RANGE:
+                ranged.append(field.key)
+
+
+def scan_file(path, models=None):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return accesses(f.read(), path, models)
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"ERROR reading {path}: {e}", file=sys.stderr)
+        return []
+
+
+def declared(model):
+    """Column lists usable as an index prefix: @id/@@id, @unique/@@unique, @@index"""
+    found = [model['id']] if model['id'] else []
+    return found + model['uniques'] + model['indexes']
+
+
+def covered(access, indexes, uniques):
+    """
+    True if some declared index serves the access: a unique key fully inside
+    the equality columns (a point lookup), or an index whose leading columns
+    are exactly the equality columns (any order), or start with the first
+    range/orderBy column when there is no equality
+    """
+    eq = set(access.equality)
+    if any(unique and set(unique) <= eq for unique in uniques):
+        return True
+    for index in indexes:
+        if eq:
+            if set(index[:len(eq)]) == eq:
+                return True
+        elif index and index[0] == access.columns[0]:
+            return True
+    return False
+
+
+def advise(found, models):
+    """
+    [(model, columns, [Access])] for uncovered column sets, most call sites
+    first. A candidate that is a prefix of a longer one on the same model is
+    served by it, so its call sites are credited to the longer index.
+    """
+    groups = {}
+    for access in found:
+        model = models[access.model]
+        uniques = ([model['id']] if model['id'] else []) + model['uniques']
+        if covered(access, declared(model), uniques):
+            continue
+        groups.setdefault((access.model, _candidate(access)), []).append(access)
+
+    # Longest first, so each prefix folds into the most-used index extending it
+    merged = {}
+    for (model, columns), sites in sorted(groups.items(), key=lambda g: (-len(g[0][1]), -len(g[1]), g[0])):
+        longer = [key for key in merged if key[0] == model and key[1][:len(columns)] == columns]
+        if longer:
+            target = max(longer, key=lambda key: len(merged[key]))
+            merged[target].extend(sites)
+        else:
+            merged[model, columns] = list(sites)
+    return sorted(((m, cols, sites) for (m, cols), sites in merged.items()),
+                  key=lambda g: (-len(g[2]), g[0], g[1]))
+
+
+def _candidate(access):
+    # Equality columns first (sorted, so reorderings share one index), then the rest in use order
+    eq = sorted(access.equality)
+    return tuple(eq + [c for c in access.columns if c not in eq])
+
+
+def patch(advice, schema_path=schema.SCHEMA_PATH):
+    """git-style diff adding one @@index per advised column set to schema.prisma"""
+    content = Path(schema_path).read_text(encoding='utf-8')
+    wanted = {}
+    for model, columns, _ in advice:
+        wanted.setdefault(model, []).append(columns)
+    lines = runner.readlines(content)
+    out = []
+    model = None
+    for line in lines:
+        m = schema.BLOCK_RE.match(line)
+        if m:
+            model = m.group(2) if m.group(1) == 'model' else None
+        elif line.strip() == '}' and model in wanted:
+            for columns in wanted[model]:
+                out.append(f"  @@index([{', '.join(columns)}])\n")
+            model = None
+        out.append(line)
+    new_content = ''.join(out)
+    return runner.unified_diff(schema_path, content, new_content) if new_content != content else ''
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python3 -m codemod.index_advisor', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='*', default=['apps/api/src'], help="directories to scan (default: apps/api/src)")
+    parser.add_argument('--ext', type=lambda s: tuple(s.split(',')), default=('.ts',),
+                        help="comma-separated extensions (default: .ts)")
+    parser.add_argument('-j', '--jobs', type=int, default=1, help="worker processes (default: 1)")
+    parser.add_argument('--min-sites', type=int, default=1, help="only advise indexes used by this many call sites")
+    parser.add_argument('--top', type=int, default=30, help="candidates to print (default: 30, 0 for all)")
+    parser.add_argument('--patch', nargs='?', const=PATCH_PATH, default=None, metavar='PATH',
+                        help=f"write the schema patch (default: {PATCH_PATH}); '-' for stdout")
+    args = parser.parse_args(argv)
+
+    models = schema.load_schema()['schema']
+    files = list(runner.iter_files(args.paths, args.ext, ('.spec.ts', '.d.ts')))
+    found = [a for _, accesses_ in runner.run(partial(scan_file, models=models), files, args.jobs) for a in accesses_]
+    advice = [a for a in advise(found, models) if len(a[2]) >= args.min_sites]
+
+    out = sys.stderr if args.patch == '-' else sys.stdout
+    print(f"{len(found)} filtered/sorted queries in {len(files)} files, "
+          f"{sum(len(sites) for _, _, sites in advice)} not served by a declared index\n", file=out)
+    print(f"{'sites':>5}  {'model':<28}  columns", file=out)
+    for model, columns, sites in advice[:args.top or None]:
+        where = ', '.join(f"{Path(s.path).name}:{s.line}" for s in sites[:3])
+        more = f" +{len(sites) - 3}" if len(sites) > 3 else ''
+        print(f"{len(sites):>5}  {model:<28}  [{', '.join(columns)}]  ({where}{more})", file=out)
+
+    if args.patch:
+        diff = patch(advice)
+        if args.patch == '-':
+            sys.stdout.write(diff)
+        else:
+            path = Path(args.patch)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(diff, encoding='utf-8')
+            print(f"\nSchema patch ({len(advice)} indexes) saved to {path}, review then `git apply {path}`", file=out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,271 @@
+"""
+Write-ahead journal for codemod runs
+Rewritten files are staged as temp files next to their targets and swapped in
+with os.replace in batches. Each original is hard-linked into the run's journal
+first, so a whole run can be rolled back (or committed) with one command:
+
+    python3 -m codemod.journal rollback
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+
+from codemod import spans
+from codemod.cache import CACHE_DIR, digest
+
+JOURNAL_DIR = CACHE_DIR / 'journal'
+BATCH_SIZE = 64
+TMP_SUFFIX = '.codemod-tmp'
+
+ENTRIES = 'entries.jsonl'
+COMPLETE = 'COMPLETE'
+
+
+def temp_path(path):
+    """Where a rewritten file is staged before being swapped in"""
+    head, name = os.path.split(os.fspath(path))
+    return os.path.join(head, f'.{name}{TMP_SUFFIX}')
+
+
+def stage(path, content):
+    """Write content to the staging file for path and flush it to disk"""
+    tmp = temp_path(path)
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    _copy_mode(path, tmp)
+    return tmp
+
+
+def stage_spans(path, buffer, edits):
+    """Like stage(), writing byte edits over a mapped buffer; returns (tmp, digest)"""
+    tmp = temp_path(path)
+    with open(tmp, 'wb') as f:
+        after = spans.write_spans(f, buffer, edits)
+        f.flush()
+        os.fsync(f.fileno())
+    _copy_mode(path, tmp)
+    return tmp, after
+
+
+def sweep(paths):
+    """Remove staging files left behind for any of paths"""
+    for path in paths:
+        tmp = temp_path(path)
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+
+
+def replace(path, content):
+    """Atomically replace one file (no journal)"""
+    os.replace(stage(path, content), path)
+
+
+class Journal:
+    """One run's journal: staged rewrites are applied and recorded batch by batch"""
+
+    def __init__(self, root=JOURNAL_DIR, batch_size=BATCH_SIZE):
+        now = time.time_ns()
+        # Sortable, so the newest run is the default rollback target
+        self.run_id = time.strftime('%Y%m%d-%H%M%S', time.localtime(now // 10**9)) + f'.{now % 10**9 // 1000:06d}'
+        self.dir = root / self.run_id
+        self.batch_size = max(1, batch_size)
+        self.pending = []
+        self.count = 0
+        (self.dir / 'files').mkdir(parents=True)
+
+    def add(self, path, tmp, before, after):
+        """Queue a staged rewrite; applied when the batch fills up"""
+        self.pending.append((os.fspath(path), tmp, before, after))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Record the pending batch durably, then swap the staged files in"""
+        if not self.pending:
+            return
+        lines = []
+        for path, tmp, before, after in self.pending:
+            self.count += 1
+            backup = f'{self.count:06d}'
+            _link_or_copy(path, self.dir / 'files' / backup)
+            lines.append(json.dumps({'path': path, 'backup': backup, 'before': before, 'after': after}) + '\n')
+        with open(self.dir / ENTRIES, 'a', encoding='utf-8') as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        _fsync_dir(self.dir / 'files')
+
+        # One directory fsync per batch instead of one per file
+        dirs = set()
+        for path, tmp, _, _ in self.pending:
+            os.replace(tmp, path)
+            dirs.add(os.path.dirname(path) or '.')
+        for d in dirs:
+            _fsync_dir(d)
+        self.pending = []
+
+    def discard(self):
+        """Drop staged files that were never applied (interrupted run)"""
+        for _, tmp, _, _ in self.pending:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+        self.pending = []
+
+    def close(self):
+        self.flush()
+        if self.count == 0:
+            shutil.rmtree(self.dir)
+            return
+        (self.dir / COMPLETE).touch()
+        print(f"Journal {self.run_id}: {self.count} files, undo with "
+              f"`python3 -m codemod.journal rollback`", file=sys.stderr)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+            return
+        self.discard()
+        if self.count == 0:
+            shutil.rmtree(self.dir)
+        else:
+            print(f"Interrupted: {self.count} files rewritten, undo with "
+                  f"`python3 -m codemod.journal rollback {self.run_id}`", file=sys.stderr)
+
+
+def runs(root=JOURNAL_DIR):
+    """Run ids with a journal, newest first"""
+    if not root.exists():
+        return []
+    return sorted((p.name for p in root.iterdir() if p.is_dir()), reverse=True)
+
+
+def entries(run_id, root=JOURNAL_DIR):
+    path = root / run_id / ENTRIES
+    if not path.exists():
+        return []
+    with open(path, encoding='utf-8') as f:
+        # A torn last line means its batch was never applied
+        out = []
+        for line in f:
+            try:
+                out.append(json.loads(line))
+            except ValueError:
+                break
+        return out
+
+
+def rollback(run_id, root=JOURNAL_DIR, force=False):
+    """
+    Put back the originals recorded by a run, newest first.
+    Files edited since the run are left alone unless force is set.
+    Returns (restored, skipped) paths.
+    """
+    run_dir = root / run_id
+    restored, skipped = [], []
+    for entry in reversed(entries(run_id, root)):
+        path, backup = entry['path'], run_dir / 'files' / entry['backup']
+        if not backup.exists():
+            continue
+        try:
+            with open(path, 'rb') as f:
+                current = digest(f.read())
+        except FileNotFoundError:
+            current = None
+        if current == entry['before']:
+            continue  # swap never happened
+        if current != entry['after'] and not force:
+            skipped.append(path)
+            continue
+        os.replace(backup, path)
+        restored.append(path)
+    if not skipped:
+        shutil.rmtree(run_dir)
+    return restored, skipped
+
+
+def commit(run_id, root=JOURNAL_DIR):
+    """Forget a run's originals, making its rewrites permanent"""
+    shutil.rmtree(root / run_id)
+
+
+def _copy_mode(path, tmp):
+    # The staged file replaces path, so it keeps path's permission bits (executable, group-writable)
+    try:
+        shutil.copymode(path, tmp)
+    except FileNotFoundError:
+        pass
+
+
+def _link_or_copy(src, dst):
+    # A hard link keeps the original inode alive after os.replace, no copying
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _fsync_dir(path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python3 -m codemod.journal', description="Roll back or commit codemod runs")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help="show journaled runs")
+    p = sub.add_parser('rollback', help="restore the files a run rewrote (default: latest run)")
+    p.add_argument('run', nargs='?')
+    p.add_argument('--force', action='store_true', help="also restore files edited since the run")
+    p = sub.add_parser('commit', help="drop a run's journal (default: all runs)")
+    p.add_argument('run', nargs='?')
+    args = parser.parse_args(argv)
+
+    known = runs()
+    if args.command == 'list':
+        for run_id in known:
+            state = 'complete' if (JOURNAL_DIR / run_id / COMPLETE).exists() else 'interrupted'
+            print(f"{run_id}  {len(entries(run_id))} files  {state}")
+        return 0
+
+    if args.run and args.run not in known:
+        print(f"ERROR: No journal for run {args.run}", file=sys.stderr)
+        return 1
+    if not known:
+        print("Nothing to do: no journaled runs")
+        return 0
+
+    if args.command == 'commit':
+        for run_id in [args.run] if args.run else known:
+            commit(run_id)
+            print(f"✓ Committed {run_id}")
+        return 0
+
+    run_id = args.run or known[0]
+    restored, skipped = rollback(run_id, force=args.force)
+    for path in restored:
+        print(f"✓ Restored: {path}")
+    for path in skipped:
+        print(f"⚠ Changed since run, left alone: {path} (use --force)", file=sys.stderr)
+    print(f"\n✅ Rolled back {run_id}: {len(restored)} files")
+    return 1 if skipped else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
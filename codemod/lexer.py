@@ -0,0 +1,282 @@
+"""
+Lightweight TypeScript lexer and token-level rewrite rules
+Splits source into identifiers, punctuation, strings, template chunks, regex
+literals and comments in one linear pass (no AST), so rename rules only ever
+touch real identifiers in code.
+"""
+
+import re
+import time
+from collections import namedtuple
+
+from codemod.cache import fingerprint
+
+Token = namedtuple('Token', 'kind text start end')
+
+# Bump when tokenizing or rule matching changes so cached results are invalidated
+VERSION = 1
+
+_TEMPLATE_BODY = r'(?:[^`\\$]|\\[\s\S]|\$(?!\{))*(?:`|\$\{|\Z)'
+_PARTS = [
+    ('ws', r'\s+'),
+    ('comment', r'//[^\n]*|/\*[\s\S]*?(?:\*/|\Z)'),
+    ('string', r"'(?:[^'\\\n]|\\[\s\S])*'?|\"(?:[^\"\\\n]|\\[\s\S])*\"?"),
+    ('template', '`' + _TEMPLATE_BODY),
+    ('ident', r'[^\W\d][\w$]*|\$[\w$]*'),
+    ('number', r'\d[\w.]*|\.\d[\w.]*'),
+    ('regex', r'/(?![*/])(?:[^/\\\[\n]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/\w*'),
+    ('punct', r'\?\.(?!\d)|\.\.\.|=>|[{}()\[\];,.:?@#]|[-+*%&|^!~<>=]+|/=?'),
+]
+# A `/` starts a regex literal only where an expression can begin
+_EXPR = re.compile('|'.join(f'(?P<{k}>{p})' for k, p in _PARTS))
+_OPERATOR = re.compile('|'.join(f'(?P<{k}>{p})' for k, p in _PARTS if k != 'regex'))
+_TEMPLATE_TAIL = re.compile(r'\}' + _TEMPLATE_BODY)
+
+_EXPR_KEYWORDS = {
+    'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete',
+    'void', 'throw', 'instanceof', 'yield', 'await',
+}
+
+
+def tokenize(text):
+    """Yield Tokens for everything but whitespace"""
+    pos = 0
+    n = len(text)
+    prev = None
+    # Open `${` substitutions: brace depth inside each one
+    templates = []
+    while pos < n:
+        if text[pos] == '}' and templates and templates[-1] == 0:
+            m = _TEMPLATE_TAIL.match(text, pos)
+            kind = 'template'
+        else:
+            regex_ok = prev is None or (
+                prev.kind == 'punct' and prev.text not in (')', ']', '}')
+            ) or (prev.kind == 'ident' and prev.text in _EXPR_KEYWORDS)
+            m = (_EXPR if regex_ok else _OPERATOR).match(text, pos)
+            if m is None:
+                # Stray character (e.g. a lone backslash); emit it and move on
+                token = Token('punct', text[pos], pos, pos + 1)
+                prev = token
+                yield token
+                pos += 1
+                continue
+            kind = m.lastgroup
+
+        end = m.end()
+        if kind == 'ws':
+            pos = end
+            continue
+        token = Token(kind, m.group(), pos, end)
+        pos = end
+
+        if kind == 'template':
+            if token.text[0] == '}':
+                templates.pop()
+            if token.text.endswith('${'):
+                templates.append(0)
+        elif kind == 'punct' and templates:
+            if token.text == '{':
+                templates[-1] += 1
+            elif token.text == '}':
+                templates[-1] -= 1
+        if kind != 'comment':
+            prev = token
+        yield token
+
+
+def code_tokens(text):
+    """Tokens without comments"""
+    return [t for t in tokenize(text) if t.kind != 'comment']
+
+
+class TokenRule:
+    """
+    Rename an identifier in one syntactic position:
+      member - after `.` or `?.` (obj.user)
+      key    - object literal key (`{ user: ...`)
+      ident  - a bare identifier, not after `.`
+    `follow` lists token texts that must come right after the identifier;
+    `receivers` / `skip_receivers` filter on the identifier before the dot.
+    """
+
+    def __init__(self, old, new, context='member', follow=(), receivers=(), skip_receivers=()):
+        self.old = old
+        self.new = new
+        self.context = context
+        self.follow = tuple(follow)
+        self.receivers = frozenset(receivers)
+        self.skip_receivers = frozenset(skip_receivers)
+
+    @property
+    def pattern(self):
+        lead = {'member': '.', 'key': '{ ', 'ident': ''}[self.context]
+        return lead + self.old + ''.join(self.follow)
+
+    @property
+    def replacement(self):
+        lead = {'member': '.', 'key': '{ ', 'ident': ''}[self.context]
+        return lead + self.new + ''.join(self.follow)
+
+    def key(self):
+        return (self.old, self.new, self.context, self.follow,
+                sorted(self.receivers), sorted(self.skip_receivers))
+
+    def matches(self, tokens, i):
+        prev = tokens[i - 1] if i else None
+        is_member = prev is not None and prev.text in ('.', '?.')
+        if self.context == 'member':
+            if not is_member:
+                return False
+            receiver = tokens[i - 2] if i > 1 else None
+            name = receiver.text if receiver is not None and receiver.kind == 'ident' else None
+            if self.receivers and name not in self.receivers:
+                return False
+            if name in self.skip_receivers:
+                return False
+        elif self.context == 'key':
+            if prev is None or prev.text not in ('{', ','):
+                return False
+            if not self.follow or self.follow[0] != ':':
+                if i + 1 >= len(tokens) or tokens[i + 1].text != ':':
+                    return False
+        elif is_member:
+            return False
+
+        for offset, text in enumerate(self.follow, 1):
+            if i + offset >= len(tokens) or tokens[i + offset].text != text:
+                return False
+        return True
+
+    def __repr__(self):
+        return f'TokenRule({self.pattern!r} -> {self.replacement!r})'
+
+
+def member(old, new, **kwargs):
+    return TokenRule(old, new, 'member', **kwargs)
+
+
+def key(old, new, **kwargs):
+    kwargs['follow'] = (':',) + tuple(kwargs.get('follow', ()))
+    return TokenRule(old, new, 'key', **kwargs)
+
+
+class TokenRuleSet:
+    """Token rules applied in one lexer pass; same interface as engine.RuleSet"""
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self.by_name = {}
+        for i, rule in enumerate(self.rules):
+            self.by_name.setdefault(rule.old, []).append((i, rule))
+        self.fingerprint = fingerprint(VERSION, [r.key() for r in self.rules])
+        names = sorted(self.by_name, key=len, reverse=True)
+        self.names_b = re.compile(b'|'.join(re.escape(n.encode()) for n in names)) if names else None
+
+    def __len__(self):
+        return len(self.rules)
+
+    def rewrite(self, content):
+        """Rename matching identifiers, returns (content, per-rule match counts)"""
+        counts = [0] * len(self.rules)
+        out = []
+        pos = 0
+        for index, start, end, new in self._scan(content):
+            out.append(content[pos:start])
+            out.append(new)
+            pos = end
+            counts[index] += 1
+        if not out:
+            return content, counts
+        out.append(content[pos:])
+        return ''.join(out), counts
+
+    def __call__(self, content):
+        return self.rewrite(content)[0]
+
+    def profile(self, content):
+        """
+        rewrite() plus (label, hits, seconds, bytes scanned) for the shared
+        lexer pass, reported as `(tokenize)`, and for each rule's matching
+        """
+        start = time.perf_counter()
+        size = len(content.encode('utf-8'))
+        tokens = code_tokens(content) if any(name in content for name in self.by_name) else []
+        positions = {}
+        for i, token in enumerate(tokens):
+            if token.kind == 'ident' and token.text in self.by_name:
+                positions.setdefault(token.text, []).append(i)
+        stats = [('(tokenize)', 0, time.perf_counter() - start, size if tokens else 0)]
+
+        new_content, counts = self.rewrite(content)
+        for index, rule in enumerate(self.rules):
+            candidates = positions.get(rule.old, [])
+            start = time.perf_counter()
+            for i in candidates:
+                rule.matches(tokens, i)
+            scanned = sum(tokens[i].end - tokens[i].start for i in candidates)
+            stats.append((rule.pattern, counts[index], time.perf_counter() - start, scanned))
+        return new_content, stats
+
+    def requirements(self):
+        """Per rule, the identifier every match contains (see codemod.index)"""
+        return [[rule.old] for rule in self.rules]
+
+    def edits(self, buffer, ascii_input=None, counts=None):
+        """
+        (start, end, replacement) byte edits for a UTF-8 bytes-like buffer
+        (e.g. an mmap). Buffers that mention none of the names are rejected
+        by a byte regex without ever being decoded. counts, if given, is a
+        per-rule list the renames are added to.
+        """
+        if self.names_b is None or self.names_b.search(buffer) is None:
+            return []
+        text = str(buffer, 'utf-8')
+        found = []
+        for index, start, end, new in self._scan(text):
+            found.append((start, end, new.encode()))
+            if counts is not None:
+                counts[index] += 1
+        if not found or (ascii_input is not None and ascii_input()):
+            return found
+        # Character offsets -> byte offsets
+        edits = []
+        char = byte = 0
+        for start, end, new in found:
+            byte += len(text[char:start].encode('utf-8'))
+            end_byte = byte + len(text[start:end].encode('utf-8'))
+            edits.append((byte, end_byte, new))
+            char, byte = end, end_byte
+        return edits
+
+    def _scan(self, content):
+        """Yield (rule index, start, end, new name) for each rename, in order"""
+        # Cheap prefilter: most files mention none of the names
+        if not any(name in content for name in self.by_name):
+            return
+        tokens = code_tokens(content)
+        for i, token in enumerate(tokens):
+            if token.kind != 'ident':
+                continue
+            candidates = self.by_name.get(token.text)
+            if not candidates:
+                continue
+            for index, rule in candidates:
+                if rule.matches(tokens, i):
+                    yield index, token.start, token.end, rule.new
+                    break
+
+    def sequential(self, content):
+        """One pass per rule, in order (lets a rule see earlier rules' output)"""
+        for rule in self.rules:
+            content = TokenRuleSet([rule]).rewrite(content)[0]
+        return content
+
+    def conflicts(self):
+        """Rules whose output is renamed again by a later rule"""
+        found = []
+        for index, rule in enumerate(self.rules):
+            for other_index, other in self.by_name.get(rule.new, []):
+                if other_index > index and other.context == rule.context:
+                    found.append((rule, other, rule.replacement))
+        return found
@@ -0,0 +1,199 @@
+"""
+Structural matcher for object literals
+Finds every `{ ... }` with its exact extent and top-level properties in one
+linear pass over the lexer's tokens, so key checks never look past the
+literal's closing brace (unlike the old 20-line look-ahead windows).
+"""
+
+from collections import namedtuple
+
+from codemod.lexer import code_tokens
+
+# start/end cover `key: value` plus its trailing comma; value_end excludes the comma
+Prop = namedtuple('Prop', 'key start end value_start value_end')
+ObjectLiteral = namedtuple('ObjectLiteral', 'start end props spread token')
+
+# Prisma write calls and the argument key holding the new record
+CREATE_BODIES = {'create': 'data', 'upsert': 'create'}
+
+_CLOSE = {'{': '}', '(': ')', '[': ']'}
+
+
+class _Frame:
+    def __init__(self, token_index, opener, start):
+        self.token = token_index
+        self.opener = opener
+        self.start = start
+        self.props = []
+        self.spread = False
+        self.prop = None  # [key, start, value_start] of the property being read
+
+
+def scan(text, tokens=None):
+    """All brace pairs in text as ObjectLiterals, ordered by start offset"""
+    if tokens is None:
+        tokens = code_tokens(text)
+    found = []
+    stack = []
+    for i, token in enumerate(tokens):
+        kind, value = token.kind, token.text
+        top = stack[-1] if stack else None
+
+        if kind == 'template':
+            if value[0] == '}' and top is not None and top.opener == '${':
+                stack.pop()
+            if value.endswith('${'):
+                stack.append(_Frame(i, '${', token.start))
+            continue
+        if kind != 'punct' or value not in '{}()[],':
+            if top is not None and top.opener == '{':
+                _read_key(top, tokens, i)
+            continue
+
+        if value in _CLOSE:
+            stack.append(_Frame(i, value, token.start))
+        elif value == ',':
+            if top is not None and top.opener == '{':
+                _end_prop(top, tokens, i, token.end)
+        elif top is not None and _CLOSE.get(top.opener) == value:
+            stack.pop()
+            if value == '}':
+                _end_prop(top, tokens, i, tokens[i - 1].end)
+                found.append(ObjectLiteral(top.start, token.end, top.props, top.spread, top.token))
+    found.sort(key=lambda o: o.start)
+    return found
+
+
+def _read_key(frame, tokens, i):
+    """Start a property if tokens[i] begins one at this frame's top level"""
+    if frame.prop is not None:
+        return
+    token = tokens[i]
+    prev = tokens[i - 1].text
+    if prev not in ('{', ','):
+        return
+    if token.text == '...':
+        frame.spread = True
+        frame.prop = [None, token.start, token.start]
+        return
+    if token.kind not in ('ident', 'string', 'number'):
+        frame.prop = [None, token.start, token.start]
+        return
+    key = token.text.strip('\'"') if token.kind == 'string' else token.text
+    nxt = tokens[i + 1].text if i + 1 < len(tokens) else None
+    if nxt == ':':
+        frame.prop = [key, token.start, tokens[i + 2].start if i + 2 < len(tokens) else token.end]
+    elif nxt in (',', '}'):
+        # Shorthand `{ teacherId, ... }`
+        frame.prop = [key, token.start, token.start]
+    else:
+        # Method, getter or anything else we don't model
+        frame.prop = [None, token.start, token.start]
+
+
+def _end_prop(frame, tokens, i, end):
+    if frame.prop is None:
+        return
+    key, start, value_start = frame.prop
+    frame.prop = None
+    if key is not None:
+        frame.props.append(Prop(key, start, end, value_start, tokens[i - 1].end))
+
+
+def keys(literal):
+    return {p.key for p in literal.props}
+
+
+def create_bodies(text, models=None, receivers=None):
+    """
+    (model, ObjectLiteral) for the record literal of each `<receiver>.<model>.create({ data: {...} })`
+    (and `upsert({ create: {...} })`), optionally limited to some models and receivers
+    """
+    tokens = code_tokens(text)
+    literals = scan(text, tokens)
+    by_start = {o.start: o for o in literals}
+    found = []
+    for literal in literals:
+        t = literal.token
+        # receiver . model . create ( {
+        if t < 5 or tokens[t - 1].text != '(' or tokens[t - 3].text not in ('.', '?.'):
+            continue
+        method, model, receiver = tokens[t - 2].text, tokens[t - 4].text, tokens[t - 6].text if t >= 6 else None
+        body_key = CREATE_BODIES.get(method)
+        if body_key is None or tokens[t - 5].text not in ('.', '?.'):
+            continue
+        if models is not None and model not in models:
+            continue
+        if receivers is not None and receiver not in receivers:
+            continue
+        for prop in literal.props:
+            if prop.key == body_key and prop.value_start in by_start:
+                found.append((model, by_start[prop.value_start]))
+    return found
+
+
+def ensure_keys(text, fields, receivers=None):
+    """
+    Add missing properties to create bodies, fields = {model: [(key, value source), ...]}.
+    Keys already present (explicitly or as shorthand) are left alone, so
+    running this twice is a no-op. Literals with a spread (`{ ...dto }`) are
+    skipped, since the spread may supply the keys. Returns (text, number of
+    literals changed).
+    """
+    edits = []
+    for model, literal in create_bodies(text, fields, receivers):
+        if literal.spread:
+            continue
+        present = keys(literal)
+        missing = [f'{k}: {v},' for k, v in fields[model] if k not in present]
+        if missing:
+            edits.append((literal.start + 1, literal.start + 1, ' ' + ' '.join(missing)))
+    return apply_edits(text, edits), len(edits)
+
+
+def drop_duplicate_keys(text, values):
+    """
+    Where a literal has the same key twice, remove the copy whose value is
+    exactly values[key] (e.g. an injected `id: crypto.randomUUID()`).
+    Returns (text, number of properties removed).
+    """
+    edits = []
+    for literal in scan(text):
+        seen = {}
+        for prop in literal.props:
+            seen.setdefault(prop.key, []).append(prop)
+        for key, props in seen.items():
+            if len(props) < 2 or key not in values:
+                continue
+            injected = [p for p in props if text[p.value_start:p.value_end] == values[key]]
+            # Keep one property if every copy is the injected one
+            for prop in injected[:len(props) - 1] if len(injected) == len(props) else injected:
+                edits.append(removal(text, prop))
+    return apply_edits(text, edits), len(edits)
+
+
+def removal(text, prop):
+    """Edit removing a property, with its whole line when it sits alone on one"""
+    line_start = text.rfind('\n', 0, prop.start) + 1
+    line_end = text.find('\n', prop.end)
+    line_end = len(text) if line_end < 0 else line_end
+    if not text[line_start:prop.start].strip() and not text[prop.end:line_end].strip():
+        return (line_start, min(line_end + 1, len(text)), '')
+    end = prop.end
+    while end < len(text) and text[end] in ' \t':
+        end += 1
+    return (prop.start, end, '')
+
+
+def apply_edits(text, edits):
+    """Apply (start, end, replacement) edits; overlapping ones after the first are dropped"""
+    out = []
+    pos = 0
+    for start, end, replacement in sorted(edits):
+        if start < pos:
+            continue  # overlapping edit
+        out.append(text[pos:start])
+        out.append(replacement)
+        pos = end
+    out.append(text[pos:])
+    return ''.join(out)
@@ -0,0 +1,338 @@
+"""
+Declarative rule packs
+A pack is a TOML file in packs/ holding rules as data instead of Python. It
+can have global rules, applied to every file under its paths, and rules
+scoped to single files:
+
+    description = "req.users back to req.user"
+    paths = ["apps/api/src"]            # global scope (ext / skip optional)
+    rules = [['req\\.users\\.', 'req.user.']]
+
+    [files."apps/api/src/marketplace/marketplace.service.ts"]
+    literals = [['grades: {', 'grade_levels: {']]
+
+A scope can hold `rules` (regex pairs), `literals` (plain-text pairs),
+`tokens` (lexer rules: old/new/context/follow/receivers/skip_receivers), and
+rules generated from schema.prisma: `models` (schema.model_rules), `members`
+(schema.member_rules) and `relations` (schema.relation_rules).
+Replacements may use `{{model old}}`, `{{relation old [model]}}` or
+`{{resolve old model}}`, and these are filled in from the schema.
+`sequential = true` keeps the one-rule-at-a-time semantics of the old
+re.sub loops. That is also the fallback whenever rule order changes the
+result.
+
+Each pack compiles once into a bundle in .codemod-cache/packs: the rule
+sets with their compiled patterns, literal prefilters and conflict check.
+The bundle is keyed by the pack file, the engine code and, for packs
+using it, schema.prisma. Only the selected packs are read, and a warm
+bundle loads without parsing TOML or the schema:
+
+    python3 -m codemod.packs list
+    python3 -m codemod.packs run req_user --dry-run
+    python3 -m codemod.packs run marketplace remaining
+"""
+
+import argparse
+import hashlib
+import os
+import pickle
+import re
+import sys
+import time
+from collections import namedtuple
+from pathlib import Path
+
+from codemod.cache import CACHE_DIR, fingerprint
+
+PACK_DIR = Path('packs')
+BUNDLE_DIR = CACHE_DIR / 'packs'
+# Modules whose classes end up in a bundle; editing them invalidates every bundle
+CODE = [Path(__file__).parent / name for name in ('engine.py', 'lexer.py', 'schema.py', 'packs.py')]
+
+# Bump when the bundle layout changes
+VERSION = 1
+
+_PLACEHOLDER = re.compile(r'\{\{\s*(model|relation|resolve)((?:\s+\w+)+)\s*\}\}')
+_SCHEMA_KEYS = ('models', 'members', 'relations')
+
+# sets: rule sets run in order (regex rules, then token rules); sequential: one rule at a time
+Scope = namedtuple('Scope', 'sets sequential')
+# paths / ext / skip: where the global scope applies; files: {path: Scope}
+Bundle = namedtuple('Bundle', 'name description paths ext skip scope files key')
+
+
+class PackError(Exception):
+    pass
+
+
+class Chain:
+    """
+    Several rule sets as one transform, for scopes mixing regex and token
+    rules or keeping one-rule-at-a-time semantics (each set's .sequential)
+    """
+
+    def __init__(self, sets, key, sequential=False):
+        self.sets = sets
+        self.fingerprint = key
+        self.sequential = sequential
+
+    def __call__(self, content):
+        for rules in self.sets:
+            content = rules.sequential(content) if self.sequential else rules(content)
+        return content
+
+    def hazards(self):
+        return [h for rules in self.sets if hasattr(rules, 'hazards') for h in rules.hazards()]
+
+
+def find(name, root=PACK_DIR):
+    """Path of a pack given by name (packs/<name>.toml) or by path"""
+    path = Path(name)
+    if path.suffix == '.toml' and path.exists():
+        return path
+    path = Path(root) / f'{name}.toml'
+    if not path.exists():
+        raise PackError(f"no pack {name!r} (looked for {path})")
+    return path
+
+
+def available(root=PACK_DIR):
+    return sorted(Path(root).glob('*.toml'))
+
+
+def _code_digest():
+    h = hashlib.sha1()
+    for path in CODE:
+        h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+def _schema_digest():
+    from codemod.schema import SCHEMA_PATH
+
+    try:
+        return hashlib.sha1(SCHEMA_PATH.read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+
+def load(name, root=PACK_DIR, bundle_dir=BUNDLE_DIR):
+    """The compiled Bundle for a pack, from the cache when nothing it depends on changed"""
+    path = find(name, root)
+    data = path.read_bytes()
+    key = fingerprint(VERSION, data, _code_digest())
+    bundle_path = Path(bundle_dir) / f'{path.stem}.pickle'
+    try:
+        with open(bundle_path, 'rb') as f:
+            cached = pickle.load(f)
+        if cached['key'] == key and (cached['schema'] is None or cached['schema'] == _schema_digest()):
+            return cached['bundle']
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, KeyError, ImportError):
+        pass
+
+    bundle, uses_schema = compile_pack(path.stem, data.decode('utf-8'), key)
+    bundle_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = bundle_path.with_suffix('.tmp')
+    with open(tmp, 'wb') as f:
+        pickle.dump({'key': key, 'schema': _schema_digest() if uses_schema else None, 'bundle': bundle}, f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, bundle_path)
+    return bundle
+
+
+def compile_pack(name, text, key=None):
+    """(Bundle, whether it read schema.prisma) from a pack's TOML source"""
+    import tomllib
+
+    try:
+        pack = tomllib.loads(text)
+    except tomllib.TOMLDecodeError as e:
+        raise PackError(f"{name}: {e}") from None
+    tables = [pack, *pack.get('files', {}).values()]
+    uses_schema = '{{' in text or any(k in table for table in tables for k in _SCHEMA_KEYS)
+    sequential = pack.get('sequential', False)
+    scope = _scope(name, pack, sequential)
+    files = {}
+    for path, table in pack.get('files', {}).items():
+        files[path] = _scope(f'{name}: {path}', table, table.get('sequential', sequential))
+        if files[path] is None:
+            raise PackError(f"{name}: no rules for {path}")
+    if scope is None and not files:
+        raise PackError(f"{name}: no rules")
+    if scope is not None and not pack.get('paths'):
+        raise PackError(f"{name}: global rules need `paths`")
+    bundle = Bundle(name, pack.get('description', ''), list(pack.get('paths', [])),
+                    tuple(pack.get('ext', ['.ts'])), tuple(pack.get('skip', [])), scope, files, key)
+    return bundle, uses_schema
+
+
+def _scope(where, table, sequential):
+    # Only a cache miss gets here, so only then are the engine and schema imported
+    from codemod import lexer, schema
+    from codemod.engine import RuleSet
+
+    pairs = []
+    token_rules = []
+    try:
+        for pattern, replacement in table.get('rules', []):
+            pairs.append((pattern, _expand(replacement, where)))
+        for old, new in table.get('literals', []):
+            pairs.append((re.escape(old), _expand(new, where).replace('\\', '\\\\')))
+        if 'models' in table:
+            pairs.extend(schema.model_rules(**table['models']))
+        if 'relations' in table:
+            pairs.extend(schema.relation_rules(**table['relations']))
+        for spec in table.get('tokens', []):
+            spec = dict(spec)
+            context = spec.pop('context', 'member')
+            old, new = spec.pop('old'), _expand(spec.pop('new'), where)
+            if context == 'key':
+                token_rules.append(lexer.key(old, new, **spec))
+            else:
+                token_rules.append(lexer.TokenRule(old, new, context, **spec))
+        if 'members' in table:
+            token_rules.extend(schema.member_rules(**table['members']))
+    except (TypeError, KeyError) as e:
+        raise PackError(f"{where}: bad rule ({type(e).__name__}: {e})") from None
+    except ValueError as e:
+        raise PackError(f"{where}: {e}") from None
+
+    sets = []
+    try:
+        if pairs:
+            sets.append(RuleSet(pairs))
+        if token_rules:
+            sets.append(lexer.TokenRuleSet(token_rules))
+    except (re.error, ValueError) as e:
+        raise PackError(f"{where}: {e}") from None
+    if not sets:
+        return None
+    # Decided here, once, instead of on every run
+    sequential = sequential or any(s.conflicts() for s in sets)
+    return Scope(sets, sequential)
+
+
+def _expand(replacement, where):
+    def fill(m):
+        from codemod import schema
+
+        kind, args = m.group(1), m.group(2).split()
+        if kind == 'model':
+            value = schema.load_schema()['models'].get(args[0])
+        elif kind == 'relation':
+            value = schema.relation_name(*args)
+        else:
+            value = schema.relations().resolve(*args)
+        if value is None:
+            raise PackError(f"{where}: schema.prisma has nothing for {m.group(0)}")
+        return value
+
+    return _PLACEHOLDER.sub(fill, replacement)
+
+
+def transform(scope):
+    """The callable for a scope, with a rules_key for the result cache"""
+    key = fingerprint(scope.sequential, [s.fingerprint for s in scope.sets])
+    if len(scope.sets) == 1 and not scope.sequential:
+        return scope.sets[0], key
+    return Chain(scope.sets, key, scope.sequential), key
+
+
+def transforms(bundle):
+    """{path: transform} of a bundle's file scopes, like a fix script's transforms()"""
+    return {path: transform(scope)[0] for path, scope in bundle.files.items()}
+
+
+def tables(bundle):
+    """{path: [(pattern, replacement)]} of the regex rules in a bundle's file scopes, like a script's files_map"""
+    from codemod.engine import RuleSet
+
+    return {path: [(rule.pattern, rule.replacement) for s in scope.sets if isinstance(s, RuleSet) for rule in s.rules]
+            for path, scope in bundle.files.items()}
+
+
+def run(bundle, args, report=None):
+    """
+    Apply a bundle: its global scope over the tree, then its file scopes;
+    yields (path, result). Both scopes go into one report (--report /
+    --shard), saved at the end, or into report when the caller has one
+    for several bundles.
+    """
+    from codemod import runner
+
+    own_report = report is None
+    if own_report:
+        report = runner.open_report(args, bundle.key)
+    if bundle.scope is not None:
+        tree_args = argparse.Namespace(**vars(args))
+        tree_args.paths = args.paths or bundle.paths
+        tree_args.ext = args.ext or bundle.ext
+        fix, key = transform(bundle.scope)
+        yield from runner.rewrite_tree(tree_args, fix, key, skip=bundle.skip, report=report)
+    if bundle.files:
+        key = fingerprint(sorted((path, transform(scope)[1]) for path, scope in bundle.files.items()))
+        yield from runner.rewrite_paths(transforms(bundle), args, key, report=report)
+    if own_report:
+        runner.save_report(args, report)
+
+
+def main(argv=None):
+    from codemod import runner
+
+    parser = argparse.ArgumentParser(prog='python3 -m codemod.packs', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help="show the packs in packs/")
+    p = sub.add_parser('compile', help="build (or refresh) bundles ahead of time")
+    p.add_argument('packs', nargs='*', help="pack names or paths (default: all)")
+    p = sub.add_parser('run', help="apply packs, in order")
+    p.add_argument('packs', nargs='+', help="pack names or paths")
+    p.add_argument('--path', dest='paths', action='append', help="override a global pack's paths (repeatable)")
+    runner.add_walk_arguments(p)
+    # A global pack's own ext applies unless --ext is given
+    p.set_defaults(ext=None)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        if args.command == 'list':
+            for path in available():
+                bundle = load(path)
+                rules = sum(len(s) for s in bundle.scope.sets) if bundle.scope else 0
+                rules += sum(len(s) for scope in bundle.files.values() for s in scope.sets)
+                where = ' '.join(bundle.paths) if bundle.scope else ''
+                where += f"{' + ' if where else ''}{len(bundle.files)} files" if bundle.files else ''
+                print(f"{path.stem:<20} {rules:>4} rules  {where:<32} {bundle.description}")
+            return 0
+        if args.command == 'compile':
+            for name in args.packs or available():
+                bundle = load(name)
+                print(f"{bundle.name}: {bundle.key[:12]}")
+            return 0
+        bundles = [load(name) for name in args.packs]
+    except PackError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+
+    out = runner.status(args)
+    print(f"Loaded {len(bundles)} packs in {(time.perf_counter() - start) * 1000:.0f} ms", file=out)
+    failures = 0
+    # One report for the whole invocation, so packs don't overwrite each other's
+    report = runner.open_report(args, fingerprint([bundle.key for bundle in bundles]))
+    for bundle in bundles:
+        fixed = total = 0
+        for path, result in run(bundle, args, report):
+            total += 1
+            if result.changed:
+                fixed += 1
+                print(f"✓ Fixed: {path}", file=out)
+            elif runner.failed(result):
+                failures += 1
+                print(f"✗ {runner.outcome(result)}: {path}", file=out)
+        print(f"✅ {bundle.name}: fixed {fixed} of {total} files", file=out)
+    runner.save_report(args, report)
+    return runner.exit_status(failures)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+In-memory pass manager
+Chains several fix scripts over one buffer per file: each file is read once,
+every script's transform for it runs in order on the shared content, the
+line spans each pass changed are recorded, and the result is written once
+(journaled, like any other run) instead of once per script:
+
+    python3 -m codemod.passes fix_aggressive.py fix_remaining.py fix_package_final.py \\
+        fix_package_final_v2.py fix_package_final_v3.py fix_cleanup_v3.py
+"""
+
+import argparse
+import difflib
+import sys
+import time
+from collections import namedtuple
+from pathlib import Path
+
+from codemod import runner
+
+# spans: (first line, lines removed, lines added) per changed hunk, in the pass's input
+PassResult = namedtuple('PassResult', 'name spans seconds')
+
+
+class PassManager:
+    """Ordered (name, transform) passes over one file's content"""
+
+    def __init__(self, passes=()):
+        self.passes = list(passes)
+
+    def add(self, name, transform):
+        self.passes.append((name, transform))
+
+    def __len__(self):
+        return len(self.passes)
+
+    def run(self, content):
+        """Run every pass in order, returns (content, [PassResult] for passes that changed it)"""
+        results = []
+        for name, transform in self.passes:
+            start = time.perf_counter()
+            new_content = transform(content)
+            seconds = time.perf_counter() - start
+            if new_content != content:
+                results.append(PassResult(name, edit_spans(content, new_content), seconds))
+                content = new_content
+        return content, results
+
+
+def edit_spans(old, new):
+    """(first line, removed, added) for each changed hunk between two versions"""
+    matcher = difflib.SequenceMatcher(None, old.splitlines(), new.splitlines(), autojunk=False)
+    return [(i1 + 1, i2 - i1, j2 - j1) for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != 'equal']
+
+
+def pipelines(scripts):
+    """{path: PassManager} from each script's transforms(), in script order"""
+    found = {}
+    for script in scripts:
+        module = runner.load_script(script)
+        if not hasattr(module, 'transforms'):
+            raise ValueError(f"{script} has no transforms() (tree-walking scripts run on their own)")
+        for path, transform in module.transforms().items():
+            found.setdefault(path, PassManager()).add(Path(script).stem, transform)
+    return found
+
+
+class Report:
+    """Per-file pass results of a chained run"""
+
+    def __init__(self):
+        self.files = {}
+
+    def add(self, path, results):
+        self.files[path] = results
+
+
+def run_passes(content, manager, path=None, report=None):
+    """Transform for runner.rewrite_paths: every pass of manager over content"""
+    new_content, results = manager.run(content)
+    if report is not None:
+        report.add(path, results)
+    return new_content
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python3 -m codemod.passes', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('scripts', nargs='+', help="fix_*.py scripts with transforms(), run in this order")
+    parser.add_argument('-v', '--verbose', action='store_true', help="list the line spans each pass changed")
+    runner.add_output_arguments(parser)
+    args = parser.parse_args(argv)
+
+    for script in args.scripts:
+        if not Path(script).exists():
+            print(f"ERROR: Script {script} not found", file=sys.stderr)
+            return 1
+    try:
+        managers = pipelines(args.scripts)
+    except ValueError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+
+    report = Report()
+    transforms = {path: lambda content, path=path, manager=manager: run_passes(content, manager, path, report)
+                  for path, manager in managers.items()}
+    out = runner.status(args)
+    failures = 0
+    for path, result in runner.rewrite_paths(transforms, args):
+        failures += runner.failed(result)
+        results = report.files.get(path, [])
+        print(f"{runner.outcome(result)} {path} "
+              f"({len(results)} of {len(managers[path])} passes changed it, 1 read, "
+              f"{1 if result.changed and not args.dry_run else 0} write)", file=out)
+        for name, spans, seconds in results:
+            removed = sum(r for _, r, _ in spans)
+            added = sum(a for _, _, a in spans)
+            print(f"  {name}: {len(spans)} hunks, +{added} -{removed} lines, {seconds * 1000:.1f} ms", file=out)
+            if args.verbose:
+                for line, r, a in spans:
+                    print(f"    line {line}: -{r} +{a}", file=out)
+    return runner.exit_status(failures)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
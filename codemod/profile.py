@@ -0,0 +1,70 @@
+"""
+Per-rule profile of a codemod run
+Collects each rule's hits, bytes scanned and time per file, plus the files a
+rule was the only reason to rewrite, and reports them as a table and JSON.
+"""
+
+import json
+from pathlib import Path
+
+from codemod.cache import CACHE_DIR
+
+PROFILE_PATH = CACHE_DIR / 'profile.json'
+
+
+class Profile:
+    """Accumulates the per-file stats returned by a rule set's profile()"""
+
+    def __init__(self):
+        self.rules = {}
+        self.files = 0
+
+    def _entry(self, label):
+        return self.rules.setdefault(label, {
+            'rule': label, 'hits': 0, 'files': 0, 'sole_files': [],
+            'bytes': 0, 'seconds': 0.0, 'per_file': {},
+        })
+
+    def add(self, path, stats, changed):
+        if stats is None:
+            return
+        self.files += 1
+        hit_rules = [label for label, hits, _, _ in stats if hits]
+        for label, hits, seconds, scanned in stats:
+            entry = self._entry(label)
+            entry['hits'] += hits
+            entry['bytes'] += scanned
+            entry['seconds'] += seconds
+            if hits:
+                entry['files'] += 1
+                entry['per_file'][str(path)] = {'hits': hits, 'seconds': seconds, 'bytes': scanned}
+        # The only rule that fired in a rewritten file is the whole reason for the write
+        if changed and len(hit_rules) == 1:
+            self._entry(hit_rules[0])['sole_files'].append(str(path))
+
+    def sorted(self):
+        return sorted(self.rules.values(), key=lambda e: -e['seconds'])
+
+    def dead(self):
+        """Rules that never matched (excluding shared passes like `(tokenize)`)"""
+        return [e['rule'] for e in self.sorted() if not e['hits'] and not e['rule'].startswith('(')]
+
+    def to_json(self):
+        return {'files': self.files, 'rules': self.sorted(), 'dead': self.dead()}
+
+    def save(self, path=PROFILE_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_json(), indent=1), encoding='utf-8')
+        return path
+
+    def print_table(self, out, limit=None):
+        total = sum(e['seconds'] for e in self.rules.values()) or 1
+        print(f"\n{'ms':>9} {'%':>5} {'hits':>6} {'files':>6} {'sole':>5} {'MB':>7} {'µs/KB':>7}  rule", file=out)
+        for e in self.sorted()[:limit]:
+            per_kb = e['seconds'] * 1e6 / (e['bytes'] / 1024) if e['bytes'] else 0
+            print(f"{e['seconds'] * 1000:9.1f} {e['seconds'] / total:5.0%} {e['hits']:>6} {e['files']:>6} "
+                  f"{len(e['sole_files']):>5} {e['bytes'] / 1e6:7.2f} {per_kb:7.1f}  {e['rule']}", file=out)
+        dead = self.dead()
+        if dead:
+            print(f"\n{len(dead)} rules never matched in {self.files} files: {', '.join(dead)}", file=out)
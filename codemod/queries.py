@@ -0,0 +1,287 @@
+"""
+Static Prisma query-shape extractor
+Catalogs every `<prisma|tx>.<model>.<op>(...)` call in one lexer pass per
+file: model, operation, include/select depth, take/skip, and whether the call
+sits in a loop or a `.map(...)` callback (inside `Promise.all` or not). The
+report ranks likely N+1 patterns and unbounded findMany calls, offline:
+
+    python3 -m codemod.queries apps/api/src --json .codemod-cache/queries.json
+"""
+
+import argparse
+import bisect
+import json
+import sys
+from collections import Counter, namedtuple
+from pathlib import Path
+
+from codemod import objects, runner, schema
+from codemod.diagnostics import line_starts
+from codemod.lexer import code_tokens
+
+RECEIVERS = ('prisma', 'tx')
+
+OPERATIONS = {
+    'findMany', 'findFirst', 'findFirstOrThrow', 'findUnique', 'findUniqueOrThrow',
+    'create', 'createMany', 'update', 'updateMany', 'upsert', 'delete', 'deleteMany',
+    'count', 'aggregate', 'groupBy',
+}
+
+# Array methods whose callback runs once per element
+ITERATORS = {'map', 'flatMap', 'forEach', 'reduce', 'filter', 'some', 'every', 'find', 'findIndex'}
+LOOPS = {'for', 'while'}
+
+# How bad a query per element is: awaited one by one, fired all at once, or from a bare callback
+WEIGHTS = {'loop': 3, 'Promise.all(map)': 2, 'callback': 2}
+
+# args: the ObjectLiteral passed to the call (None when it isn't a literal);
+# context: 'loop', 'Promise.all(map)', 'callback' or None
+Call = namedtuple('Call', 'path line model op receiver awaited context depth take skip args start end')
+
+
+def scan(text, path=None, tokens=None, literals=None):
+    """Every Prisma call in text as a Call, in source order"""
+    if tokens is None:
+        tokens = code_tokens(text)
+    if literals is None:
+        literals = objects.scan(text, tokens)
+    by_token = {o.token: o for o in literals}
+    by_start = {o.start: o for o in literals}
+    starts = line_starts(text)
+    accessors = _accessors()
+    found = []
+    for i, token, stack in walk(tokens):
+        if token.text in OPERATIONS and _is_call(tokens, i):
+            found.append(_call(tokens, i, stack, by_token, by_start, starts, accessors, path))
+    return found
+
+
+def walk(tokens, start=0, end=None):
+    """
+    Yield (index, token, stack) for each identifier in tokens[start:end].
+    stack holds (opener, tag) per open bracket; tags mark loop bodies, loop
+    headers, iterator callbacks and Promise.all arguments (see context()).
+    """
+    stack = []
+    body_next = False
+    for i in range(start, len(tokens) if end is None else end):
+        token = tokens[i]
+        value = token.text
+        if token.kind == 'template':
+            if value[0] == '}' and stack and stack[-1][0] == '${':
+                stack.pop()
+            if value.endswith('${'):
+                stack.append(('${', None))
+            continue
+        if token.kind == 'ident':
+            if value == 'do' and _text(tokens, i + 1) == '{':
+                body_next = True
+            yield i, token, stack
+            continue
+        if token.kind != 'punct':
+            continue
+
+        if value in ('(', '[', '{'):
+            tag = None
+            if value == '(':
+                tag = _paren_tag(tokens, i)
+            elif value == '{' and body_next:
+                tag = 'loop'
+            body_next = False
+            stack.append((value, tag))
+        elif value in (')', ']', '}'):
+            while stack and stack[-1][0] == 'stmt':
+                stack.pop()
+            if not stack:
+                continue
+            _, tag = stack.pop()
+            if tag == 'header':
+                # for (...) { body } or a single-statement body
+                if _text(tokens, i + 1) == '{':
+                    body_next = True
+                else:
+                    stack.append(('stmt', 'loop'))
+        elif value == ';' and stack and stack[-1][0] == 'stmt':
+            stack.pop()
+
+
+def _text(tokens, i):
+    return tokens[i].text if 0 <= i < len(tokens) else None
+
+
+def _paren_tag(tokens, i):
+    prev = tokens[i - 1] if i else None
+    if prev is None:
+        return None
+    if prev.kind == 'ident' and prev.text in LOOPS and _text(tokens, i - 2) not in ('.', '?.'):
+        return 'header'
+    if _text(tokens, i - 2) in ('.', '?.'):
+        if prev.text in ITERATORS:
+            return 'iter'
+        if prev.text in ('all', 'allSettled') and _text(tokens, i - 3) == 'Promise':
+            return 'all'
+    return None
+
+
+def _is_call(tokens, i):
+    """tokens[i] is the op in `<receiver>.<model>.<op>(`"""
+    return (_text(tokens, i + 1) == '(' and _text(tokens, i - 1) in ('.', '?.')
+            and i >= 4 and tokens[i - 2].kind == 'ident' and not tokens[i - 2].text.startswith('$')
+            and _text(tokens, i - 3) in ('.', '?.') and tokens[i - 4].text in RECEIVERS)
+
+
+def context(stack):
+    """'loop', 'Promise.all(map)', 'callback' or None for a walk() stack"""
+    tags = [tag for _, tag in stack if tag in ('loop', 'iter', 'all')]
+    if 'loop' in tags:
+        return 'loop'
+    if 'iter' in tags:
+        return 'Promise.all(map)' if 'all' in tags[:tags.index('iter')] else 'callback'
+    return None
+
+
+def _call(tokens, i, stack, by_token, by_start, starts, accessors, path):
+    start = tokens[i - 4].start
+    head = i - 4
+    if _text(tokens, head - 1) == '.' and _text(tokens, head - 2) == 'this':
+        head -= 2
+        start = tokens[head].start
+    args = by_token.get(i + 2)
+    model = accessors.get(tokens[i - 2].text, tokens[i - 2].text)
+    keys = objects.keys(args) if args is not None else set()
+    return Call(
+        path=str(path) if path is not None else None,
+        line=bisect.bisect_right(starts, start),
+        model=model,
+        op=tokens[i].text,
+        receiver=tokens[i - 4].text,
+        awaited=_text(tokens, head - 1) == 'await',
+        context=context(stack),
+        depth=depth(args, model, by_start) if args is not None else 0,
+        take='take' in keys if args is not None else None,
+        skip='skip' in keys if args is not None else None,
+        args=args,
+        start=start,
+        end=_call_end(tokens, i + 1),
+    )
+
+
+def _call_end(tokens, i):
+    """Offset just past the closing paren of the call opening at tokens[i]"""
+    level = 0
+    for token in tokens[i:]:
+        if token.text in ('(', '[', '{'):
+            level += 1
+        elif token.text in (')', ']', '}'):
+            level -= 1
+            if level == 0:
+                return token.end
+    return tokens[-1].end
+
+
+def depth(literal, model, by_start):
+    """
+    Nesting of include/select relations in a query's arguments: 0 for none,
+    1 for `include: { users: true }`, 2 when those include more, and so on.
+    Under `select`, only keys the relation table knows as relations count.
+    """
+    relations = schema.relations()
+    deepest = 0
+    for prop in literal.props:
+        if prop.key not in ('include', 'select'):
+            continue
+        inner = by_start.get(prop.value_start)
+        if inner is None:
+            continue
+        for field in inner.props:
+            rel = relations.get(model, field.key)
+            if rel is None and (prop.key == 'select' or field.key == '_count'):
+                continue
+            nested = by_start.get(field.value_start)
+            below = depth(nested, rel.target if rel else None, by_start) if nested is not None else 0
+            deepest = max(deepest, 1 + below)
+    return deepest
+
+
+_accessor_map = None
+
+
+def _accessors():
+    """Client accessor -> model name (introspected names are their own accessors)"""
+    global _accessor_map
+    if _accessor_map is None:
+        _accessor_map = {name[0].lower() + name[1:]: name for name in schema.load_schema()['schema']}
+    return _accessor_map
+
+
+def scan_file(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return scan(f.read(), path)
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"ERROR reading {path}: {e}", file=sys.stderr)
+        return []
+
+
+def findings(calls):
+    """(score, kind, call) for likely N+1 and unbounded calls, worst first"""
+    found = []
+    for call in calls:
+        if call.context is not None:
+            weight = WEIGHTS[call.context] + (1 if call.context == 'loop' and call.awaited else 0)
+            found.append((weight * (1 + call.depth), 'N+1', call))
+        if call.op == 'findMany' and call.take is not True:
+            has_where = call.args is not None and 'where' in objects.keys(call.args)
+            # An argument we can't see may well carry `take`
+            if call.args is None and call.context is None:
+                continue
+            found.append((1 + call.depth + (0 if has_where else 2), 'unbounded', call))
+    found.sort(key=lambda f: (-f[0], f[2].path or '', f[2].line))
+    return found
+
+
+def to_json(call):
+    data = call._asdict()
+    del data['args'], data['start'], data['end']
+    return data
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python3 -m codemod.queries', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='*', default=['apps/api/src'], help="directories to scan (default: apps/api/src)")
+    parser.add_argument('--ext', type=lambda s: tuple(s.split(',')), default=('.ts',),
+                        help="comma-separated extensions (default: .ts)")
+    parser.add_argument('-j', '--jobs', type=int, default=1, help="worker processes (default: 1)")
+    parser.add_argument('--top', type=int, default=30, help="findings to print (default: 30, 0 for all)")
+    parser.add_argument('--json', metavar='PATH', help="write every call and finding as JSON")
+    args = parser.parse_args(argv)
+
+    files = list(runner.iter_files(args.paths, args.ext, ('.spec.ts', '.d.ts')))
+    calls = [call for _, found in runner.run(scan_file, files, args.jobs) for call in found]
+    ranked = findings(calls)
+
+    ops = Counter(call.op for call in calls)
+    print(f"{len(calls)} Prisma calls in {len(files)} files "
+          f"({', '.join(f'{op}: {n}' for op, n in ops.most_common(6))})")
+    print(f"{sum(1 for _, kind, _ in ranked if kind == 'N+1')} calls per loop element, "
+          f"{sum(1 for _, kind, _ in ranked if kind == 'unbounded')} findMany without take\n")
+    print(f"{'score':>5}  {'kind':<9}  {'context':<16}  {'depth':>5}  call")
+    for score, kind, call in ranked[:args.top or None]:
+        context = call.context or ('await' if call.awaited else '-')
+        print(f"{score:>5}  {kind:<9}  {context:<16}  {call.depth:>5}  "
+              f"{call.path}:{call.line}  {call.model}.{call.op}")
+
+    if args.json:
+        path = Path(args.json)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({
+            'calls': [to_json(c) for c in calls],
+            'findings': [{'score': s, 'kind': k, **to_json(c)} for s, k, c in ranked],
+        }, indent=1), encoding='utf-8')
+        print(f"\nReport saved to {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
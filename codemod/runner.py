@@ -0,0 +1,473 @@
+"""
+Parallel file walker for the codemod scripts
+Spreads per-file rewrites over a process pool and reports results in input order
+"""
+
+import contextlib
+import difflib
+import importlib.util
+import io
+import os
+import sys
+from collections import namedtuple
+from functools import partial
+from pathlib import Path
+
+from codemod import budget, cache, index, journal, shard, spans, validate
+from codemod.profile import PROFILE_PATH, Profile
+
+SKIP_DIRS = {'node_modules', 'dist', '.next', '.turbo', 'coverage', '.codemod-cache'}
+
+# In --dry-run mode diff holds the unified diff, or stat the (added, removed) line counts;
+# pending is (temp file, its digest) waiting for the journal to swap it in;
+# profile is the rule set's per-rule stats with --profile;
+# problems lists what a rejected rewrite would have broken (see codemod.validate);
+# error is the message of an exception that stopped the file;
+# overruns lists (rule, seconds) skipped for running over the time budget (see codemod.budget);
+# hits is {rule: applied matches} with hits=True, for reports
+FileResult = namedtuple('FileResult', 'changed digest cached diff stat pending profile problems error overruns hits',
+                        defaults=(None, None, None, None, None, None, None, None))
+
+
+def add_output_arguments(parser):
+    """--dry-run / --stat, shared by every script"""
+    parser.add_argument('-n', '--dry-run', action='store_true',
+                        help="print unified diffs to stdout instead of rewriting files")
+    parser.add_argument('--stat', action='store_true',
+                        help="with --dry-run, print changed line counts per file instead of diffs")
+    parser.add_argument('--batch-size', type=int, default=journal.BATCH_SIZE,
+                        help=f"files swapped in per journal batch (default: {journal.BATCH_SIZE})")
+    parser.add_argument('--no-validate', dest='validate', action='store_false',
+                        help="write rewrites even if they unbalance brackets or duplicate keys")
+    parser.add_argument('--rule-budget', type=float, metavar='SECONDS',
+                        help=f"time one rule may take on one file before it is skipped "
+                             f"(default: {budget.DEFAULT_SECONDS:g}, 0 = no limit)")
+    parser.add_argument('--shard', type=shard.parse, metavar='i/N',
+                        help="only process shard i of N (stable across machines, see codemod.shard)")
+    parser.add_argument('--report', metavar='JSON',
+                        help=f"write edits, rule hits and errors as JSON (default with --shard: {shard.SHARD_DIR}/i-of-N.json)")
+
+
+def add_arguments(parser, default_paths):
+    """Common command line options for scripts that walk a tree"""
+    parser.add_argument('paths', nargs='*', default=default_paths,
+                        help=f"directories to walk (default: {' '.join(default_paths)})")
+    add_walk_arguments(parser)
+
+
+def add_walk_arguments(parser):
+    """add_arguments without the positional paths, for commands that take other positionals"""
+    parser.add_argument('--ext', type=lambda s: tuple(s.split(',')), default=('.ts',),
+                        help="comma-separated extensions (default: .ts, use .ts,.tsx for apps/web)")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: one per core, 1 = no pool)")
+    parser.add_argument('--chunksize', type=int, default=0,
+                        help="files handed to a worker at a time (default: auto)")
+    add_cache_arguments(parser)
+    parser.add_argument('--no-index', dest='index', action='store_false',
+                        help="read every file instead of only those the word index says can match")
+    parser.add_argument('--profile', nargs='?', const=PROFILE_PATH, default=None, metavar='JSON',
+                        help=f"record per-rule hits/time (implies --no-cache; JSON to {PROFILE_PATH})")
+    add_output_arguments(parser)
+
+
+def add_cache_arguments(parser):
+    """--no-cache / --cache-size, for scripts that skip known unchanged files"""
+    parser.add_argument('--no-cache', dest='cache', action='store_false',
+                        help="re-process every file instead of skipping known unchanged ones")
+    parser.add_argument('--cache-size', type=int, default=cache.MAX_ENTRIES,
+                        help=f"max cached results kept (default: {cache.MAX_ENTRIES})")
+
+
+def script_key(script):
+    """
+    rules_key for a script's transforms() (plain functions, not rule sets):
+    the script's source, the codemod package and schema.prisma, so editing
+    any of them invalidates its cached results
+    """
+    from codemod.schema import SCHEMA_PATH
+
+    return cache.source_key(script, *sorted(Path(__file__).parent.glob('*.py')), SCHEMA_PATH)
+
+
+def load_script(path):
+    """Import a fix_*.py script as a module (its main() is not run)"""
+    path = Path(path)
+    spec = importlib.util.spec_from_file_location(path.stem, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def iter_files(roots, suffixes=('.ts',), skip=()):
+    """Yield source files under the given roots in a stable order"""
+    for root in roots:
+        root = Path(root)
+        if root.is_file():
+            yield root
+            continue
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS)
+            for name in sorted(filenames):
+                if name.endswith(suffixes) and not any(s in name for s in skip):
+                    yield Path(dirpath) / name
+
+
+def readlines(content):
+    """Split like file.readlines() on a file opened in text mode"""
+    return io.StringIO(content).readlines()
+
+
+def unified_diff(path, old, new):
+    """git-style diff of one file, so the output applies with `git apply`"""
+    out = [f'diff --git a/{path} b/{path}\n']
+    for line in difflib.unified_diff(readlines(old), readlines(new), f'a/{path}', f'b/{path}'):
+        out.append(line)
+        if not line.endswith('\n'):
+            out.append('\n\\ No newline at end of file\n')
+    return ''.join(out)
+
+
+def diff_stat(old, new):
+    """(added, removed) line counts between two versions of a file"""
+    added = removed = 0
+    matcher = difflib.SequenceMatcher(None, old.splitlines(), new.splitlines(), autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag != 'equal':
+            removed += i2 - i1
+            added += j2 - j1
+    return added, removed
+
+
+def rewrite_file(filepath, transform, rules_key=None, dry_run=False, stat=False, staged=False, profile=False,
+                 check=False, hits=False):
+    """
+    Apply transform(content) -> content to one file, writing only on change.
+    With a rules_key, content already known to be unchanged is skipped.
+    With dry_run nothing is written; the diff (or its stat) is returned instead.
+    With staged the new content is left in a temp file for a Journal to apply.
+    Transforms with an edits() method (rule sets) run directly on a memory map of the file.
+    With profile, a rule set's profile() is used and its stats returned.
+    With check, a rewrite that adds syntax problems (codemod.validate) is rejected, not written.
+    With hits, a rule set's per-rule match counts come back in hits (no extra scan).
+    Rules that run over the time budget are skipped and listed in overruns.
+    """
+    budget.take()
+    result = _rewrite_file(filepath, transform, rules_key, dry_run, stat, staged, profile, check, hits)
+    overruns = budget.take()
+    if not overruns:
+        return result
+    for label, seconds in overruns:
+        print(f"⚠ BUDGET {filepath}: {label!r} over {seconds:g}s, skipped", file=sys.stderr)
+    # A skipped rule never saw the file, so it must not be remembered as clean
+    return result._replace(overruns=overruns, digest=result.digest if result.changed else None)
+
+
+def _rewrite_file(filepath, transform, rules_key, dry_run, stat, staged, profile, check, hits):
+    try:
+        profile = profile and hasattr(transform, 'profile')
+        hits = hits and hasattr(transform, 'rewrite')
+        if hasattr(transform, 'edits') and not profile:
+            result = _rewrite_mapped(filepath, transform, rules_key, dry_run, stat, staged, check, hits)
+            if result is not None:
+                return result
+        with open(filepath, 'rb') as f:
+            data = f.read()
+        content_digest = cache.digest(data)
+        if rules_key and cache.is_clean(rules_key, content_digest):
+            return FileResult(False, content_digest, True)
+
+        # Same newline handling as reading in text mode
+        content = data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+        stats = counts = None
+        if profile:
+            new_content, stats = transform.profile(content)
+            counts = {label: n for label, n, _, _ in stats if n}
+        elif hits:
+            new_content, counts = transform.rewrite(content)
+            counts = _hits(transform, counts)
+        else:
+            new_content = transform(content)
+        if new_content == content:
+            return FileResult(False, content_digest, False, profile=stats, hits=counts)
+        if check:
+            problems = validate.introduced(content, new_content, filepath)
+            if problems:
+                return _rejected(filepath, problems)
+        if dry_run and stat:
+            return FileResult(True, content_digest, False, stat=diff_stat(content, new_content), profile=stats,
+                              hits=counts)
+        if dry_run:
+            return FileResult(True, content_digest, False, diff=unified_diff(filepath, content, new_content),
+                              profile=stats, hits=counts)
+        if staged:
+            tmp = journal.stage(filepath, new_content)
+            after = cache.digest(new_content.encode('utf-8'))
+            return FileResult(True, content_digest, False, pending=(tmp, after), profile=stats, hits=counts)
+        journal.replace(filepath, new_content)
+        return FileResult(True, content_digest, False, profile=stats, hits=counts)
+    except Exception as e:
+        print(f"ERROR processing {filepath}: {e}", file=sys.stderr)
+        return FileResult(False, None, False, error=str(e))
+
+
+def _rejected(filepath, problems):
+    for p in problems:
+        print(f"REJECTED {filepath}:{p.line}:{p.col}: {p.kind}: {p.message}", file=sys.stderr)
+    # No digest, so the file is never remembered as clean
+    return FileResult(False, None, False, problems=problems)
+
+
+def _hits(rules, counts):
+    """{rule pattern: count} for the rules that matched"""
+    return {rule.pattern: n for rule, n in zip(rules.rules, counts) if n}
+
+
+def _rewrite_mapped(filepath, rules, rules_key, dry_run, stat, staged, check=False, hits=False):
+    """rewrite_file on an mmap with byte edits; None means use the text path"""
+    with spans.mapped(filepath) as buffer:
+        content_digest = cache.digest(buffer)
+        if rules_key and cache.is_clean(rules_key, content_digest):
+            return FileResult(False, content_digest, True)
+        # Text mode would normalise CRLF; leave those files to the text path
+        if buffer.find(b'\r') != -1:
+            return None
+        counts = [0] * len(rules) if hits else None
+        edits = rules.edits(buffer, ascii_input=partial(spans.is_ascii, buffer), counts=counts)
+        if edits is None:
+            return None
+        if hits:
+            counts = _hits(rules, counts)
+        if not edits:
+            return FileResult(False, content_digest, False, hits=counts)
+        if check:
+            # Only touched files pay for the decode
+            problems = validate.introduced(str(buffer, 'utf-8'), spans.apply(buffer, edits), filepath)
+            if problems:
+                return _rejected(filepath, problems)
+        if dry_run:
+            content = str(buffer, 'utf-8')
+            new_content = spans.apply(buffer, edits)
+            if stat:
+                return FileResult(True, content_digest, False, stat=diff_stat(content, new_content), hits=counts)
+            return FileResult(True, content_digest, False, diff=unified_diff(filepath, content, new_content),
+                              hits=counts)
+        tmp, after = journal.stage_spans(filepath, buffer, edits)
+    if staged:
+        return FileResult(True, content_digest, False, pending=(tmp, after), hits=counts)
+    os.replace(tmp, filepath)
+    return FileResult(True, content_digest, False, hits=counts)
+
+
+def remember_clean(rules_key, results, max_entries=cache.MAX_ENTRIES):
+    """Store the digests of files a run left unchanged"""
+    digests = [r.digest for r in results if r.digest and not r.changed]
+    if rules_key and digests:
+        cache.mark_clean(rules_key, digests, max_entries)
+
+
+def run(func, files, jobs=1, chunksize=0):
+    """
+    Call func(path) for every file, yielding (path, result) in input order.
+    With jobs > 1 the calls run in a process pool, so func must be a
+    module-level function (or a functools.partial of one).
+    """
+    files = list(files)
+    if jobs <= 1 or len(files) < 2:
+        for path in files:
+            yield path, func(path)
+        return
+
+    # Imported here: a single-process run shouldn't pay for multiprocessing at startup
+    from multiprocessing import Pool
+
+    jobs = min(jobs, len(files))
+    if chunksize <= 0:
+        # A few chunks per worker keeps the pool busy without much IPC
+        chunksize = max(1, len(files) // (jobs * 4))
+    with Pool(jobs) as pool:
+        yield from zip(files, pool.imap(func, files, chunksize))
+
+
+def status(args):
+    """Stream for progress lines: stderr in --dry-run, so stdout stays a clean patch"""
+    return sys.stderr if args.dry_run else sys.stdout
+
+
+def outcome(result):
+    """How a progress line describes a result: Fixed, Rejected, Failed or No changes for"""
+    if result.problems:
+        return 'Rejected'
+    if result.error is not None:
+        return 'Failed'
+    return 'Fixed' if result.changed else 'No changes for'
+
+
+def failed(result):
+    """A rewrite that was rejected by validation or stopped by an error, so nothing was written"""
+    return bool(result.problems) or result.error is not None
+
+
+def exit_status(failures):
+    """A script's exit status: 1, with a note on stderr, when any file was rejected or failed"""
+    if failures:
+        print(f"⚠ {failures} files rejected or failed, left unchanged", file=sys.stderr)
+        return 1
+    return 0
+
+
+def rewrite_tree(args, transform, rules_key=None, skip=(), report=None):
+    """
+    Rewrite every matching file under args.paths, yielding (path, result) as
+    workers finish, in input order. In --dry-run mode each diff is written to
+    stdout as soon as it arrives and then dropped, so memory stays flat.
+    Otherwise rewrites are applied in journaled batches (see codemod.journal).
+    Unchanged files are remembered in the result cache at the end.
+    Rule sets with requirements() are planned against the word index
+    (codemod.index) and files that can't match are not opened at all.
+    With --profile, per-rule stats are reported once every file is done.
+    With --shard only that shard's files are processed; with --shard or
+    --report, a JSON report of the run is written at the end. Callers doing
+    several runs pass one report (see open_report) and save it themselves.
+    """
+    # A profile has to see every file, so nothing is skipped as known-clean
+    rules_key = rules_key if args.cache and not args.profile else None
+    budget.configure(getattr(args, 'rule_budget', None))
+    budget.warn_rules(transform)
+    own_report = report is None
+    if own_report:
+        report = open_report(args, rules_key)
+    fix = partial(rewrite_file, transform=transform, rules_key=rules_key,
+                  dry_run=args.dry_run, stat=args.stat, staged=not args.dry_run,
+                  profile=bool(args.profile), check=getattr(args, 'validate', True), hits=report is not None)
+    files = list(iter_files(args.paths, args.ext, skip))
+    if getattr(args, 'shard', None):
+        files = shard.select(files, args.shard)
+    skipped = set()
+    if getattr(args, 'index', True) and hasattr(transform, 'requirements'):
+        skipped = set(index.plan(files, transform)[1])
+    results = run(fix, [f for f in files if f not in skipped], args.jobs, args.chunksize)
+    totals = [0, 0, 0]
+    clean = []
+    profile = Profile() if args.profile else None
+    if profile is not None and not hasattr(transform, 'profile'):
+        print("⚠ --profile: this transform has no per-rule stats", file=status(args))
+    with _journal(args) as run_journal:
+        try:
+            for path in files:
+                if path in skipped:
+                    if report is not None:
+                        report.add(path, FileResult(False, None, True))
+                    yield path, FileResult(False, None, True)
+                    continue
+                path, result = next(results)
+                if profile is not None:
+                    profile.add(path, result.profile, result.changed)
+                if not result.changed:
+                    clean.append(result)
+                if report is not None:
+                    report.add(path, result)
+                _apply(run_journal, path, result)
+                _show(path, result, totals)
+                yield path, result._replace(diff=None, pending=None, profile=None, hits=None)
+        except BaseException:
+            # Workers may have staged files the journal never saw
+            journal.sweep(files)
+            raise
+    if args.dry_run and args.stat:
+        _show_totals(totals)
+    remember_clean(rules_key, clean, args.cache_size)
+    if own_report:
+        save_report(args, report)
+    if profile is not None and profile.files:
+        profile.print_table(status(args))
+        print(f"Profile saved to {profile.save(args.profile)}", file=status(args))
+
+
+def rewrite_paths(transforms, args, rules_key=None, report=None):
+    """
+    Rewrite a fixed set of files, {path: transform}, yielding (path, result).
+    Files that don't exist are reported and skipped. With a rules_key (and
+    without --no-cache), contents known to be left unchanged by a path's
+    transform are skipped, as in rewrite_tree. --shard, --report and report
+    work as in rewrite_tree.
+    """
+    if not getattr(args, 'cache', True):
+        rules_key = None
+    clean = {}
+    totals = [0, 0, 0]
+    own_report = report is None
+    if own_report:
+        report = open_report(args)
+    budget.configure(getattr(args, 'rule_budget', None))
+    paths = list(transforms)
+    if getattr(args, 'shard', None):
+        paths = shard.select(paths, args.shard)
+    with _journal(args) as run_journal:
+        for path in paths:
+            transform = transforms[path]
+            budget.warn_rules(transform)
+            if not os.path.exists(path):
+                print(f"Skipping {path} (not found)", file=status(args))
+                continue
+            # Each path has its own transform, so its own key
+            path_key = cache.fingerprint(rules_key, path) if rules_key else None
+            result = rewrite_file(path, transform, path_key, dry_run=args.dry_run, stat=args.stat,
+                                  staged=not args.dry_run, check=getattr(args, 'validate', True),
+                                  hits=report is not None)
+            if not result.changed:
+                clean.setdefault(path_key, []).append(result)
+            if report is not None:
+                report.add(path, result)
+            _apply(run_journal, path, result)
+            _show(path, result, totals)
+            yield path, result._replace(diff=None, pending=None)
+    if args.dry_run and args.stat:
+        _show_totals(totals)
+    for path_key, results in clean.items():
+        remember_clean(path_key, results, getattr(args, 'cache_size', cache.MAX_ENTRIES))
+    if own_report:
+        save_report(args, report)
+
+
+def open_report(args, rules_key=None):
+    """The shard.Report a run with --report or --shard fills in, else None"""
+    if getattr(args, 'report', None) or getattr(args, 'shard', None):
+        return shard.Report(args.shard, rules_key, args.dry_run)
+    return None
+
+
+def save_report(args, report):
+    """Write a run's report to --report (default with --shard: its shard file)"""
+    if report is not None:
+        path = report.save(args.report or shard.report_path(args.shard))
+        print(f"Report saved to {path}", file=sys.stderr)
+
+
+def _journal(args):
+    if args.dry_run:
+        return contextlib.nullcontext()
+    return journal.Journal(batch_size=getattr(args, 'batch_size', journal.BATCH_SIZE))
+
+
+def _apply(run_journal, path, result):
+    if result.pending is not None:
+        tmp, after = result.pending
+        run_journal.add(path, tmp, result.digest, after)
+
+
+def _show(path, result, totals):
+    if result.diff is not None:
+        sys.stdout.write(result.diff)
+        sys.stdout.flush()
+    elif result.stat is not None:
+        added, removed = result.stat
+        print(f" {path} | +{added} -{removed}", flush=True)
+        totals[0] += 1
+        totals[1] += added
+        totals[2] += removed
+
+
+def _show_totals(totals):
+    files, added, removed = totals
+    print(f" {files} files changed, {added} insertions(+), {removed} deletions(-)")
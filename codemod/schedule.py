@@ -0,0 +1,274 @@
+"""
+Fixed-point rule scheduler
+Builds a dependency graph between regex rules (rule A feeds rule B when A's
+output can create a new match for B), orders them so producers run before
+consumers, and re-runs per file only the rules fed by what just fired, until
+nothing changes. Rule pairs that undo each other are reported instead of
+looping.
+
+    python3 -m codemod.schedule fix_package_final_v2.py fix_package_final_v3.py fix_cleanup_v3.py
+"""
+
+import argparse
+import sys
+from collections import namedtuple
+from pathlib import Path
+
+from codemod import runner
+from codemod.cache import digest
+from codemod.engine import Rule, probes
+
+# Safety net; an acyclic graph needs one pass, each cycle a few more
+MAX_PASSES = 16
+
+# passes: full or partial sweeps over the ordered rules; hits: per-rule substitution counts;
+# oscillation: indices of the rules that brought the file back to an earlier state (None if it settled)
+FixedPoint = namedtuple('FixedPoint', 'passes hits oscillation')
+
+
+def feeds(rule, other):
+    """True if applying rule can create a match for other that wasn't there before"""
+    a, b = rule.example(), other.example()
+    if a is None or b is None:
+        # Can't probe it; be conservative
+        return True
+    out = rule.regex.sub(rule.replacement, a)
+    for probe in probes(a, b, out):
+        before = sum(1 for _ in other.regex.finditer(probe))
+        after = sum(1 for _ in other.regex.finditer(rule.regex.sub(rule.replacement, probe)))
+        if after > before:
+            return True
+    return False
+
+
+def undoes(rule, other):
+    """True if other turns rule's output back into its input (the pair oscillates)"""
+    a = rule.example()
+    if a is None:
+        return False
+    out = rule.regex.sub(rule.replacement, a)
+    return out != a and other.regex.sub(other.replacement, out) == a
+
+
+class Schedule:
+    """Ordered regex rules with their dependency graph, run to a fixed point per file"""
+
+    def __init__(self, rules, max_passes=MAX_PASSES):
+        self.rules = [Rule(i, p, r) for i, (p, r) in enumerate(rules)]
+        self.max_passes = max_passes
+        self.successors = [[j for j, other in enumerate(self.rules) if feeds(rule, other)]
+                           for rule in self.rules]
+        self.order = _topological(self.successors)
+        self.rank = {index: pos for pos, index in enumerate(self.order)}
+
+    def __len__(self):
+        return len(self.rules)
+
+    def back_edges(self):
+        """(rule, other) where other runs earlier, so feeding it costs another pass"""
+        return [(self.rules[i], self.rules[j]) for i, succ in enumerate(self.successors)
+                for j in succ if self.rank[j] <= self.rank[i]]
+
+    def oscillating(self):
+        """Rule pairs that feed each other and undo each other's rewrite"""
+        found = []
+        for i, succ in enumerate(self.successors):
+            for j in succ:
+                if i < j and i in self.successors[j] and undoes(self.rules[i], self.rules[j]):
+                    found.append((self.rules[i], self.rules[j]))
+        return found
+
+    def run(self, content):
+        """Rewrite content to a fixed point, returns (content, FixedPoint)"""
+        hits = [0] * len(self.rules)
+        seen = {digest(content.encode('utf-8')): 0}
+        fired_since = [set()]
+        pending = set(self.order)
+        passes = 0
+        while pending:
+            if passes >= self.max_passes:
+                return content, FixedPoint(passes, hits, sorted(set().union(*fired_since)))
+            passes += 1
+            current, pending = pending, set()
+            fired = set()
+            # Rules fed later in the order run in this pass, earlier ones in the next
+            for index in self.order:
+                if index not in current:
+                    continue
+                rule = self.rules[index]
+                content, n = rule.regex.subn(rule.replacement, content)
+                if not n:
+                    continue
+                hits[index] += n
+                fired.add(index)
+                for other in self.successors[index]:
+                    (current if self.rank[other] > self.rank[index] else pending).add(other)
+            fired_since.append(fired)
+            state = digest(content.encode('utf-8'))
+            if state in seen and pending:
+                # Back to an earlier state: every further pass would repeat the cycle
+                cycle = set().union(*fired_since[seen[state] + 1:])
+                return content, FixedPoint(passes, hits, sorted(cycle))
+            seen.setdefault(state, passes)
+        return content, FixedPoint(passes, hits, None)
+
+    def __call__(self, content):
+        return self.run(content)[0]
+
+
+class Report:
+    """Passes, hits and oscillations per file for a scheduled run"""
+
+    def __init__(self):
+        self.files = {}
+
+    def add(self, path, result):
+        self.files[path] = result
+
+
+def fixed_point(content, schedule, path=None, report=None):
+    """
+    Transform for runner.rewrite_paths: the fixed point of content, or
+    content unchanged if the rules oscillate on it
+    """
+    new_content, result = schedule.run(content)
+    if report is not None:
+        report.add(path, result)
+    return content if result.oscillation is not None else new_content
+
+
+def collect(scripts):
+    """
+    {path: [(pattern, replacement)]} from fix scripts' regex rule tables, in
+    script order: `files_map` entries, or `fix_list` for a script's `path`.
+    Injections, token rules and plain str.replace calls stay with the scripts.
+    """
+    rules = {}
+    for script in scripts:
+        module = runner.load_script(script)
+        tables = dict(getattr(module, 'files_map', {}))
+        if hasattr(module, 'fix_list') and hasattr(module, 'path'):
+            tables.setdefault(module.path, []).extend(module.fix_list)
+        for path, table in tables.items():
+            rules.setdefault(path, []).extend(table)
+    return rules
+
+
+def _topological(successors):
+    """
+    Rule indices with producers before consumers. Cycles (Tarjan SCCs) keep
+    their original order; ties are broken by original order too.
+    """
+    n = len(successors)
+    index = [None] * n
+    low = [0] * n
+    on_stack = [False] * n
+    stack, components = [], []
+    counter = [0]
+
+    def strongconnect(v):
+        # The graphs are a few dozen rules, recursion depth is not a concern
+        index[v] = low[v] = counter[0]
+        counter[0] += 1
+        stack.append(v)
+        on_stack[v] = True
+        for w in successors[v]:
+            if index[w] is None:
+                strongconnect(w)
+                low[v] = min(low[v], low[w])
+            elif on_stack[w]:
+                low[v] = min(low[v], index[w])
+        if low[v] == index[v]:
+            component = []
+            while True:
+                w = stack.pop()
+                on_stack[w] = False
+                component.append(w)
+                if w == v:
+                    break
+            components.append(sorted(component))
+
+    for v in range(n):
+        if index[v] is None:
+            strongconnect(v)
+
+    component_of = {v: c for c, members in enumerate(components) for v in members}
+    incoming = [0] * len(components)
+    edges = [set() for _ in components]
+    for v, succ in enumerate(successors):
+        for w in succ:
+            a, b = component_of[v], component_of[w]
+            if a != b and b not in edges[a]:
+                edges[a].add(b)
+                incoming[b] += 1
+
+    # Kahn's algorithm, always taking the ready component with the lowest rule index
+    order = []
+    ready = sorted((components[c][0], c) for c in range(len(components)) if not incoming[c])
+    while ready:
+        _, c = ready.pop(0)
+        order.extend(components[c])
+        for d in edges[c]:
+            incoming[d] -= 1
+            if not incoming[d]:
+                ready.append((components[d][0], d))
+        ready.sort()
+    return order
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python3 -m codemod.schedule', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('scripts', nargs='+', help="fix_*.py scripts whose regex rules are scheduled together")
+    parser.add_argument('--max-passes', type=int, default=MAX_PASSES,
+                        help=f"give up on a file after this many passes (default: {MAX_PASSES})")
+    parser.add_argument('--graph', action='store_true', help="print the rule order and dependencies, then exit")
+    runner.add_output_arguments(parser)
+    args = parser.parse_args(argv)
+
+    for script in args.scripts:
+        if not Path(script).exists():
+            print(f"ERROR: Script {script} not found", file=sys.stderr)
+            return 1
+
+    out = runner.status(args)
+    schedules = {path: Schedule(rules, args.max_passes) for path, rules in collect(args.scripts).items()}
+    for path, schedule in schedules.items():
+        for rule, other in schedule.oscillating():
+            print(f"⚠ Oscillating rules in {path}: {rule.pattern} -> {rule.replacement!r} / "
+                  f"{other.pattern} -> {other.replacement!r}", file=sys.stderr)
+    if args.graph:
+        for path, schedule in schedules.items():
+            print(f"{path}: {len(schedule)} rules, {len(schedule.back_edges())} back edges")
+            for index in schedule.order:
+                rule = schedule.rules[index]
+                fed = ', '.join(schedule.rules[j].pattern for j in schedule.successors[index])
+                print(f"  {rule.pattern} -> {rule.replacement!r}" + (f"  feeds {fed}" if fed else ''))
+        return 0
+
+    report = Report()
+    transforms = {path: lambda content, path=path, schedule=schedule: fixed_point(content, schedule, path, report)
+                  for path, schedule in schedules.items()}
+    status = failures = 0
+    for path, result in runner.rewrite_paths(transforms, args):
+        if runner.failed(result):
+            # Rejected by validation (or errored), so nothing was written
+            failures += 1
+            print(f"{runner.outcome(result)} {path}", file=out)
+            continue
+        found = report.files.get(path)
+        if found is None:
+            continue
+        if found.oscillation is not None:
+            status = 1
+            rules = schedules[path].rules
+            print(f"⚠ {path}: no fixed point after {found.passes} passes, left unchanged; cycling rules: "
+                  f"{', '.join(rules[i].pattern for i in found.oscillation)}", file=out)
+            continue
+        print(f"{runner.outcome(result)} {path} "
+              f"({found.passes} passes, {sum(found.hits)} replacements)", file=out)
+    return runner.exit_status(failures) or status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,339 @@
+"""
+Prisma schema map for the codemod scripts
+Parses packages/database/prisma/schema.prisma in one streaming pass and derives
+the legacy camelCase -> introspected snake_case names for models and relation
+fields, plus a relation table (target model, list vs singular, named
+@relation) for O(1) lookups during a scan. The result is cached as JSON so
+scripts never re-parse the schema.
+"""
+
+import json
+import os
+import re
+from collections import namedtuple
+from pathlib import Path
+
+from codemod import lexer
+from codemod.cache import CACHE_DIR, digest
+
+SCHEMA_PATH = Path('packages/database/prisma/schema.prisma')
+MAP_PATH = CACHE_DIR / 'schema-map.json'
+
+# Bump when the derived map changes shape
+VERSION = 2
+
+BLOCK_RE = re.compile(r'^(model|enum|type|view|generator|datasource)\s+(\w+)\s*\{')
+FIELD_RE = re.compile(r'^(\w+)\s+(\w+)(\[\])?(\?)?\s*(.*)$')
+BLOCK_ATTR_RE = re.compile(r'^@@(id|unique|index|map)\s*\((.*)\)\s*$')
+RELATION_RE = re.compile(r'@relation\(([^)]*)\)')
+LIST_RE = re.compile(r'\[([^\]]*)\]')
+
+IRREGULAR = {'children': 'child', 'curricula': 'curriculum', 'people': 'person'}
+
+# One relation field: `model.field` points at `target`, a list for one-to-many sides;
+# name is the @relation("...") alias when the schema gives one
+Relation = namedtuple('Relation', 'model field target list optional name')
+
+
+def parse(lines):
+    """Parse schema lines into {model: {fields, id, uniques, indexes, map}}"""
+    models = {}
+    model = None
+    for raw in lines:
+        line = raw.split('//', 1)[0].strip()
+        if not line:
+            continue
+        if model is None:
+            m = BLOCK_RE.match(line)
+            if m and m.group(1) == 'model':
+                model = {'fields': {}, 'id': [], 'uniques': [], 'indexes': [], 'map': None}
+                models[m.group(2)] = model
+            elif m:
+                model = False  # skip enums and config blocks
+            continue
+        if line == '}':
+            model = None
+            continue
+        if model is False:
+            continue
+
+        m = BLOCK_ATTR_RE.match(line)
+        if m:
+            kind, args = m.groups()
+            if kind == 'map':
+                model['map'] = args.strip().strip('"')
+                continue
+            columns = _names(LIST_RE.search(args).group(1)) if LIST_RE.search(args) else []
+            if kind == 'id':
+                model['id'] = columns
+            else:
+                model[kind + ('es' if kind == 'index' else 's')].append(columns)
+            continue
+
+        m = FIELD_RE.match(line)
+        if not m:
+            continue
+        name, type_, is_list, optional, attrs = m.groups()
+        field = {
+            'type': type_,
+            'list': bool(is_list),
+            'optional': bool(optional),
+            'relation': None,
+            'fk': [],
+        }
+        if '@id' in attrs.split():
+            model['id'] = [name]
+        if re.search(r'@unique\b', attrs):
+            model['uniques'].append([name])
+        rel = RELATION_RE.search(attrs)
+        if rel:
+            args = rel.group(1)
+            named = re.match(r'\s*(?:name:\s*)?"([^"]*)"', args)
+            field['relation'] = named.group(1) if named else None
+            fk = re.search(r'fields:\s*\[([^\]]*)\]', args)
+            field['fk'] = _names(fk.group(1)) if fk else []
+        model['fields'][name] = field
+
+    # A field is a relation when its type is another model
+    for model in models.values():
+        for field in model['fields'].values():
+            field['model'] = field['type'] if field['type'] in models else None
+    return models
+
+
+def build_map(models):
+    """Derive legacy name maps from parsed models"""
+    model_map = {}
+    for name in models:
+        accessor = name[0].lower() + name[1:]
+        for old in (camel(singular(name)), camel(name)):
+            if old != accessor:
+                model_map.setdefault(old, accessor)
+
+    relation_map = {}
+    flat = {}
+    for name, model in models.items():
+        renames = {}
+        for field_name, field in model['fields'].items():
+            if not field['model']:
+                continue
+            old = legacy_relation_name(field_name, field)
+            if old and old != field_name and old not in model['fields']:
+                renames[old] = field_name
+                flat.setdefault(old, set()).add(field_name)
+        relation_map[name] = renames
+
+    return {
+        'models': model_map,
+        'relations': relation_map,
+        # Only names that mean the same thing on every model
+        'relation_names': {old: news.pop() for old, news in sorted(flat.items()) if len(news) == 1},
+        'relation_table': relation_table(models),
+    }
+
+
+def relation_table(models):
+    """[model, field, target, list, optional, @relation name] for every relation field"""
+    return [[name, field_name, field['model'], field['list'], field['optional'], field['relation']]
+            for name, model in sorted(models.items())
+            for field_name, field in model['fields'].items() if field['model']]
+
+
+class Relations:
+    """
+    Relation fields indexed for O(1) lookups: by (model, field), by field
+    name across models, by (model, target) and by @relation alias, plus the
+    legacy name maps ({model: {old: new}} and {old: new} across models)
+    """
+
+    def __init__(self, table, legacy=None, legacy_names=None):
+        self.legacy = legacy or {}
+        self.legacy_names = legacy_names or {}
+        self.fields = {}
+        self.by_field = {}
+        self.by_target = {}
+        self.by_alias = {}
+        self.by_stem = {}
+        for row in table:
+            rel = Relation(*row)
+            self.fields[rel.model, rel.field] = rel
+            self.by_field.setdefault(rel.field, []).append(rel)
+            self.by_target.setdefault((rel.model, rel.target), []).append(rel)
+            if rel.name:
+                self.by_alias.setdefault(rel.name, []).append(rel)
+            self.by_stem.setdefault(singular(rel.field), set()).add(rel.field)
+
+    def get(self, model, field):
+        """The Relation for model.field, or None if it isn't a relation field"""
+        return self.fields.get((model, field))
+
+    def is_list(self, field, model=None):
+        """
+        True/False when the field is one-to-many/singular (on model, or on
+        every model that has it), None when unknown or mixed
+        """
+        if model is not None:
+            rel = self.get(model, field)
+            return None if rel is None else rel.list
+        kinds = {rel.list for rel in self.by_field.get(field, ())}
+        return kinds.pop() if len(kinds) == 1 else None
+
+    def between(self, model, target):
+        """Relation fields on model pointing at target (several when @relation names differ)"""
+        return self.by_target.get((model, target), [])
+
+    def alias(self, name):
+        """Both sides of a named @relation, e.g. "disputes_raisedByUserIdTousers" """
+        return self.by_alias.get(name, [])
+
+    def resolve(self, name, model=None):
+        """
+        The relation field a possibly legacy or mis-pluralised name stands for
+        (optionally on one model), or None when unknown or ambiguous:
+        an existing field wins, then the legacy maps, then the one field that
+        only differs in singular/plural (package_tier -> package_tiers)
+        """
+        if (self.get(model, name) if model is not None else name in self.by_field):
+            return name
+        old = (self.legacy.get(model, {}) if model is not None else self.legacy_names).get(name)
+        if old is not None:
+            return old
+        found = self.by_stem.get(singular(name), set())
+        if model is not None:
+            found = {field for field in found if (model, field) in self.fields}
+        return next(iter(found)) if len(found) == 1 else None
+
+
+def legacy_relation_name(field_name, field):
+    """Best guess at the pre-introspection name of a relation field"""
+    if len(field['fk']) == 1:
+        fk = field['fk'][0]
+        return fk[:-2] if fk.endswith('Id') and len(fk) > 2 else None
+    if field['fk'] or field['relation']:
+        return None
+    if field['list']:
+        return camel(field_name)
+    return camel(singular(field_name))
+
+
+def singular(name):
+    head, _, last = name.rpartition('_')
+    if last in IRREGULAR:
+        last = IRREGULAR[last]
+    elif last.endswith('ies'):
+        last = last[:-3] + 'y'
+    elif last.endswith(('sses', 'xes', 'ches', 'shes')):
+        last = last[:-2]
+    elif last.endswith('s') and not last.endswith(('ss', 'us', 'is')):
+        last = last[:-1]
+    return f'{head}_{last}' if head else last
+
+
+def camel(name):
+    first, *rest = name.split('_')
+    return first[:1].lower() + first[1:] + ''.join(p[:1].upper() + p[1:] for p in rest)
+
+
+def _names(text):
+    return [n.split('(')[0].strip() for n in text.split(',') if n.strip()]
+
+
+_loaded = {}
+
+
+def load_schema(schema_path=SCHEMA_PATH, cache_path=MAP_PATH):
+    """
+    Parsed models plus derived maps, rebuilt only when schema.prisma changes.
+    Kept per process until the schema's mtime or size changes, so lookups
+    don't re-read and re-hash it.
+    """
+    schema_path, cache_path = Path(schema_path), Path(cache_path)
+    st = schema_path.stat()
+    memo_key = (os.path.abspath(schema_path), os.path.abspath(cache_path))
+    stamp = (st.st_mtime_ns, st.st_size)
+    if memo_key in _loaded and _loaded[memo_key][0] == stamp:
+        return _loaded[memo_key][1]
+    result = _load_schema(schema_path, cache_path)
+    _loaded[memo_key] = (stamp, result)
+    return result
+
+
+def _load_schema(schema_path, cache_path):
+    data = schema_path.read_bytes()
+    key = f'{VERSION}:{digest(data)}'
+    if cache_path.exists():
+        try:
+            cached = json.loads(cache_path.read_text(encoding='utf-8'))
+            if cached.get('key') == key:
+                return cached
+        except ValueError:
+            pass
+
+    models = parse(data.decode('utf-8').splitlines())
+    result = {'key': key, 'schema': models, **build_map(models)}
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = cache_path.with_suffix('.tmp')
+    tmp.write_text(json.dumps(result, indent=1, sort_keys=True), encoding='utf-8')
+    tmp.replace(cache_path)
+    return result
+
+
+def model_rules(names=None, prefix='.', suffix='.'):
+    """
+    (pattern, replacement) pairs renaming legacy model accessors,
+    e.g. \\.user\\. -> .users. An empty suffix means a word boundary.
+    """
+    model_map = load_schema()['models']
+    if names is None:
+        # Longest first so teacherSubjectGrade wins over teacherSubject
+        names = sorted(model_map, key=lambda n: (-len(n), n))
+    end = re.escape(suffix) if suffix else r'\b'
+    return [(re.escape(prefix) + re.escape(old) + end, prefix + _model(model_map, old) + suffix) for old in names]
+
+
+def member_rules(names, **kwargs):
+    """Token rules renaming legacy model accessors, e.g. prisma.user -> prisma.users"""
+    model_map = load_schema()['models']
+    return [lexer.member(old, _model(model_map, old), **kwargs) for old in names]
+
+
+def _model(model_map, old):
+    # A rule with no target would rename to None; name the model instead
+    try:
+        return model_map[old]
+    except KeyError:
+        raise ValueError(f"schema.prisma has no model for {old!r}") from None
+
+
+_relations = None
+
+
+def relations():
+    """The Relations table for schema.prisma, built once per process"""
+    global _relations
+    if _relations is None:
+        schema = load_schema()
+        _relations = Relations(schema['relation_table'], schema['relations'], schema['relation_names'])
+    return _relations
+
+
+def relation_name(old, model=None):
+    """New relation field name for a legacy one, optionally scoped to a model"""
+    table = relations()
+    if model is not None:
+        return table.legacy.get(model, {}).get(old)
+    return table.legacy_names.get(old)
+
+
+def relation_rules(names, model=None):
+    """
+    (pattern, replacement) pairs fixing `.name.` member accesses the relation
+    table resolves to a different field. Names that are already correct (or
+    unknown) get no rule, so nothing is rewritten on a guess.
+    """
+    rules = []
+    for old in names:
+        new = relations().resolve(old, model)
+        if new is not None and new != old:
+            rules.append((r'\.' + re.escape(old) + r'\.', f'.{new}.'))
+    return rules
@@ -0,0 +1,281 @@
+"""
+Deterministic sharding of codemod runs
+`--shard i/N` on any rewrite script processes only shard i of N (1-based).
+Every machine computes the same split, so shards can fan out over CI
+runners without coordinating: files are dealt largest first to the least
+loaded shard, with ties broken by a stable hash of the relative path. Each
+shard writes a JSON report (edits, per-rule hits, errors, and diffs in
+--dry-run), and merge joins reports and patches into one result:
+
+    python3 fix_all_prisma.py apps --ext .ts,.tsx --dry-run --shard 1/4 > shard-1.patch
+    python3 -m codemod.shard merge .codemod-cache/shards/*.json -o merged.json --patch merged.patch
+    python3 -m codemod.shard plan apps --ext .ts,.tsx --shards 4
+"""
+
+import argparse
+import hashlib
+import heapq
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from codemod.cache import CACHE_DIR
+
+SHARD_DIR = CACHE_DIR / 'shards'
+
+# Bump when the report format changes
+VERSION = 1
+
+
+def parse(spec):
+    """(i, N) from 'i/N', for argparse"""
+    try:
+        index, count = (int(part) for part in spec.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, got {spec!r}") from None
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard {index} is not between 1 and {count}")
+    return index, count
+
+
+def relative(path):
+    """Path relative to the working directory with / separators, the same on every machine"""
+    return os.path.relpath(path).replace(os.sep, '/')
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def assign(files, count):
+    """[shard number (1-based)] per file: largest first to the least loaded shard"""
+    files = list(files)
+    keyed = sorted(range(len(files)), key=lambda k: (-_size(files[k]),
+                   hashlib.sha1(relative(files[k]).encode('utf-8')).hexdigest()))
+    loads = [(0, shard) for shard in range(1, count + 1)]
+    out = [0] * len(files)
+    for k in keyed:
+        load, shard = heapq.heappop(loads)
+        out[k] = shard
+        heapq.heappush(loads, (load + _size(files[k]), shard))
+    return out
+
+
+def select(files, spec):
+    """The files of shard spec (i, N), in their original order"""
+    files = list(files)
+    index, count = spec
+    if count == 1:
+        return files
+    return [path for path, shard in zip(files, assign(files, count)) if shard == index]
+
+
+def report_path(spec):
+    index, count = spec
+    return SHARD_DIR / f'{index}-of-{count}.json'
+
+
+class Report:
+    """What one shard (or any run) did, per file"""
+
+    def __init__(self, spec=None, rules_key=None, dry_run=False):
+        self.spec = spec
+        self.rules_key = rules_key
+        self.dry_run = dry_run
+        self.started = time.perf_counter()
+        self.files = []
+        self.seen = set()
+        self.bytes = 0
+        self.edits = []
+        self.hits = {}
+        self.errors = []
+
+    def add(self, path, result):
+        path = relative(path)
+        # Several rule sets (packs run A B) can visit the same file
+        if path not in self.seen:
+            self.seen.add(path)
+            self.files.append(path)
+            self.bytes += _size(path)
+        hits = dict(result.hits or {})
+        for label, count in hits.items():
+            self.hits[label] = self.hits.get(label, 0) + count
+        if result.changed:
+            edit = {'path': path, 'before': result.digest, 'hits': hits}
+            if result.pending is not None:
+                edit['after'] = result.pending[1]
+            if result.stat is not None:
+                edit['added'], edit['removed'] = result.stat
+            if result.diff is not None:
+                edit['diff'] = result.diff
+            self.edits.append(edit)
+        for p in result.problems or ():
+            self.errors.append({'path': path, 'kind': p.kind, 'message': p.message, 'line': p.line, 'col': p.col})
+        if result.error is not None:
+            self.errors.append({'path': path, 'kind': 'error', 'message': result.error})
+        for label, seconds in result.overruns or ():
+            self.errors.append({'path': path, 'kind': 'budget', 'message': f"{label!r} over {seconds:g}s, skipped"})
+
+    def to_json(self):
+        return {
+            'version': VERSION,
+            'shard': list(self.spec) if self.spec else None,
+            'command': sys.argv,
+            'rules': self.rules_key,
+            'dry_run': self.dry_run,
+            'seconds': round(time.perf_counter() - self.started, 3),
+            'files': self.files,
+            'bytes': self.bytes,
+            'edits': self.edits,
+            'hits': dict(sorted(self.hits.items(), key=lambda h: -h[1])),
+            'errors': self.errors,
+        }
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_json(), indent=1), encoding='utf-8')
+        return path
+
+
+def walk_order(path):
+    """Sort key putting paths in runner.iter_files order (a directory's files before its subdirectories)"""
+    *dirs, name = path.split('/')
+    return [(1, d) for d in dirs] + [(0, name)]
+
+
+def split_patch(text):
+    """{path: diff} from a patch made of runner.unified_diff sections"""
+    found = {}
+    path = None
+    for line in text.splitlines(keepends=True):
+        if line.startswith('diff --git a/'):
+            path = line[len('diff --git a/'):].rsplit(' b/', 1)[0]
+            found[path] = ''
+        if path is not None:
+            found[path] += line
+    return found
+
+
+def merge(reports, patches=()):
+    """
+    One report from shard reports (and --dry-run patches), with problems
+    found while joining them under 'conflicts': shards missing or run with
+    different rules, and files seen by more than one shard
+    """
+    merged = {'version': VERSION, 'shards': [], 'files': 0, 'bytes': 0, 'seconds': 0.0,
+              'edits': [], 'hits': {}, 'errors': [], 'conflicts': []}
+    seen = {}
+    counts = set()
+    rules = set()
+    diffs = {}
+    for name, report in reports:
+        if report.get('version') != VERSION:
+            merged['conflicts'].append(f"{name}: report version {report.get('version')}, expected {VERSION}")
+            continue
+        shard = report['shard']
+        merged['shards'].append(shard)
+        if shard:
+            counts.add(shard[1])
+        rules.add(report['rules'])
+        merged['bytes'] += report['bytes']
+        merged['seconds'] = max(merged['seconds'], report['seconds'])
+        for path in report['files']:
+            if path in seen:
+                merged['conflicts'].append(f"{path} is in {seen[path]} and {name}")
+            seen[path] = name
+        for edit in report['edits']:
+            if 'diff' in edit:
+                diffs[edit['path']] = edit['diff']
+            merged['edits'].append({k: v for k, v in edit.items() if k != 'diff'})
+        for label, count in report['hits'].items():
+            merged['hits'][label] = merged['hits'].get(label, 0) + count
+        merged['errors'].extend(report['errors'])
+    for name, text in patches:
+        for path, diff in split_patch(text).items():
+            if path in diffs and diffs[path] != diff:
+                merged['conflicts'].append(f"{path}: {name} differs from the report's diff")
+            diffs[path] = diff
+
+    if len(counts) > 1:
+        merged['conflicts'].append(f"shards of different splits: {sorted(counts)}")
+    elif counts:
+        count = counts.pop()
+        missing = set(range(1, count + 1)) - {s[0] for s in merged['shards'] if s}
+        if missing:
+            merged['conflicts'].append(f"missing shards {', '.join(f'{i}/{count}' for i in sorted(missing))}")
+    if len(rules) > 1:
+        merged['conflicts'].append("shards ran different rule sets")
+    merged['files'] = len(seen)
+    merged['shards'].sort(key=lambda s: s or [0])
+    merged['edits'].sort(key=lambda e: walk_order(e['path']))
+    merged['hits'] = dict(sorted(merged['hits'].items(), key=lambda h: -h[1]))
+    merged['errors'].sort(key=lambda e: (walk_order(e['path']), e.get('line', 0)))
+    merged['seconds'] = round(merged['seconds'], 3)
+    return merged, ''.join(diffs[path] for path in sorted(diffs, key=walk_order))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python3 -m codemod.shard', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('merge', help="join shard reports (.json) and patches (.patch)")
+    p.add_argument('inputs', nargs='+', help="shard reports and --dry-run patches")
+    p.add_argument('-o', '--output', help="write the merged report here (default: summary only)")
+    p.add_argument('--patch', help="write the combined patch here ('-' for stdout)")
+    p = sub.add_parser('plan', help="show how files split over shards")
+    p.add_argument('paths', nargs='*', default=['apps/api/src'], help="directories to walk (default: apps/api/src)")
+    p.add_argument('--ext', type=lambda s: tuple(s.split(',')), default=('.ts',),
+                   help="comma-separated extensions (default: .ts)")
+    p.add_argument('--shards', type=int, default=4, help="number of shards (default: 4)")
+    args = parser.parse_args(argv)
+
+    if args.command == 'plan':
+        from codemod.runner import iter_files
+
+        files = list(iter_files(args.paths, args.ext))
+        shards = assign(files, args.shards)
+        for shard in range(1, args.shards + 1):
+            mine = [f for f, s in zip(files, shards) if s == shard]
+            print(f"{shard}/{args.shards}: {len(mine):>5} files {sum(map(_size, mine)) / 1e6:8.2f} MB")
+        return 0
+
+    reports, patches = [], []
+    for name in args.inputs:
+        try:
+            text = Path(name).read_text(encoding='utf-8')
+            if name.endswith('.json'):
+                reports.append((name, json.loads(text)))
+            else:
+                patches.append((name, text))
+        except (OSError, ValueError) as e:
+            print(f"ERROR: {name}: {e}", file=sys.stderr)
+            return 1
+    merged, patch = merge(reports, patches)
+
+    out = sys.stderr if args.patch == '-' else sys.stdout
+    print(f"{len(merged['shards'])} shards: {merged['files']} files, {len(merged['edits'])} edits, "
+          f"{sum(merged['hits'].values())} rule hits, {len(merged['errors'])} errors "
+          f"(slowest shard {merged['seconds']:.2f}s)", file=out)
+    for conflict in merged['conflicts']:
+        print(f"⚠ {conflict}", file=out)
+    if args.output:
+        path = Path(args.output)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(merged, indent=1), encoding='utf-8')
+        print(f"Merged report saved to {path}", file=out)
+    if args.patch == '-':
+        sys.stdout.write(patch)
+    elif args.patch:
+        Path(args.patch).write_text(patch, encoding='utf-8')
+        print(f"Combined patch ({patch.count('diff --git ')} files) saved to {args.patch}", file=out)
+    return 1 if merged['conflicts'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""
+Memory-mapped input and span-based output
+Rule sets that can produce byte edits (engine.RuleSet, lexer.TokenRuleSet)
+run straight on an mmap of the file; the result is written as unchanged
+slices of the mapping interleaved with replacement chunks, so no full copy
+of the file is made however many rules there are.
+"""
+
+import contextlib
+import hashlib
+import mmap
+import re
+
+_NON_ASCII = re.compile(rb'[\x80-\xff]')
+
+
+@contextlib.contextmanager
+def mapped(path):
+    """Read-only mapping of a file (empty bytes for an empty file)"""
+    with open(path, 'rb') as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Zero-length files can't be mapped
+            yield b''
+            return
+        try:
+            yield buffer
+        finally:
+            buffer.close()
+
+
+def is_ascii(buffer):
+    return _NON_ASCII.search(buffer) is None
+
+
+def write_spans(f, buffer, edits):
+    """
+    Write buffer with edits (sorted, non-overlapping (start, end, bytes))
+    applied to a binary file. Returns the sha1 hex digest of what was written.
+    """
+    h = hashlib.sha1()
+    view = memoryview(buffer)
+    pos = 0
+    try:
+        for start, end, replacement in edits:
+            for chunk in (view[pos:start], replacement):
+                f.write(chunk)
+                h.update(chunk)
+            pos = end
+        tail = view[pos:]
+        f.write(tail)
+        h.update(tail)
+    finally:
+        view.release()
+    return h.hexdigest()
+
+
+def apply(buffer, edits):
+    """The edited content as one str (only used for diffs)"""
+    out = []
+    pos = 0
+    for start, end, replacement in edits:
+        out.append(buffer[pos:start])
+        out.append(replacement)
+        pos = end
+    out.append(buffer[pos:])
+    return b''.join(out).decode('utf-8')
@@ -0,0 +1,205 @@
+"""
+Transaction hold-time analyzer
+Finds every interactive `$transaction(async (tx) => { ... })` body and
+estimates how long it holds its connection and locks: sequential
+`await tx.*` statements, queries repeated per loop element, helpers handed
+the tx, and awaits on anything else (notifications, email, Jitsi, HTTP)
+made while the transaction is open. Ranked worst first:
+
+    python3 -m codemod.transactions apps/api/src
+"""
+
+import argparse
+import bisect
+import json
+import sys
+from collections import namedtuple
+from functools import partial
+from pathlib import Path
+
+from codemod import queries, runner
+from codemod.diagnostics import line_starts
+from codemod.lexer import code_tokens
+
+# Elements assumed per loop when turning per-element round trips into a number
+LOOP_SIZE = 10
+# An await on external work is assumed to cost this many database round trips
+EXTERNAL_WEIGHT = 5
+# BEGIN and COMMIT
+OVERHEAD = 2
+
+# fixed / per_element: tx round trips outside / inside loops, a helper handed the tx
+# counting as one; helpers / external: awaited callees that get the tx / never see it;
+# awaits: await expressions in the body
+Transaction = namedtuple('Transaction', 'path line param fixed per_element helpers external awaits score')
+
+
+def scan(text, path=None, tokens=None, loop_size=LOOP_SIZE):
+    """Every interactive transaction in text as a Transaction, in source order"""
+    if tokens is None:
+        tokens = code_tokens(text)
+    starts = line_starts(text)
+    found = []
+    for i, token in enumerate(tokens):
+        if token.text != '$transaction' or _text(tokens, i + 1) != '(':
+            continue
+        callback = _callback(tokens, i + 2)
+        if callback is None:
+            continue  # batch form, $transaction([...])
+        param, body_start, body_end = callback
+        found.append(_analyze(tokens, param, body_start, body_end, loop_size,
+                              path, bisect.bisect_right(starts, token.start)))
+    return found
+
+
+def _text(tokens, i):
+    return tokens[i].text if 0 <= i < len(tokens) else None
+
+
+def _callback(tokens, i):
+    """(tx parameter, body `{` index, matching `}` index) of the callback at tokens[i]"""
+    if _text(tokens, i) == 'async':
+        i += 1
+    if _text(tokens, i) == 'function':
+        i += 1
+    if _text(tokens, i) == '(':
+        param, i = _text(tokens, i + 1), i + 1
+        while i < len(tokens) and tokens[i].text != ')':
+            i += 1
+        i += 1
+    else:
+        param, i = _text(tokens, i), i + 1
+    if param is None:
+        return None
+    if _text(tokens, i) == '=>':
+        i += 1
+    if _text(tokens, i) != '{':
+        return None
+    level = 0
+    for j in range(i, len(tokens)):
+        if tokens[j].text == '{' or (tokens[j].kind == 'template' and tokens[j].text.endswith('${')):
+            level += 1
+        elif tokens[j].text == '}' or (tokens[j].kind == 'template' and tokens[j].text[0] == '}'):
+            level -= 1
+            if level == 0:
+                return param, i, j
+    return None
+
+
+def _analyze(tokens, param, body_start, body_end, loop_size, path, line):
+    fixed = per_element = awaits = 0
+    helpers, external = [], []
+    for i, token, stack in queries.walk(tokens, body_start + 1, body_end):
+        in_loop = queries.context(stack) is not None
+        if token.text == param and _text(tokens, i + 1) in ('.', '?.') and _is_query(tokens, i + 2):
+            per_element += in_loop
+            fixed += not in_loop
+            continue
+        if token.text != 'await':
+            continue
+        awaits += 1
+        callee, args_start = _callee(tokens, i + 1)
+        if callee is None or callee.split('.')[0] == param or callee in ('Promise.all', 'Promise.allSettled'):
+            continue
+        if _passes(tokens, args_start, param):
+            helpers.append(callee)
+            per_element += in_loop
+            fixed += not in_loop
+        else:
+            external.append(callee)
+    score = OVERHEAD + fixed + per_element * loop_size + EXTERNAL_WEIGHT * len(external)
+    return Transaction(str(path) if path is not None else None, line, param,
+                       fixed, per_element, helpers, external, awaits, score)
+
+
+def _is_query(tokens, i):
+    """tokens[i] starts `<model>.<op>(` or a raw `$queryRaw`/`$executeRaw` call"""
+    name = _text(tokens, i)
+    if name is None:
+        return False
+    if name.startswith('$'):
+        # $queryRaw(...) or a tagged template, $executeRaw`...`
+        return i + 1 < len(tokens) and (tokens[i + 1].text == '(' or tokens[i + 1].kind == 'template')
+    return (_text(tokens, i + 1) in ('.', '?.') and _text(tokens, i + 2) in queries.OPERATIONS
+            and _text(tokens, i + 3) == '(')
+
+
+def _callee(tokens, i):
+    """Dotted name of the call awaited at tokens[i] and the index of its `(`, or (None, None)"""
+    parts = []
+    while i < len(tokens):
+        token = tokens[i]
+        if token.kind == 'ident':
+            parts.append(token.text)
+        elif token.text not in ('.', '?.'):
+            break
+        i += 1
+    if not parts or _text(tokens, i) != '(':
+        return None, None
+    return '.'.join(parts), i
+
+
+def _passes(tokens, i, param):
+    """True if the call whose `(` is tokens[i] gets param as an argument"""
+    level = 0
+    for j in range(i, len(tokens)):
+        text = tokens[j].text
+        if text in ('(', '[', '{'):
+            level += 1
+        elif text in (')', ']', '}'):
+            level -= 1
+            if level == 0:
+                return False
+        elif text == param and tokens[j].kind == 'ident' and _text(tokens, j - 1) not in ('.', '?.'):
+            return True
+    return False
+
+
+def scan_file(path, loop_size=LOOP_SIZE):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return scan(f.read(), path, loop_size=loop_size)
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"ERROR reading {path}: {e}", file=sys.stderr)
+        return []
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python3 -m codemod.transactions', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='*', default=['apps/api/src'], help="directories to scan (default: apps/api/src)")
+    parser.add_argument('--ext', type=lambda s: tuple(s.split(',')), default=('.ts',),
+                        help="comma-separated extensions (default: .ts)")
+    parser.add_argument('-j', '--jobs', type=int, default=1, help="worker processes (default: 1)")
+    parser.add_argument('--loop-size', type=int, default=LOOP_SIZE,
+                        help=f"elements assumed per loop (default: {LOOP_SIZE})")
+    parser.add_argument('--top', type=int, default=30, help="transactions to print (default: 30, 0 for all)")
+    parser.add_argument('--json', metavar='PATH', help="write every transaction as JSON")
+    args = parser.parse_args(argv)
+
+    files = list(runner.iter_files(args.paths, args.ext, ('.spec.ts', '.d.ts')))
+    scan_one = partial(scan_file, loop_size=args.loop_size)
+    found = [t for _, transactions in runner.run(scan_one, files, args.jobs) for t in transactions]
+    found.sort(key=lambda t: (-t.score, t.path, t.line))
+
+    print(f"{len(found)} interactive transactions in {len(files)} files "
+          f"({sum(1 for t in found if t.external)} await external work while open)\n")
+    print(f"{'score':>5}  {'trips':>12}  {'awaits':>6}  {'ext':>3}  transaction")
+    for t in found[:args.top or None]:
+        trips = f"{OVERHEAD + t.fixed}" + (f"+{t.per_element}×N" if t.per_element else '')
+        print(f"{t.score:>5}  {trips:>12}  {t.awaits:>6}  {len(t.external):>3}  {t.path}:{t.line}")
+        if t.external:
+            print(f"{'':>33}external: {', '.join(dict.fromkeys(t.external))}")
+        if t.helpers:
+            print(f"{'':>33}tx helpers: {', '.join(dict.fromkeys(t.helpers))}")
+
+    if args.json:
+        path = Path(args.json)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps([t._asdict() for t in found], indent=1), encoding='utf-8')
+        print(f"\nReport saved to {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
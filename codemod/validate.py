@@ -0,0 +1,191 @@
+"""
+Post-rewrite syntax sanity checks
+One linear pass over the lexer's tokens finds what broken rewrites typically
+leave behind, with exact line/column, in milliseconds instead of a tsc run:
+
+    unbalanced {} () [] (e.g. an injected `{ data: {` with no closer)
+    duplicate keys in an object literal (TS1117, e.g. a second `id:`)
+    `key: value` properties dangling in a block, outside any object literal
+
+The runner checks every rewritten file before it is written and rejects
+rewrites that add problems. Standalone, it checks files given on the
+command line (default: .ts files changed according to git). JSX is not
+lexed (`https://` in JSX text reads as a comment), so .tsx files
+get only the key checks, never the bracket balance, and only when asked
+for with --ext:
+
+    python3 -m codemod.validate apps/api/src/package/package.service.ts
+"""
+
+import argparse
+import bisect
+import os
+import re
+import subprocess
+import sys
+from collections import Counter, namedtuple
+
+from codemod import objects
+from codemod.lexer import code_tokens
+
+Problem = namedtuple('Problem', 'line col kind message')
+
+_CLOSE = {'{': '}', '(': ')', '[': ']', '${': '}'}
+_OPEN = {'}', ')', ']'}
+
+# A `{` after one of these opens a block, not an object literal
+_BLOCK_AFTER = {')', '=>', 'else', 'try', 'finally', 'do', '}', ';'}
+# Where a statement (and so a dangling `key:`) can start
+_STATEMENT_AFTER = {'{', '}', ';', ','}
+# Identifiers followed by `:` that are fine at statement start
+_LABELS = {'case', 'default'}
+
+_NEWLINE = re.compile('\n')
+
+
+def jsx(path):
+    """Whether path may hold JSX, which the bracket balance check can't follow"""
+    return os.fspath(path).endswith(('.tsx', '.jsx'))
+
+
+def check(text, tokens=None, balance=True):
+    """Problems in text, ordered by position; balance=False skips the bracket check (for JSX)"""
+    if tokens is None:
+        tokens = code_tokens(text)
+    starts = [0] + [m.end() for m in _NEWLINE.finditer(text)]
+    found = []
+
+    def add(offset, kind, message):
+        line = bisect.bisect_right(starts, offset)
+        found.append((offset, Problem(line, offset - starts[line - 1] + 1, kind, message)))
+
+    if balance:
+        _balance(tokens, starts, add)
+    _dangling(tokens, add)
+    for literal in objects.scan(text, tokens):
+        seen = set()
+        for prop in literal.props:
+            if prop.key in seen:
+                add(prop.start, 'duplicate-key', f"duplicate key '{prop.key}' in object literal")
+            seen.add(prop.key)
+    found.sort(key=lambda f: f[0])
+    return [problem for _, problem in found]
+
+
+def _balance(tokens, starts, add):
+    stack = []
+    for token in tokens:
+        if token.kind == 'template':
+            if token.text[0] == '}':
+                if stack and stack[-1][0] == '${':
+                    stack.pop()
+                else:
+                    add(token.start, 'unbalanced', "unexpected '}' closing a template substitution")
+            if token.text.endswith('${'):
+                stack.append(('${', token.end - 2))
+            continue
+        if token.kind != 'punct':
+            continue
+        if token.text in _CLOSE:
+            stack.append((token.text, token.start))
+        elif token.text in _OPEN:
+            if stack and _CLOSE[stack[-1][0]] == token.text:
+                stack.pop()
+                continue
+            # Recover at the nearest opener this closes, reporting what it skips
+            depth = next((d for d in range(len(stack) - 1, -1, -1) if _CLOSE[stack[d][0]] == token.text), None)
+            if depth is None:
+                add(token.start, 'unbalanced', f"unexpected '{token.text}'")
+                continue
+            for opener, start in stack[depth + 1:]:
+                add(start, 'unbalanced', f"'{opener}' is not closed before '{token.text}' "
+                    f"at line {bisect.bisect_right(starts, token.start)}")
+            del stack[depth:]
+    for opener, start in stack:
+        add(start, 'unbalanced', f"'{opener}' is never closed")
+
+
+def _dangling(tokens, add):
+    """`key: value` at statement start inside a block (what a lost `create({ data: {` leaves)"""
+    blocks = []
+    for i, token in enumerate(tokens):
+        text = token.text
+        if token.kind == 'punct' and text in ('{', '(', '['):
+            prev = tokens[i - 1].text if i else ';'
+            blocks.append(text == '{' and prev in _BLOCK_AFTER)
+        elif token.kind == 'punct' and text in ('}', ')', ']'):
+            if blocks:
+                blocks.pop()
+        elif token.kind == 'template':
+            if text[0] == '}' and blocks:
+                blocks.pop()
+            if text.endswith('${'):
+                blocks.append(False)
+        elif (token.kind == 'ident' and blocks and blocks[-1] and text not in _LABELS
+              and i + 1 < len(tokens) and tokens[i + 1].text == ':'
+              and tokens[i - 1].text in _STATEMENT_AFTER):
+            after = tokens[i + 2].text if i + 2 < len(tokens) else None
+            if after in ('for', 'while', 'do', '{'):
+                continue  # labelled statement
+            add(token.start, 'dangling-property', f"property '{text}:' outside an object literal")
+
+
+def _key(problem):
+    # Positions move when a rewrite inserts text; compare problems by what they are
+    return problem.kind, problem.message.split(' at line ')[0]
+
+
+def introduced(before, after, path=''):
+    """
+    Problems in after that before didn't have (by kind and message, not
+    position); path decides whether the bracket check applies (see jsx())
+    """
+    balance = not jsx(path)
+    old = Counter(_key(p) for p in check(before, balance=balance))
+    new = []
+    for problem in check(after, balance=balance):
+        key = _key(problem)
+        if old[key]:
+            old[key] -= 1
+        else:
+            new.append(problem)
+    return new
+
+
+def check_file(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return check(f.read(), balance=not jsx(path))
+    except (OSError, UnicodeDecodeError) as e:
+        return [Problem(0, 0, 'error', str(e))]
+
+
+def changed_files(suffixes=('.ts',)):
+    """Files git reports as modified against HEAD"""
+    out = subprocess.run(['git', 'diff', '--name-only', 'HEAD'], capture_output=True, text=True, check=True).stdout
+    return [path for path in out.splitlines() if path.endswith(suffixes)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python3 -m codemod.validate', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='*', help="files or directories (default: files changed since HEAD)")
+    parser.add_argument('--ext', type=lambda s: tuple(s.split(',')), default=('.ts',),
+                        help="comma-separated extensions (default: .ts)")
+    parser.add_argument('-j', '--jobs', type=int, default=1, help="worker processes (default: 1)")
+    args = parser.parse_args(argv)
+
+    from codemod import runner
+
+    files = list(runner.iter_files(args.paths, args.ext)) if args.paths else changed_files(args.ext)
+    total = 0
+    for path, problems in runner.run(check_file, files, args.jobs):
+        for p in problems:
+            print(f"{path}:{p.line}:{p.col}: {p.kind}: {p.message}")
+        total += len(problems)
+    print(f"\n{'✅' if not total else '⚠'} {total} problems in {len(files)} files", file=sys.stderr)
+    return 1 if total else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,40 +1,28 @@
+import argparse
 import sys
-import re
-import os
 
-files_map = {
-    'apps/api/src/package/package.service.ts': [
-        (r'\.packageTier\b', '.package_tiers'),
-        (r'\.teacherDemoSettings\b', '.teacher_demo_settings'),
-        (r'\.packageTransaction\b', '.package_transactions'),
-        (r'\.studentPackage\b', '.student_packages'),
-        (r'\.wallet\b', '.wallets'),
-        (r'\.transaction\b', '.transactions'),
-        (r'user\s*:\s*\{', 'users: {'),
-        (r'subject\s*:\s*\{', 'subjects: {'),
-        (r'\.teacherPackageTierSetting\b', '.teacher_package_tier_settings'),
-        (r'teacher\s*:\s*true', 'teacher_profiles: true'), # Guess for teacher include
-    ],
-    'apps/api/src/package/demo.service.ts': [
-        (r'owner\s*:\s*\{', 'users: {'),
-    ]
-}
+from codemod import packs, runner
 
-for path, replacements in files_map.items():
-    if not os.path.exists(path):
-        print(f"Skipping {path} (not found)")
-        continue
-        
-    with open(path, 'r') as f:
-        content = f.read()
-    
-    original = content
-    for pattern, replacement in replacements:
-        content = re.sub(pattern, replacement, content)
+# The rules live in packs/aggressive.toml
+PACK = packs.load('aggressive')
+files_map = packs.tables(PACK)
+
+def transforms():
+    """{path: transform} for the files this script rewrites"""
+    return packs.transforms(PACK)
+
+def main():
+    parser = argparse.ArgumentParser()
+    runner.add_output_arguments(parser)
+    runner.add_cache_arguments(parser)
+    args = parser.parse_args()
     
-    if content != original:
-        with open(path, 'w') as f:
-            f.write(content)
-        print(f"Fixed {path}")
-    else:
-        print(f"No changes for {path}")
+    out = runner.status(args)
+    failures = 0
+    for path, result in packs.run(PACK, args):
+        print(f"{runner.outcome(result)} {path}", file=out)
+        failures += runner.failed(result)
+    return runner.exit_status(failures)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,107 +4,52 @@ Global Prisma model name fixer
 Replaces all singular/camelCase Prisma models with plural/snake_case equivalents
 """
 
-import re
-import os
+import argparse
 import sys
 from pathlib import Path
 
-# Define all replacements (singular/camelCase → plural/snake_case)
-REPLACEMENTS = [
-    # Most common
-    (r'\.user\.', '.users.'),
-    (r'\.wallet\.', '.wallets.'),
-    (r'\.booking\.', '.bookings.'),
-    (r'\.dispute\.', '.disputes.'),
-    
-    # Admin/system
-    (r'\.auditLog\.', '.audit_logs.'),
-    (r'\.systemSettings\.', '.system_settings.'),
-    (r'\.readableIdCounter\.', '.readable_id_counters.'),
-    
-    # Teacher related
-    (r'\.teacherProfile\.', '.teacher_profiles.'),
-    (r'\.teacherSubjectGrade\.', '.teacher_subject_grades.'),
-    (r'\.teacherSubject\.', '.teacher_subjects.'),
-    (r'\.teacherQualification\.', '.teacher_qualifications.'),
-    (r'\.teacherSkill\.', '.teacher_skills.'),
-    (r'\.teacherWorkExperience\.', '.teacher_work_experiences.'),
-    (r'\.teacherTeachingApproachTag\.', '.teacher_teaching_approach_tags.'),
-    (r'\.interviewTimeSlot\.', '.interview_time_slots.'),
-    
-    # Student/Parent
-    (r'\.studentPackage\.', '.student_packages.'),
-    (r'\.studentProfile\.', '.student_profiles.'),
-    (r'\.parentProfile\.', '.parent_profiles.'),
-    (r'\.child\.', '.children.'),
-    
-    # Package related
-    (r'\.packageTier\.', '.package_tiers.'),
-    
-    # Other
-    (r'\.availabilityException\.', '.availability_exceptions.'),
-    (r'\.notification\.', '.notifications.'),
-    (r'\.savedTeacher\.', '.saved_teachers.'),
-    (r'\.rating\.', '.ratings.'),
-    (r'\.rescheduleRequest\.', '.reschedule_requests.'),
-    (r'\.supportTicket\.', '.support_tickets.'),
-    (r'\.ticketMessage\.', '.ticket_messages.'),
-    (r'\.demoSession\.', '.demo_sessions.'),
-]
+from codemod import packs, runner
+
+# The model names and options live in packs/prisma_models.toml; the
+# plural/snake_case targets come from schema.prisma
+PACK = packs.load('prisma_models')
 
-def fix_file(filepath):
-    """Fix all Prisma model names in a single file"""
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        original_content = content
-        
-        # Apply all replacements
-        for pattern, replacement in REPLACEMENTS:
-            content = re.sub(pattern, replacement, content)
-        
-        # Only write if changed
-        if content != original_content:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(content)
-            return True
-        return False
-    except Exception as e:
-        print(f"ERROR processing {filepath}: {e}", file=sys.stderr)
-        return False
+# Renames `<expr>.user.` style member accesses, one lexer pass per file.
+# Strings, comments, spreads (`...booking.x`) and the HTTP request
+# (`req.user.`) are left alone, so fix_req_user.py is no longer needed after it.
+RULES = PACK.scope.sets[0]
+
+# Tests and declaration files are left alone
+SKIP = PACK.skip
 
 def main():
-    """Fix all TypeScript files in apps/api/src"""
-    base_dir = Path("apps/api/src")
+    """Fix all TypeScript files in apps/api/src (and apps/api/scripts)"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    runner.add_arguments(parser, PACK.paths)
+    args = parser.parse_args()
     
+    base_dir = Path(args.paths[0])
     if not base_dir.exists():
         print(f"ERROR: Directory {base_dir} not found", file=sys.stderr)
         sys.exit(1)
     
     fixed_count = 0
     total_count = 0
+    failures = 0
+    out = runner.status(args)
     
-    # Find all .ts files (excluding .spec.ts and .d.ts)
-    for ts_file in base_dir.rglob("*.ts"):
-        if '.spec.ts' in ts_file.name or '.d.ts' in ts_file.name:
-            continue
-        
+    # Where rule order changes the result, the pack keeps one-rule-at-a-time semantics
+    for ts_file, result in packs.run(PACK, args):
         total_count += 1
-        if fix_file(ts_file):
+        if result.changed:
             fixed_count += 1
-            print(f"✓ Fixed: {ts_file}")
-    
-    # Also fix scripts
-    scripts_dir = Path("apps/api/scripts")
-    if scripts_dir.exists():
-        for ts_file in scripts_dir.rglob("*.ts"):
-            total_count += 1
-            if fix_file(ts_file):
-                fixed_count += 1
-                print(f"✓ Fixed: {ts_file}")
+            print(f"✓ Fixed: {ts_file}", file=out)
+        elif runner.failed(result):
+            failures += 1
+            print(f"✗ {runner.outcome(result)}: {ts_file}", file=out)
     
-    print(f"\n✅ Complete: Fixed {fixed_count} of {total_count} files")
+    print(f"\n✅ Complete: Fixed {fixed_count} of {total_count} files", file=out)
+    return runner.exit_status(failures)
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -1,27 +1,28 @@
+import argparse
 import sys
 
-path = 'apps/api/src/marketplace/marketplace.service.ts'
+from codemod import packs, runner
 
-with open(path, 'r') as f:
-    content = f.read()
+# The rules live in packs/marketplace.toml
+PACK = packs.load('marketplace')
+files_map = packs.tables(PACK)
 
-content = content.replace('prisma.booking.', 'prisma.bookings.')
-content = content.replace('prisma.subject.', 'prisma.subjects.')
-content = content.replace('prisma.studentPackage.', 'prisma.student_packages.')
-content = content.replace('prisma.curriculaSubject.', 'prisma.curriculum_subjects.')
-content = content.replace('prisma.gradeLevel.', 'prisma.grade_levels.')
-content = content.replace('prisma.teacher_subjectsGrade.', 'prisma.teacher_subject_grades.')
-content = content.replace('prisma.teacherDemoSettings.', 'prisma.teacher_demo_settings.')
-content = content.replace('prisma.packageTier.', 'prisma.package_tiers.')
-content = content.replace('prisma.availabilityException.', 'prisma.availability_exceptions.')
-content = content.replace('prisma.rating.', 'prisma.ratings.')
-content = content.replace('grades: {', 'grade_levels: {')
-content = content.replace('availabilityExceptions: {', 'availability_exceptions: {')
-content = content.replace('user: true', 'users: true')
-content = content.replace('include: { subject: true', 'include: { subjects: true')
-# fix specific case for stage include
-content = content.replace('stage: {', 'educational_stages: {')
+def transforms():
+    """{path: transform} for the files this script rewrites"""
+    return packs.transforms(PACK)
 
-with open(path, 'w') as f:
-    f.write(content)
-print(f"Fixed {path}")
+def main():
+    parser = argparse.ArgumentParser()
+    runner.add_output_arguments(parser)
+    runner.add_cache_arguments(parser)
+    args = parser.parse_args()
+    
+    out = runner.status(args)
+    failures = 0
+    for path, result in packs.run(PACK, args):
+        print(f"{runner.outcome(result)} {path}", file=out)
+        failures += runner.failed(result)
+    return runner.exit_status(failures)
+
+if __name__ == "__main__":
+    sys.exit(main())
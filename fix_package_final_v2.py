@@ -1,19 +1,12 @@
+import argparse
 import sys
-import re
 import os
+from functools import partial
+
+from codemod import budget, objects, runner
 
 files_map = {
     'apps/api/src/package/package.service.ts': [
-        # Inject ID for bookings
-        (r'return\s*tx\.bookings\.create\(\{\s*data:\s*\{', 'return tx.bookings.create({\n        data: {\n          id: crypto.randomUUID(),'),
-        (r'return\s*this\.prisma\.bookings\.create\(\{\s*data:\s*\{', 'return this.prisma.bookings.create({\n        data: {\n          id: crypto.randomUUID(),'),
-        
-        # Inject ID for teacher_demo_settings (packagesEnabled context)
-        (r'data:\s*\{\s*teacherId,\s*demoEnabled,\s*packagesEnabled\s*\}', 'data: { id: crypto.randomUUID(), teacherId, demoEnabled, packagesEnabled }'),
-        
-        # Inject ID for teacher_package_tier_settings
-        (r'data:\s*\{\s*teacherId,\s*tierId,\s*isEnabled\s*\}', 'data: { id: crypto.randomUUID(), teacherId, tierId, isEnabled }'),
-
         # Fix property access and includes
         (r'\.user\.', '.users.'), 
         (r'include:\s*\{\s*subject:', 'include: { subjects:'),
@@ -43,21 +36,41 @@ files_map = {
     ]
 }
 
-for path, replacements in files_map.items():
-    if not os.path.exists(path):
-        print(f"Skipping {path} (not found)")
-        continue
-        
-    with open(path, 'r') as f:
-        content = f.read()
-    
-    original = content
+# Inject ID into create bodies that lack one (checked per object literal, so never twice)
+inject = {
+    'apps/api/src/package/package.service.ts': {
+        # Inject ID for bookings
+        'bookings': [('id', 'crypto.randomUUID()')],
+        # Inject ID for teacher_demo_settings (packagesEnabled context)
+        'teacher_demo_settings': [('id', 'crypto.randomUUID()')],
+        # Inject ID for teacher_package_tier_settings
+        'teacher_package_tier_settings': [('id', 'crypto.randomUUID()')],
+    }
+}
+
+def fix_content(content, replacements, inject=None):
+    if inject is not None:
+        content, _ = objects.ensure_keys(content, inject)
     for pattern, replacement in replacements:
-        content = re.sub(pattern, replacement, content)
+        content = budget.sub(pattern, replacement, content)
+    return content
+
+def transforms():
+    """{path: transform} for the files this script rewrites"""
+    return {path: partial(fix_content, replacements=replacements, inject=inject.get(path)) for path, replacements in files_map.items()}
+
+def main():
+    parser = argparse.ArgumentParser()
+    runner.add_output_arguments(parser)
+    runner.add_cache_arguments(parser)
+    args = parser.parse_args()
     
-    if content != original:
-        with open(path, 'w') as f:
-            f.write(content)
-        print(f"Fixed {path}")
-    else:
-        print(f"No changes for {path}")
+    out = runner.status(args)
+    failures = 0
+    for path, result in runner.rewrite_paths(transforms(), args, runner.script_key(__file__)):
+        print(f"{runner.outcome(result)} {path}", file=out)
+        failures += runner.failed(result)
+    return runner.exit_status(failures)
+
+if __name__ == "__main__":
+    sys.exit(main())
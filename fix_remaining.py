@@ -1,36 +1,28 @@
+import argparse
 import sys
-import re
-import os
 
-files_map = {
-    'apps/api/src/package/package.service.ts': [
-        (r'prisma\.packageTier\b', 'prisma.package_tiers'),
-        (r'prisma\.teacherDemoSettings\b', 'prisma.teacher_demo_settings'),
-        (r'prisma\.packageTransaction\b', 'prisma.package_transactions'),
-        (r'prisma\.studentPackage\b', 'prisma.student_packages'),
-        (r'prisma\.wallet\b', 'prisma.wallets'),
-        (r'prisma\.transaction\b', 'prisma.transactions'),
-    ],
-    'apps/api/src/package/demo.service.ts': [
-        (r'owner\s*:\s*true', 'users: true'), # Attempt fix for owner relation
-    ]
-}
+from codemod import packs, runner
 
-for path, replacements in files_map.items():
-    if not os.path.exists(path):
-        print(f"Skipping {path} (not found)")
-        continue
-        
-    with open(path, 'r') as f:
-        content = f.read()
-    
-    original = content
-    for pattern, replacement in replacements:
-        content = re.sub(pattern, replacement, content)
+# The rules live in packs/remaining.toml
+PACK = packs.load('remaining')
+files_map = packs.tables(PACK)
+
+def transforms():
+    """{path: transform} for the files this script rewrites"""
+    return packs.transforms(PACK)
+
+def main():
+    parser = argparse.ArgumentParser()
+    runner.add_output_arguments(parser)
+    runner.add_cache_arguments(parser)
+    args = parser.parse_args()
     
-    if content != original:
-        with open(path, 'w') as f:
-            f.write(content)
-        print(f"Fixed {path}")
-    else:
-        print(f"No changes for {path}")
+    out = runner.status(args)
+    failures = 0
+    for path, result in packs.run(PACK, args):
+        print(f"{runner.outcome(result)} {path}", file=out)
+        failures += runner.failed(result)
+    return runner.exit_status(failures)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,29 +1,30 @@
 #!/usr/bin/env python3
-"""Fix req.users back to req.user (HTTP request property)"""
-import re
-from pathlib import Path
+"""Fix req.users back to req.user (HTTP request property) left by older regex runs of fix_all_prisma.py"""
+import argparse
+import sys
 
-def fix_file(filepath):
-    with open(filepath, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    original = content
-    # Fix req.users. -> req.user.
-    content = re.sub(r'req\.users\.', 'req.user.', content)
-    
-    if content != original:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
-        return True
-    return False
+from codemod import packs, runner
+
+# Fix req.users. -> req.user. (packs/req_user.toml)
+PACK = packs.load('req_user')
+RULES = PACK.scope.sets[0]
 
 def main():
-    fixed = 0
-    for ts_file in Path("apps/api/src").rglob("*.ts"):
-        if fix_file(ts_file):
+    parser = argparse.ArgumentParser(description=__doc__)
+    runner.add_arguments(parser, PACK.paths)
+    args = parser.parse_args()
+    
+    fixed = failures = 0
+    out = runner.status(args)
+    for ts_file, result in packs.run(PACK, args):
+        if result.changed:
             fixed += 1
-            print(f"✓ Fixed: {ts_file}")
-    print(f"\n✅ Fixed {fixed} files")
+            print(f"✓ Fixed: {ts_file}", file=out)
+        elif runner.failed(result):
+            failures += 1
+            print(f"✗ {runner.outcome(result)}: {ts_file}", file=out)
+    print(f"\n✅ Fixed {fixed} files", file=out)
+    return runner.exit_status(failures)
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
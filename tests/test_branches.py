@@ -0,0 +1,45 @@
+"""codemod.branches: a rejected blob rewrite is reported, never cached as clean"""
+
+import subprocess
+
+from codemod import branches, cache
+from codemod.engine import RuleSet
+
+# Unbalances the braces, so validation rejects it
+RULES = RuleSet([(r'\{ id', '{ { id')])
+
+
+def git(repo, *args):
+    subprocess.run(['git', '-C', str(repo), *args], check=True, capture_output=True)
+
+
+def make_repo(repo):
+    (repo / 'src').mkdir(parents=True)
+    (repo / 'src' / 'a.ts').write_text('const a = { id: 1 };\n', encoding='utf-8')
+    git(repo, 'init', '-q', '-b', 'main')
+    git(repo, 'add', '.')
+    git(repo, '-c', 'user.name=t', '-c', 'user.email=t@example.com', 'commit', '-q', '-m', 'init')
+
+
+def test_rejected_blob_is_not_cached_as_clean(tmp_path, monkeypatch):
+    make_repo(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    key = RULES.fingerprint
+
+    results, contents, overrun, rejected = branches.rewrite_branches(
+        ['main'], RULES, paths=['src'], dry_run=True, rules_key=key)
+    assert rejected == ['src/a.ts'] and not contents and not overrun
+    assert not results[0].files
+    assert not cache.is_clean(key, cache.digest(b'const a = { id: 1 };\n'))
+
+    # Without validation the same blob is still rewritten, not skipped as known-clean
+    _, contents, _, rejected = branches.rewrite_branches(
+        ['main'], RULES, paths=['src'], dry_run=True, check=False, rules_key=key)
+    assert not rejected
+    assert [new for _, new in contents.values()] == [b'const a = { { id: 1 };\n']
+
+
+def test_rewrite_blob_tells_rejected_from_unchanged():
+    assert branches.rewrite_blob(b'const b = 1;\n', RULES, 'b.ts') == (None, None)
+    new, problems = branches.rewrite_blob(b'const a = { id: 1 };\n', RULES, 'a.ts')
+    assert new is None and problems
@@ -0,0 +1,149 @@
+"""
+codemod.engine: the single scan must give the same result as the sequential
+re.sub loop it replaces, on str and (through edits()) on bytes
+
+    python3 -m pytest tests
+"""
+
+import random
+import re
+
+import pytest
+
+from codemod import spans
+from codemod.engine import RuleSet
+
+
+def reference(rules, content):
+    """What the old scripts did: one re.sub per rule, in order"""
+    for pattern, replacement in rules:
+        content = re.sub(pattern, replacement, content)
+    return content
+
+
+def via_edits(rules, content):
+    buffer = content.encode('utf-8')
+    edits = rules.edits(buffer, ascii_input=lambda: spans.is_ascii(buffer))
+    if edits is None:
+        return None
+    return spans.apply(buffer, edits)
+
+
+MODELS = [
+    (r'\.user\.', '.users.'),
+    (r'\.wallet\.', '.wallets.'),
+    (r'\.teacherProfile\.', '.teacher_profiles.'),
+    (r'\.teacherSubject\.', '.teacher_subjects.'),
+]
+
+# (rules, inputs): rule sets without conflicts, where the single scan must match the loop exactly
+CASES = [
+    # Separators re-emitted by the replacement are matched as lookaround, so
+    # neighbouring rules still see them in one scan
+    (MODELS, [
+        'this.prisma.user.findMany()',
+        'a.user.wallet.x',
+        'a.wallet.user.wallet.b',
+        # A rule never reuses a separator it consumed itself (`.user.user.` -> `.users.user.`)
+        'x.user.user.user.y',
+        'tx.teacherProfile.teacherSubject.id',
+        'no models here',
+        '.user.',
+        '..user..wallet..',
+        'user.wallet.',
+    ]),
+    # Word boundaries and an empty suffix
+    ([(r'\.packageTier\b', '.package_tiers'), (r'\.wallet\b', '.wallets')], [
+        'prisma.packageTier.create(); prisma.packageTiers; x.wallet',
+        'prisma.wallet;prisma.walletX.wallet',
+    ]),
+    # Templates and groups
+    ([(r'(\w+)Id\b', r'\1_id'), (r'req\.users\.', 'req.user.')], [
+        'const userId = req.users.id; walletId',
+        'Id alone, xId, x_Id',
+    ]),
+    # Overlapping candidates at one position: earlier rule wins, as in the loop
+    ([('abc', 'Y'), ('ab', 'X')], ['abc ab abcab', 'aab abcc']),
+    # Rules without a literal anchor go through the prefilter as themselves
+    ([(r'\s*,\s*\)', ')'), (r'user\s*:\s*\{', 'users: {')], [
+        'f(a, b , ) user : { x }',
+        'user:{',
+    ]),
+    # Non-ASCII content around byte-exact rules
+    (MODELS, ['// é user.wallet.é\nthis.prisma.user.x', 'ملف.user.']),
+]
+
+
+@pytest.mark.parametrize('pairs,inputs', CASES)
+def test_single_pass_matches_sequential(pairs, inputs):
+    rules = RuleSet(pairs)
+    assert not rules.conflicts()
+    for content in inputs:
+        expected = reference(pairs, content)
+        assert rules(content) == expected, content
+        assert rules.sequential(content) == expected, content
+
+
+@pytest.mark.parametrize('pairs,inputs', CASES)
+def test_edits_match_str_rewrite(pairs, inputs):
+    rules = RuleSet(pairs)
+    for content in inputs:
+        found = via_edits(rules, content)
+        if found is None:
+            # Only allowed when bytes could match differently: non-ASCII input and a Unicode-sensitive rule
+            assert not content.isascii() and not all(r.byte_exact for r in rules.rules), content
+            continue
+        assert found == rules(content), content
+
+
+def test_random_inputs_match_sequential():
+    # Separators, repeats and near-misses glued together at random
+    pieces = ['.', '..', 'user', 'wallet', 'teacherProfile', 'teacherSubject', 'users', ' ', 'x', 'é', '\n']
+    rules = RuleSet(MODELS)
+    rng = random.Random(0)
+    for _ in range(2000):
+        content = ''.join(rng.choice(pieces) for _ in range(rng.randint(1, 12)))
+        expected = reference(MODELS, content)
+        assert rules(content) == expected, content
+        assert via_edits(rules, content) == expected, content
+
+
+def test_edits_refuse_unicode_sensitive_rules_on_non_ascii():
+    rules = RuleSet([(r'(\w+)Id\b', r'\1_id')])
+    assert via_edits(rules, 'éId') is None
+    assert via_edits(rules, 'userId') == 'user_id'
+
+
+def test_rewrite_counts_hits_per_rule():
+    rules = RuleSet(MODELS)
+    _, counts = rules.rewrite('a.user.x b.user.y c.wallet.z')
+    assert counts == [2, 1, 0, 0]
+    counts = [0] * len(rules)
+    rules.edits(b'a.user.x b.user.y c.wallet.z', counts=counts)
+    assert counts == [2, 1, 0, 0]
+
+
+@pytest.mark.parametrize('pairs,content', [
+    # A rule's output feeds a later rule
+    ([('foo', 'bar'), ('bar', 'baz')], 'foo'),
+    # A later-listed rule starts earlier than an overlapping earlier one
+    ([('bc', 'Y'), ('ab', 'X')], 'abc'),
+    # Shared separator consumed by a template rule (templates keep their context)
+    ([(r'(\.)user\.', r'\1users.'), (r'\.wallet\.', '.wallets.')], 'a.user.wallet.b'),
+])
+def test_conflicts_are_detected(pairs, content):
+    rules = RuleSet(pairs)
+    assert rules.conflicts()
+    # The fallback keeps the old semantics
+    assert rules.sequential(content) == reference(pairs, content)
+
+
+def test_backreferences_are_rejected():
+    with pytest.raises(ValueError):
+        RuleSet([(r'(a)\1', 'b')])
+
+
+def test_requirements_list_literal_phrases():
+    rules = RuleSet([(r'\.user\.', '.users.'), (r'(\w+)Id\b', r'\1_id'), (r'\s*,\s*\)', ')')])
+    # No word characters to look up in the index: the rule can match anywhere
+    assert rules.requirements() == [['.user.'], ['Id'], None]
@@ -0,0 +1,87 @@
+"""codemod.journal: staged rewrites swap in, keep file modes, and roll back or commit cleanly"""
+
+import os
+import stat
+
+from codemod import journal
+from codemod.cache import digest
+
+
+def read_digest(path):
+    return digest(path.read_bytes())
+
+
+def run(root, rewrites):
+    """One journaled run over {path: new content}; returns its run id"""
+    with journal.Journal(root=root, batch_size=2) as run_journal:
+        for path, content in rewrites.items():
+            before = read_digest(path)
+            tmp = journal.stage(path, content)
+            run_journal.add(path, tmp, before, digest(content.encode('utf-8')))
+    return run_journal.run_id
+
+
+def make(tmp_path, names, mode=0o644):
+    files = {}
+    for name in names:
+        path = tmp_path / name
+        path.write_text(f'const {name.split(".")[0]} = prisma.user.x;\n', encoding='utf-8')
+        os.chmod(path, mode)
+        files[path] = read_digest(path)
+    return files
+
+
+def test_rollback_restores_every_original(tmp_path):
+    root = tmp_path / 'journal'
+    files = make(tmp_path, ['a.ts', 'b.ts', 'c.ts'])
+    run_id = run(root, {path: f'// rewritten {path.name}\n' for path in files})
+
+    assert all(read_digest(path) != before for path, before in files.items())
+    assert not any(p.name.endswith(journal.TMP_SUFFIX) for p in tmp_path.iterdir())
+    assert journal.runs(root) == [run_id]
+    assert len(journal.entries(run_id, root)) == 3
+
+    restored, skipped = journal.rollback(run_id, root)
+    assert sorted(restored) == sorted(map(str, files)) and not skipped
+    assert {path: read_digest(path) for path in files} == files
+    assert journal.runs(root) == []
+
+
+def test_commit_keeps_the_rewrites(tmp_path):
+    root = tmp_path / 'journal'
+    files = make(tmp_path, ['a.ts'])
+    run_id = run(root, {path: 'rewritten\n' for path in files})
+    journal.commit(run_id, root)
+    assert journal.runs(root) == []
+    assert all(path.read_text(encoding='utf-8') == 'rewritten\n' for path in files)
+
+
+def test_rollback_leaves_files_edited_since_alone(tmp_path):
+    root = tmp_path / 'journal'
+    files = make(tmp_path, ['a.ts', 'b.ts'])
+    a, b = files
+    run_id = run(root, {a: 'rewritten a\n', b: 'rewritten b\n'})
+    b.write_text('edited by hand\n', encoding='utf-8')
+
+    restored, skipped = journal.rollback(run_id, root)
+    assert restored == [str(a)] and skipped == [str(b)]
+    assert read_digest(a) == files[a]
+    assert b.read_text(encoding='utf-8') == 'edited by hand\n'
+    # Kept, so --force can still restore it
+    restored, skipped = journal.rollback(run_id, root, force=True)
+    assert restored == [str(b)] and read_digest(b) == files[b]
+
+
+def test_rewrites_keep_the_file_mode(tmp_path):
+    root = tmp_path / 'journal'
+    script, shared = make(tmp_path, ['script.ts'], mode=0o755), make(tmp_path, ['shared.ts'], mode=0o664)
+    run(root, {path: 'rewritten\n' for path in [*script, *shared]})
+    assert all(stat.S_IMODE(path.stat().st_mode) == 0o755 for path in script)
+    assert all(stat.S_IMODE(path.stat().st_mode) == 0o664 for path in shared)
+
+    # The mmap path stages byte edits the same way
+    path = next(iter(script))
+    data = path.read_bytes()
+    tmp, _ = journal.stage_spans(path, data, [(0, 9, b'// edited')])
+    assert stat.S_IMODE(os.stat(tmp).st_mode) == 0o755
+    os.unlink(tmp)
@@ -0,0 +1,140 @@
+"""
+codemod.lexer: what the tokenizer sees as code, and where token rules may
+rename an identifier
+"""
+
+import pytest
+
+from codemod import lexer
+from codemod.lexer import TokenRule, TokenRuleSet
+
+
+def kinds(text):
+    return [(t.kind, t.text) for t in lexer.tokenize(text)]
+
+
+def idents(text):
+    return [t.text for t in lexer.code_tokens(text) if t.kind == 'ident']
+
+
+USERS = TokenRuleSet([lexer.member('user', 'users')])
+
+
+@pytest.mark.parametrize('content', [
+    "const s = 'prisma.user.findMany';",
+    'const s = "prisma.user.findMany";',
+    '// prisma.user.findMany()',
+    '/* prisma.user.findMany() */',
+    '/** @see prisma.user */',
+    'const s = `prisma.user.x`;',
+    "const s = 'it\\'s prisma.user';",
+])
+def test_strings_and_comments_are_left_alone(content):
+    assert USERS(content) == content
+
+
+def test_code_around_strings_and_comments_is_renamed():
+    content = "prisma.user.x('prisma.user.y') // prisma.user.z\n/* .user. */ prisma.user.w"
+    assert USERS(content) == "prisma.users.x('prisma.user.y') // prisma.user.z\n/* .user. */ prisma.users.w"
+
+
+def test_template_substitutions_are_code():
+    assert USERS('`a ${prisma.user.id} b.user.c`') == '`a ${prisma.users.id} b.user.c`'
+
+
+def test_nested_braces_in_template_substitutions():
+    # The `}` of the object literal doesn't end the substitution
+    content = '`x ${f({ a: { b: 1 } }).user.y} .user. ${`inner ${u.user.z}`} tail.user.`; q.user.w'
+    assert USERS(content) == '`x ${f({ a: { b: 1 } }).users.y} .user. ${`inner ${u.users.z}`} tail.user.`; q.users.w'
+    tokens = kinds('`a ${ {b: 1} } c`')
+    assert tokens[0] == ('template', '`a ${')
+    assert tokens[-1] == ('template', '} c`')
+
+
+@pytest.mark.parametrize('content,regex', [
+    # Division after an expression
+    ('a = (b) / c / d.user', False),
+    ('a = b / c / d.user', False),
+    ('a = x[0] / 2 / y.user', False),
+    # A regex literal where an expression can start
+    ('return /a.user/.test(s)', True),
+    ('x = /.user/g', True),
+    ('f(/\\/user\\//)', True),
+    ('typeof /x/', True),
+])
+def test_regex_or_division(content, regex):
+    found = [t.text for t in lexer.tokenize(content) if t.kind == 'regex']
+    assert bool(found) == regex, found
+    if regex:
+        # The pattern isn't code
+        assert USERS(content) == content
+    else:
+        assert USERS(content).endswith('.users')
+
+
+def test_key_rules_need_an_object_key_position():
+    rules = TokenRuleSet([lexer.key('teacher', 'teacher_profiles', follow=['{'])])
+    content = 'include: { teacher: { select: x }, other: teacher, teacher: true }; obj.teacher = { a: 1 }'
+    assert rules(content) == 'include: { teacher_profiles: { select: x }, other: teacher, teacher: true }; obj.teacher = { a: 1 }'
+    # `follow` is matched token by token, whitespace and all
+    assert rules('{ a: 1, teacher :\n  {}}') == '{ a: 1, teacher_profiles :\n  {}}'
+    assert rules('f(teacher, { x: 1 })') == 'f(teacher, { x: 1 })'
+
+
+def test_key_rule_without_follow():
+    rules = TokenRuleSet([lexer.key('user', 'users')])
+    assert rules('{ user: true, x: { user: 1 } }') == '{ users: true, x: { users: 1 } }'
+    assert rules('{ user }') == '{ user }'
+
+
+def test_receivers_and_skip_receivers():
+    only_prisma = TokenRuleSet([lexer.member('user', 'users', receivers=['prisma', 'tx'])])
+    assert only_prisma('prisma.user.x; tx.user.y; req.user.z; this.prisma.user.w') == \
+        'prisma.users.x; tx.users.y; req.user.z; this.prisma.users.w'
+    not_req = TokenRuleSet([lexer.member('user', 'users', skip_receivers=['req'])])
+    assert not_req('prisma.user.x; req.user.z; a?.user') == 'prisma.users.x; req.user.z; a?.users'
+
+
+def test_member_and_ident_contexts():
+    rules = TokenRuleSet([TokenRule('booking', 'bookings', 'ident')])
+    assert rules('const booking = x.booking; booking.id') == 'const bookings = x.booking; bookings.id'
+    # Spread receivers are not identifiers
+    assert USERS('...user.x; a.user') == '...user.x; a.users'
+
+
+def test_follow_on_members():
+    rules = TokenRuleSet([lexer.member('subject', 'subjects', follow=['.'])])
+    assert rules('prisma.subject.find(); x.subject; x.subject()') == 'prisma.subjects.find(); x.subject; x.subject()'
+
+
+def test_first_matching_rule_wins():
+    rules = TokenRuleSet([lexer.member('user', 'users', receivers=['prisma']), lexer.member('user', 'owner')])
+    assert rules('prisma.user; req.user') == 'prisma.users; req.owner'
+
+
+def test_conflicts():
+    chained = TokenRuleSet([lexer.member('a', 'b'), lexer.member('b', 'c')])
+    assert [(r.old, o.old) for r, o, _ in chained.conflicts()] == [('a', 'b')]
+    # One scan renames a to b only; sequential feeds the output on
+    assert chained('x.a') == 'x.b'
+    assert chained.sequential('x.a') == 'x.c'
+    # Earlier rules, or other contexts, don't feed each other
+    assert not TokenRuleSet([lexer.member('b', 'c'), lexer.member('a', 'b')]).conflicts()
+    assert not TokenRuleSet([lexer.member('a', 'b'), lexer.key('b', 'c')]).conflicts()
+
+
+def test_edits_match_rewrite_on_non_ascii():
+    content = '// é\nconst s = "ü.user"; prisma.user.x; ملف.user'
+    buffer = content.encode('utf-8')
+    edits = USERS.edits(buffer)
+    out = bytearray(buffer)
+    for start, end, new in reversed(edits):
+        out[start:end] = new
+    assert out.decode('utf-8') == USERS(content)
+    assert USERS.edits(b'nothing to see') == []
+
+
+def test_unterminated_input_does_not_hang():
+    for content in ["'open", '`open ${a.user', '/* open', 'a.user /', '\\']:
+        list(lexer.tokenize(content))
+    assert idents('`a ${b.user') == ['b', 'user']
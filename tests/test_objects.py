@@ -0,0 +1,107 @@
+"""codemod.objects: object literal extents, and the key fixes built on them"""
+
+import pytest
+
+from codemod import objects
+
+ID = 'crypto.randomUUID()'
+FIELDS = {'bookings': [('id', ID), ('updatedAt', 'new Date()')]}
+
+
+def ensure(text, **kwargs):
+    return objects.ensure_keys(text, FIELDS, **kwargs)
+
+
+def test_scan_finds_top_level_keys_only():
+    text = 'x = { a: 1, b: { c: 2, d: [ { e: 3 } ] }, f, "g": 4, h() { return { i: 5 } }, };'
+    outer = min(objects.scan(text), key=lambda o: o.start)
+    assert [p.key for p in outer.props] == ['a', 'b', 'f', 'g']
+    assert text[outer.start:outer.end] == text[text.index('{'):text.rindex('}') + 1]
+    assert {tuple(p.key for p in o.props) for o in objects.scan(text)} >= {('c', 'd'), ('e',), ('i',)}
+
+
+def test_ensure_keys_adds_missing_keys():
+    text = 'await this.prisma.bookings.create({ data: { studentId: s } });'
+    new, changed = ensure(text)
+    assert changed == 1
+    assert new == f'await this.prisma.bookings.create({{ data: {{ id: {ID}, updatedAt: new Date(), studentId: s }} }});'
+    # Idempotent
+    assert ensure(new) == (new, 0)
+
+
+def test_ensure_keys_keeps_present_and_shorthand_keys():
+    text = 'tx.bookings.create({ data: { id, updatedAt: now, x: 1 } })'
+    assert ensure(text) == (text, 0)
+
+
+def test_nested_literals_are_not_the_record():
+    # `id` inside a nested relation doesn't count for the record, and the nested literal gets nothing
+    text = 'prisma.bookings.create({ data: { student: { connect: { id: s } }, updatedAt: now } })'
+    new, changed = ensure(text)
+    assert changed == 1
+    assert new.startswith(f'prisma.bookings.create({{ data: {{ id: {ID}, student: {{ connect: {{ id: s }} }}')
+    assert new.count('id:') == 2
+
+
+def test_spreads_may_supply_the_keys():
+    text = 'prisma.bookings.create({ data: { ...dto } })'
+    assert ensure(text) == (text, 0)
+    text = 'prisma.bookings.create({ data: { ...dto, note: "x" } })'
+    assert ensure(text) == (text, 0)
+
+
+def test_trailing_commas_and_empty_literals():
+    new, changed = ensure('prisma.bookings.create({ data: { a: 1, }, })')
+    assert changed == 1 and new == f'prisma.bookings.create({{ data: {{ id: {ID}, updatedAt: new Date(), a: 1, }}, }})'
+    new, changed = ensure('prisma.bookings.create({ data: {} })')
+    assert changed == 1 and new == f'prisma.bookings.create({{ data: {{ id: {ID}, updatedAt: new Date(),}} }})'
+
+
+def test_upsert_uses_the_create_body():
+    text = 'prisma.bookings.upsert({ where: { id: x }, update: {}, create: { a: 1 } })'
+    new, changed = ensure(text)
+    assert changed == 1
+    assert f'create: {{ id: {ID}, updatedAt: new Date(), a: 1 }}' in new
+    assert 'update: {}' in new
+
+
+@pytest.mark.parametrize('text', [
+    '{ data: { a: 1 } }',
+    'create({ data: { a: 1 } })',
+    'bookings.create({ data: { a: 1 } })',
+    '.bookings.create({ data: { a: 1 } })',
+    'prisma.users.create({ data: { a: 1 } })',
+    'prisma.bookings.update({ data: { a: 1 } })',
+])
+def test_calls_without_receiver_model_and_method_are_skipped(text):
+    assert ensure(text, receivers={'prisma'}) == (text, 0)
+
+
+def test_short_receiverless_calls_do_not_crash():
+    # Five tokens before `{`: no receiver at all
+    text = '?.bookings.create({ data: { a: 1 } })'
+    assert ensure(text)[1] == 1
+    assert ensure(text, receivers={'prisma'}) == (text, 0)
+
+
+def test_drop_duplicate_keys_removes_the_injected_copy():
+    text = f'x = {{\n  id: {ID},\n  id: dto.id,\n  name: n,\n}};'
+    new, removed = objects.drop_duplicate_keys(text, {'id': ID})
+    assert removed == 1
+    assert new == 'x = {\n  id: dto.id,\n  name: n,\n};'
+
+
+def test_drop_duplicate_keys_keeps_one_when_all_copies_match():
+    text = f'x = {{ id: {ID}, id: {ID}, a: 1 }}'
+    new, removed = objects.drop_duplicate_keys(text, {'id': ID})
+    assert removed == 1 and new == f'x = {{ id: {ID}, a: 1 }}'
+
+
+def test_drop_duplicate_keys_per_literal():
+    # The same key in a nested literal is not a duplicate
+    text = f'x = {{ id: {ID}, user: {{ id: {ID} }}, }}'
+    assert objects.drop_duplicate_keys(text, {'id': ID}) == (text, 0)
+    # Trailing comma on the last copy
+    text = f'x = {{ id: a, id: {ID}, }}'
+    assert objects.drop_duplicate_keys(text, {'id': ID}) == ('x = { id: a, }', 1)
+    assert objects.drop_duplicate_keys('{}', {'id': ID}) == ('{}', 0)
@@ -0,0 +1,104 @@
+"""
+codemod.packs: every shipped pack compiles against schema.prisma, and a rule
+whose target the schema doesn't have fails the load, naming what is missing
+"""
+
+import json
+
+import pytest
+
+from codemod import packs
+
+
+@pytest.mark.parametrize('path', packs.available(), ids=lambda p: p.stem)
+def test_shipped_packs_compile(path):
+    bundle, _ = packs.compile_pack(path.stem, path.read_text(encoding='utf-8'))
+    assert bundle.scope is not None or bundle.files
+
+
+@pytest.mark.parametrize('table,missing', [
+    # A relation placeholder with no field behind it would have written `None: {`
+    ("rules = [['teacher\\\\s*:\\\\s*\\\\{', '{{relation noSuchRelation}}: {']]", '{{relation noSuchRelation}}'),
+    ("rules = [['x', '{{resolve noSuchRelation users}}']]", '{{resolve noSuchRelation users}}'),
+    # ...or a key('teacher', None) token rule
+    ('tokens = [{ old = "teacher", new = "{{relation noSuchRelation}}", context = "key", follow = ["{"] }]',
+     '{{relation noSuchRelation}}'),
+    ('models = { names = ["noSuchModel"] }', "'noSuchModel'"),
+    ('members = { names = ["noSuchModel"] }', "'noSuchModel'"),
+])
+def test_missing_schema_targets_raise(table, missing):
+    text = f'[files."apps/api/src/x.ts"]\n{table}\n'
+    with pytest.raises(packs.PackError, match='schema.prisma has no') as info:
+        packs.compile_pack('broken', text)
+    assert missing in str(info.value)
+    assert 'apps/api/src/x.ts' in str(info.value)
+
+
+@pytest.mark.parametrize('old', ['availabilityExceptions', 'subject', 'stage'])
+def test_marketplace_relations_come_from_the_schema(old):
+    from codemod import schema
+
+    new = schema.relation_name(old)
+    assert new is not None and new in schema.relations().by_field
+    (rules,) = packs.tables(packs.load('marketplace')).values()
+    assert any(f'{new}:' in replacement for _, replacement in rules)
+
+
+def test_sequential_packs_keep_the_hazard_check(capsys):
+    from codemod import budget
+
+    # cleanup_v2's duplicate-id rule: \s*\n\s* can backtrack polynomially
+    hazardous = r'(id: crypto\.randomUUID\(\),)\s*\n\s*id:'
+    text = f"sequential = true\n[files.\"apps/api/src/x.ts\"]\nrules = [['{hazardous}', '\\1']]\n"
+    bundle, _ = packs.compile_pack('hazardous', text)
+    transform = packs.transforms(bundle)['apps/api/src/x.ts']
+    budget.warn_rules(transform)
+    assert f"⚠ Rule {hazardous!r}" in capsys.readouterr().err
+    # Still one rule at a time
+    assert transform('id: crypto.randomUUID(),\n  id: 1') == 'id: crypto.randomUUID(), 1'
+
+
+def test_shipped_sequential_packs_report_hazards():
+    transforms = packs.transforms(packs.load('cleanup_v2'))
+    assert any(t.hazards() for t in transforms.values())
+
+
+def test_multi_pack_shards_merge(tmp_path, monkeypatch):
+    from codemod import shard
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'src').mkdir()
+    for i in range(6):
+        (tmp_path / 'src' / f'f{i}.ts').write_text(f'const a{i} = this.prisma.user.x;\n', encoding='utf-8')
+    (tmp_path / 'src' / 'service.ts').write_text('include: { grades: true }\n', encoding='utf-8')
+    # A global pack and one with both a global and a file scope
+    (tmp_path / 'users.toml').write_text(
+        "paths = ['src']\nrules = [['\\.user\\.', '.users.']]\n", encoding='utf-8')
+    (tmp_path / 'grades.toml').write_text(
+        "paths = ['src']\nrules = [['\\.x;', '.y;']]\n"
+        "[files.\"src/service.ts\"]\nliterals = [['grades:', 'grade_levels:']]\n", encoding='utf-8')
+
+    packs_args = [str(tmp_path / 'users.toml'), str(tmp_path / 'grades.toml'), '--dry-run', '--no-index', '-j', '1']
+    for i in (1, 2):
+        assert packs.main(['run', *packs_args, '--shard', f'{i}/2']) == 0
+    reports = [(str(path), json.loads(path.read_text(encoding='utf-8')))
+               for path in sorted((tmp_path / shard.SHARD_DIR).glob('*-of-2.json'))]
+    assert len(reports) == 2
+    merged, _ = shard.merge(reports)
+
+    assert not merged['conflicts']
+    assert merged['files'] == 7
+    edited = sorted(edit['path'] for edit in merged['edits'])
+    # Six files changed by both global scopes, plus the file scope's edit
+    assert edited.count('src/service.ts') == 1
+    assert len([p for p in edited if p != 'src/service.ts']) == 12
+
+
+def test_schema_lookups_reuse_the_loaded_schema(monkeypatch):
+    from codemod import schema
+
+    schema.load_schema()
+    # A warm lookup must not read or hash schema.prisma again
+    monkeypatch.setattr(schema, '_load_schema', lambda *a: pytest.fail("schema.prisma re-read"))
+    assert schema.load_schema()['models']
+    assert schema.relation_name('subject') is not None
@@ -0,0 +1,39 @@
+"""codemod.runner: rejected rewrites are reported and counted, not passed off as unchanged"""
+
+import argparse
+
+from codemod import runner
+
+
+def parse(argv):
+    parser = argparse.ArgumentParser()
+    runner.add_output_arguments(parser)
+    runner.add_cache_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def test_rejected_rewrite_is_counted_and_fails_the_run(tmp_path, capsys):
+    good, bad = tmp_path / 'good.ts', tmp_path / 'bad.ts'
+    good.write_text('const a = prisma.user.x;\n', encoding='utf-8')
+    bad.write_text('const b = { id: 1 };\n', encoding='utf-8')
+    transforms = {
+        str(good): lambda content: content.replace('.user.', '.users.'),
+        # Unbalances the braces, so validation refuses it
+        str(bad): lambda content: content.replace('{ id', '{ { id'),
+    }
+    results = dict(runner.rewrite_paths(transforms, parse(['--dry-run', '--no-cache'])))
+
+    assert [runner.outcome(results[str(p)]) for p in (good, bad)] == ['Fixed', 'Rejected']
+    assert [runner.failed(results[str(p)]) for p in (good, bad)] == [False, True]
+    assert bad.read_text(encoding='utf-8') == 'const b = { id: 1 };\n'
+    assert f'REJECTED {bad}:' in capsys.readouterr().err
+
+    assert runner.exit_status(sum(map(runner.failed, results.values()))) == 1
+    assert 'rejected or failed' in capsys.readouterr().err
+    assert runner.exit_status(0) == 0
+
+
+def test_outcome_of_unchanged_and_errored_files():
+    assert runner.outcome(runner.FileResult(False, 'digest', False)) == 'No changes for'
+    errored = runner.FileResult(False, None, False, error='boom')
+    assert runner.outcome(errored) == 'Failed' and runner.failed(errored)
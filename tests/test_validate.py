@@ -0,0 +1,86 @@
+"""codemod.validate: what check() reports, and what introduced() blames on a rewrite"""
+
+import pytest
+
+from codemod import validate
+
+
+def kinds(text, **kwargs):
+    return [(p.kind, p.line, p.col) for p in validate.check(text, **kwargs)]
+
+
+@pytest.mark.parametrize('text', [
+    'const a = { b: [1, (2)], c: `x ${ {d: 1}.d } y` };\n',
+    'if (x) {\n  foo: for (;;) { break foo; }\n}\n',
+    'switch (x) {\n  case 1: f();\n  default: g();\n}\n',
+    "const s = '{ ( [';  // } ) ]\n",
+    'const r = /[(]{2}/.test(s);\n',
+    'const t = a ? b : c;\n',
+    'class A { m(): void { return; } }\n',
+])
+def test_valid_code_has_no_problems(text):
+    assert validate.check(text) == []
+
+
+def test_unbalanced_brackets():
+    assert kinds('f({ a: 1 }\n') == [('unbalanced', 1, 2)]
+    assert kinds('f(a))\n') == [('unbalanced', 1, 5)]
+    problems = validate.check('if (x) {\n  f(\n}\n')
+    assert [(p.kind, p.line) for p in problems] == [('unbalanced', 2)]
+    assert "'(' is not closed before '}' at line 3" in problems[0].message
+
+
+def test_duplicate_keys():
+    problems = validate.check('x = { id: 1, name: n, id: 2, nested: { id: 3 } };\n')
+    assert [(p.kind, p.col) for p in problems] == [('duplicate-key', 23)]
+    assert "'id'" in problems[0].message
+
+
+def test_dangling_properties():
+    text = 'async f() {\n  await this.prisma.bookings.create({\n  id: x,\n  });\n}\n'
+    assert validate.check(text) == []
+    lost = 'async f() {\n  const y = 1;\n  id: crypto.randomUUID(),\n  f();\n}\n'
+    assert kinds(lost) == [('dangling-property', 3, 3)]
+
+
+def test_introduced_ignores_problems_already_there():
+    before = 'f(\nconst x = { a: 1 };\n'
+    # The old problem moves down a line; only the duplicate key is new
+    after = '\nf(\nconst x = { a: 1, a: 2 };\n'
+    assert [p.kind for p in validate.introduced(before, after)] == ['duplicate-key']
+    assert validate.introduced(before, before) == []
+    # A second copy of an existing problem is new
+    assert [p.kind for p in validate.introduced('f(', 'f( g(')] == ['unbalanced']
+
+
+def test_introduced_catches_a_lost_opener():
+    before = 'x = prisma.bookings.create({ data: {\n  id: 1,\n} });\n'
+    after = 'x = prisma.bookings.create({\n  id: 1,\n} });\n'
+    assert [p.kind for p in validate.introduced(before, after)] == ['unbalanced']
+
+
+JSX = '''export default function Page() {
+  return (
+    <div className="p-4">
+      <p>Server URL (without https://)</p>
+      {items.map((item) => <Row key={item.id} item={item} />)}
+    </div>
+  );
+}
+'''
+
+
+def test_jsx_skips_the_bracket_check():
+    # JSX text is lexed as code: `https://)` starts a line comment that swallows the `)`
+    assert validate.check(JSX)
+    assert validate.check(JSX, balance=False) == []
+    rewritten = JSX.replace('item.id', 'item.uuid')
+    assert validate.introduced(JSX, rewritten, 'app/page.tsx') == []
+    # Key checks still apply
+    dup = JSX.replace('className="p-4"', 'style={{ a: 1, a: 2 }}')
+    assert [p.kind for p in validate.introduced(JSX, dup, 'app/page.tsx')] == ['duplicate-key']
+
+
+def test_jsx_by_extension():
+    assert validate.jsx('a/page.tsx') and validate.jsx('a.jsx')
+    assert not validate.jsx('a/service.ts') and not validate.jsx('')